@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+JiraIQ dependency graph benchmark
+
+Builds synthetic projects whose issues carry "is blocked by" links and
+times compiling the graph (CSR arrays, SCCs and the blocked propagation)
+and the queries the tools make: top blockers by blast radius, the
+critical path, one issue's blockers and the blockage of a sprint.
+
+Usage:
+    python -m benchmarks.bench_graph
+    python -m benchmarks.bench_graph --sizes 10000,100000 --links 1.5 --open 0.6
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jiraiq_graph import DependencyGraph, graph_node
+
+
+def synthetic_issues(n, links, open_ratio, seed=7):
+    """Issue JSON for one project; each issue is blocked by ~`links` earlier ones, mostly nearby"""
+    rng = random.Random(seed)
+    for i in range(1, n + 1):
+        blockers = set()
+        for _ in range(int(links) + (rng.random() < links % 1)):
+            if i > 1:
+                # Most dependencies are on recent work, a few reach far back
+                span = 50 if rng.random() < 0.9 else i
+                blockers.add(max(1, i - rng.randint(1, span)))
+        yield {
+            "key": f"BIG-{i}",
+            "fields": {
+                "summary": f"Synthetic issue {i}",
+                "status": {"name": "In Progress" if rng.random() < open_ratio else "Done"},
+                "issuelinks": [
+                    {"type": {"name": "Blocks"}, "inwardIssue": {"key": f"BIG-{b}"}} for b in sorted(blockers)
+                ],
+            },
+        }
+
+
+def timed(fn, repeat=5):
+    """Best of `repeat` runs in milliseconds, and the last result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+
+def measure(n, links, open_ratio):
+    types = {"blocks"}
+    started = time.perf_counter()
+    converted = [graph_node(raw, types) for raw in synthetic_issues(n, links, open_ratio)]
+    convert_ms = (time.perf_counter() - started) * 1000
+    keys = [key for key, _, _ in converted]
+    nodes = [node for _, node, _ in converted]
+
+    compile_ms, graph = timed(lambda: DependencyGraph(keys, nodes, []), repeat=1)
+    sprint = keys[-min(300, n):]
+    probe = keys[-1]
+    return {
+        "issues": n,
+        "links": graph.links,
+        "active_links": graph.active_links,
+        "convert_ms": round(convert_ms, 1),
+        "compile_ms": compile_ms,
+        "top_blockers_ms": timed(lambda: graph.top_blockers(10))[0],
+        "critical_path_ms": timed(graph.critical_path)[0],
+        "blockers_ms": timed(lambda: graph.blockers(probe))[0],
+        "sprint_blockage_ms": timed(lambda: graph.blockage(sprint))[0],
+        "critical_path_length": sum(len(step) for step in graph.critical_path()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated issue counts")
+    parser.add_argument("--links", type=float, default=1.0, help="Average blocking links per issue")
+    parser.add_argument("--open", type=float, default=0.7, help="Share of issues that are unresolved")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"JiraIQ dependency graph ({args.links} links per issue, {args.open:.0%} open)\n")
+    header = (f"{'issues':>8} {'links':>8} {'open links':>10} {'compile ms':>10} {'top ms':>8} "
+              f"{'path ms':>8} {'blockers ms':>11} {'sprint ms':>9} {'path len':>8}")
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    for n in sizes:
+        r = measure(n, args.links, args.open)
+        results.append(r)
+        print(f"{n:>8} {r['links']:>8} {r['active_links']:>10} {r['compile_ms']:>10.1f} {r['top_blockers_ms']:>8.2f} "
+              f"{r['critical_path_ms']:>8.2f} {r['blockers_ms']:>11.3f} {r['sprint_blockage_ms']:>9.2f} {r['critical_path_length']:>8}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"options": vars(args), "results": results}, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+JiraIQ issue memory benchmark
+
+Builds N synthetic search results and measures the memory retained when
+they are held as raw JSON dicts, as `jira.resources.Issue` objects (what
+the tools kept before snapshots) and as `IssueSnapshot`s, along with the
+time each conversion takes. Issues carry only the fields the deep sprint
+analysis requests, the widest search the tools make.
+
+Usage:
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --sizes 1000,10000 --comments 8
+    python -m benchmarks.bench_memory --forms snapshot --sizes 1000000
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_jira import FakeJiraData, project_fields
+from jiraiq_search import TRIAGE_FIELDS
+from jiraiq_snapshot import snapshot_issue
+
+
+# Options Issue resources need when built without a live client
+RESOURCE_OPTIONS = {
+    "server": "",
+    "rest_path": "api",
+    "rest_api_version": "2",
+    "agile_rest_path": "agile",
+    "agile_rest_api_version": "1.0",
+}
+
+
+def make_issue_resource(raw):
+    from jira.resources import Issue
+    return Issue(RESOURCE_OPTIONS, None, raw=raw)
+
+
+FORMS = {
+    "raw": lambda raw: raw,
+    "resource": make_issue_resource,
+    "snapshot": snapshot_issue,
+}
+
+
+# Distinct synthetic issues generated; larger runs re-key copies of them
+POOL_SIZE = 2000
+
+
+def synthetic_pages(n, comments, page_size=100):
+    """Yield pages of search results as the JSON text Jira would send"""
+    data = FakeJiraData({"MEM": n}, comments_per_issue=comments)
+    pool = [project_fields(data._make_issue("MEM", i), TRIAGE_FIELDS) for i in range(1, min(n, POOL_SIZE) + 1)]
+    for start in range(1, n + 1, page_size):
+        end = min(start + page_size, n + 1)
+        yield json.dumps([{**pool[(i - 1) % len(pool)], "key": f"MEM-{i}"} for i in range(start, end)])
+
+
+def measure(form, n, comments):
+    """Retained bytes and decode+convert seconds for n issues held in one form"""
+    convert = FORMS[form]
+    gc.collect()
+
+    tracemalloc.start()
+    held = []
+    elapsed = 0.0
+    for text in synthetic_pages(n, comments):
+        # Only decoding and conversion are timed; each page's JSON is released
+        # afterwards, so what stays traced is what the held form references
+        started = time.perf_counter()
+        held.extend(convert(raw) for raw in json.loads(text))
+        elapsed += time.perf_counter() - started
+        del text
+
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    gc.collect()
+
+    return {"form": form, "issues": n, "retained_bytes": retained, "peak_bytes": peak, "convert_seconds": round(elapsed, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated issue counts")
+    parser.add_argument("--forms", default=",".join(FORMS), help=f"Comma-separated forms ({', '.join(FORMS)})")
+    parser.add_argument("--comments", type=int, default=4, help="Average comments per issue")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    forms = [f.strip() for f in args.forms.split(",") if f.strip()]
+    unknown = [f for f in forms if f not in FORMS]
+    if unknown:
+        parser.error(f"unknown form(s): {', '.join(unknown)}; choose from {', '.join(FORMS)}")
+
+    print(f"JiraIQ issue memory ({args.comments} comments per issue on average)\n")
+    header = f"{'issues':>8}  {'form':<9} {'retained MiB':>12} {'bytes/issue':>12} {'decode+convert s':>16}"
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    for n in sizes:
+        for form in forms:
+            result = measure(form, n, args.comments)
+            results.append(result)
+            print(
+                f"{n:>8}  {form:<9} {result['retained_bytes'] / 2**20:>12.1f} "
+                f"{result['retained_bytes'] / n:>12,.0f} {result['convert_seconds']:>16.2f}"
+            )
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"options": vars(args), "results": results}, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+JiraIQ similar issues benchmark
+
+Fills a similarity index (memory-mapped vectors in a temporary directory)
+with synthetic issues drawn from a few hundred topics, then times the
+incremental inserts, single and batched top-k queries, and the duplicate
+clustering find_blocked_issues runs over its results.
+
+Usage:
+    python -m benchmarks.bench_similar
+    python -m benchmarks.bench_similar --sizes 10000,100000 --batch 32 --limit 10
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jiraiq_similar import SimilarityIndex, HashedTfidf, SimilarDoc, duplicate_groups, issue_text, DEFAULT_DIM
+
+WORDS = (
+    "login sso redirect timeout database migration deploy pipeline cache invalidation search index "
+    "latency memory leak crash mobile android ios payment checkout refund invoice email notification "
+    "export csv report dashboard chart permission role admin audit token expiry session cookie upload "
+    "image resize queue worker retry webhook api rate limit pagination filter sort locale translation "
+    "timezone scheduler cron backup restore replica failover dns certificate tls proxy gateway build "
+    "flaky test coverage lint dependency upgrade kubernetes pod node autoscaling metrics alert oncall"
+).split()
+
+
+def synthetic_docs(n, topics, seed=11):
+    """Issues whose text mixes a topic's words with noise, so issues on one topic look alike"""
+    rng = random.Random(seed)
+    themes = [rng.sample(WORDS, 6) for _ in range(topics)]
+    for i in range(1, n + 1):
+        theme = themes[rng.randrange(topics)]
+        summary = " ".join(rng.sample(theme, 4))
+        description = " ".join(rng.choice(theme if rng.random() < 0.5 else WORDS) for _ in range(30))
+        yield SimilarDoc(f"BIG-{i}", "BIG", summary, "In Progress", rng.random() < 0.3,
+                         issue_text(summary, description, []))
+
+
+def timed(fn, repeat=5):
+    """Best of `repeat` runs in milliseconds, and the last result"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+
+def measure(n, dim, batch, limit, topics):
+    docs = list(synthetic_docs(n, topics))
+    with tempfile.TemporaryDirectory() as path:
+        index = SimilarityIndex(path, HashedTfidf(dim))
+        started = time.perf_counter()
+        for i in range(0, n, 500):
+            index.upsert(docs[i:i + 500])
+        insert_s = time.perf_counter() - started
+
+        # A second pass over unchanged issues is what a delta sync mostly sees
+        started = time.perf_counter()
+        index.upsert(docs[:min(n, 5000)])
+        unchanged_ms = (time.perf_counter() - started) * 1000
+
+        probe = index.vector(docs[-1].key)
+        queries = index.embed([doc.text for doc in docs[:batch]])
+        single_ms, matches = timed(lambda: index.search(probe, limit, exclude={docs[-1].key}))
+        batch_ms, _ = timed(lambda: index.search(queries, limit))
+        text_ms, _ = timed(lambda: index.search(index.embed(["login sso redirect timeout"]), limit))
+        blocked = queries[:min(200, len(queries))]
+        cluster_ms, groups = timed(lambda: duplicate_groups(blocked, 0.8))
+        return {
+            "issues": n,
+            "insert_per_s": round(n / insert_s),
+            "unchanged_ms_per_1k": round(unchanged_ms / min(n, 5000) * 1000, 2),
+            "query_ms": single_ms,
+            "batch_query_ms": batch_ms,
+            "batch_ms_per_query": round(batch_ms / batch, 3),
+            "text_query_ms": text_ms,
+            "cluster_ms": cluster_ms,
+            "top_score": round(matches[0][0].score, 3) if matches[0] else None,
+            "matrix_mb": round(index.summary()["capacity"] * dim * 4 / 1e6, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated issue counts")
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Vector dimensions")
+    parser.add_argument("--batch", type=int, default=32, help="Query vectors per batched search")
+    parser.add_argument("--limit", type=int, default=10, help="Matches per query")
+    parser.add_argument("--topics", type=int, default=300, help="Distinct topics the issues are drawn from")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    print(f"JiraIQ similar issues ({args.dim} dims, top {args.limit}, batches of {args.batch})\n")
+    header = (f"{'issues':>8} {'inserts/s':>10} {'unchanged/1k ms':>15} {'query ms':>9} {'batch ms':>9} "
+              f"{'per query':>9} {'text ms':>8} {'cluster ms':>10} {'matrix MB':>9}")
+    print(header)
+    print("-" * len(header))
+
+    results = []
+    for n in sizes:
+        r = measure(n, args.dim, args.batch, args.limit, args.topics)
+        results.append(r)
+        print(f"{n:>8} {r['insert_per_s']:>10} {r['unchanged_ms_per_1k']:>15.2f} {r['query_ms']:>9.2f} "
+              f"{r['batch_query_ms']:>9.2f} {r['batch_ms_per_query']:>9.3f} {r['text_query_ms']:>8.2f} "
+              f"{r['cluster_ms']:>10.2f} {r['matrix_mb']:>9.1f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"options": vars(args), "results": results}, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
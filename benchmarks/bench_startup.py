@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+JiraIQ cold-start benchmark
+
+Launches the stdio server the way an MCP client does, performs the
+initialize handshake and measures the time until the first `list_tools`
+response, then reports resident memory once the server has sat idle
+(after the background warm-up has run).
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --warmup off
+    python -m benchmarks.bench_startup --max-list-tools-ms 1500   # exit 1 if slower
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+SERVER = Path(__file__).resolve().parent.parent / "jiraiq_server.py"
+
+
+def rss_kib(pid):
+    """Resident set size of a process in KiB (Linux /proc, else psutil if installed)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process(pid).memory_info().rss // 1024
+
+
+def send(process, message):
+    process.stdin.write(json.dumps(message) + "\n")
+    process.stdin.flush()
+
+
+def receive(process, request_id):
+    """Read JSON-RPC lines until the response to request_id arrives"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited before responding")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+
+
+def measure(warmup, idle):
+    env = {
+        **os.environ,
+        "JIRAIQ_WARMUP": warmup,
+        "JIRA_URL": os.getenv("JIRA_URL", "http://127.0.0.1:9"),
+        "ANTHROPIC_API_KEY": os.getenv("ANTHROPIC_API_KEY", "bench"),
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(SERVER)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, env=env,
+    )
+    try:
+        send(process, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2025-06-18",
+                "capabilities": {},
+                "clientInfo": {"name": "jiraiq-bench", "version": "1.0"},
+            },
+        })
+        receive(process, 1)
+        initialized = time.perf_counter() - started
+
+        send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = receive(process, 2)["result"]["tools"]
+        listed = time.perf_counter() - started
+        rss_ready = rss_kib(process.pid)
+
+        time.sleep(idle)
+        rss_idle = rss_kib(process.pid)
+    finally:
+        process.kill()
+        process.wait()
+
+    return {
+        "initialize_ms": initialized * 1000,
+        "list_tools_ms": listed * 1000,
+        "tools": len(tools),
+        "rss_ready_kib": rss_ready,
+        "rss_idle_kib": rss_idle,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Server launches to measure")
+    parser.add_argument("--warmup", choices=["imports", "clients", "off"], default="imports",
+                        help="JIRAIQ_WARMUP setting for the launched server")
+    parser.add_argument("--idle", type=float, default=3.0, help="Seconds to wait before sampling idle RSS")
+    parser.add_argument("--max-list-tools-ms", type=float, help="Exit with status 1 if the median exceeds this")
+    args = parser.parse_args()
+
+    runs = [measure(args.warmup, args.idle) for _ in range(args.runs)]
+
+    def median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    print(f"JiraIQ cold start ({args.runs} runs, warm-up: {args.warmup})\n")
+    print(f"  initialize response   {median('initialize_ms'):8.0f} ms")
+    print(f"  first list_tools      {median('list_tools_ms'):8.0f} ms   ({runs[0]['tools']} tools)")
+    for label, key in (("RSS after list_tools", "rss_ready_kib"), ("RSS at idle", "rss_idle_kib")):
+        value = median(key)
+        print(f"  {label:<21} {value / 1024:8.1f} MiB" if value else f"  {label:<21}      n/a")
+
+    if args.max_list_tools_ms and median("list_tools_ms") > args.max_list_tools_ms:
+        print(f"\n❌ list_tools took longer than {args.max_list_tools_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
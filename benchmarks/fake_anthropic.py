@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Fake Anthropic Messages API for offline benchmarks
+
+Answers POST /v1/messages (plain and streaming) with a canned analysis
+after a configurable delay. Message batches (POST /v1/messages/batches)
+end after --batch-latency seconds and serve the same analysis for every
+request as JSONL results. Call and token counters are available at
+GET /__stats.
+
+Usage:
+    python -m benchmarks.fake_anthropic --port 8082 --latency 1.5
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fake_jira import RateLimiter
+
+
+ANALYSIS = """1. Team Sentiment: Neutral - the team is making progress but frustration is building.
+2. Active Blockers: YES - waiting on the platform team for a config patch.
+3. Biggest Risk: The database query timeout may slip the release.
+4. Actionable Recommendation: Escalate the config patch to the platform lead today."""
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 1.0
+    first_token_latency = 0.3
+    output_tokens = 120
+    batch_latency = 2.0
+    limiter = RateLimiter()
+    stats = None
+    stats_lock = threading.Lock()
+    batches = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/__stats":
+            with self.stats_lock:
+                return self._send_json(self.stats)
+        if self.path.startswith("/v1/messages/batches/"):
+            batch_id, _, rest = self.path[len("/v1/messages/batches/"):].partition("/")
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return self._send_json({"type": "error", "error": {"type": "not_found_error", "message": batch_id}}, 404)
+            if rest == "results":
+                return self._send_results(batch)
+            return self._send_json(self._batch(batch))
+        if self.path.split("?")[0] == "/v1/messages/batches":
+            batches = sorted(self.batches.values(), key=lambda b: b["created"], reverse=True)
+            data = [self._batch(batch) for batch in batches[:20]]
+            return self._send_json({
+                "data": data, "has_more": len(batches) > 20,
+                "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None,
+            })
+        self._send_json({"type": "error", "error": {"type": "not_found_error", "message": self.path}}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path == "/__reset":
+            with self.stats_lock:
+                self.stats.update(new_stats())
+            return self._send_json({})
+
+        if self.path == "/v1/messages/batches":
+            return self._create_batch(request)
+
+        if not self.path.startswith("/v1/messages"):
+            return self._send_json({"type": "error", "error": {"type": "not_found_error", "message": self.path}}, 404)
+
+        allowed, remaining, reset = self.limiter.take()
+        if not allowed:
+            with self.stats_lock:
+                self.stats["throttled"] += 1
+            return self._send_json(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Number of requests has exceeded your rate limit"}},
+                429,
+                headers={
+                    "retry-after": "1",
+                    "anthropic-ratelimit-requests-limit": str(self.limiter.rate),
+                    "anthropic-ratelimit-requests-remaining": "0",
+                    "anthropic-ratelimit-requests-reset": reset.isoformat().replace("+00:00", "Z"),
+                },
+            )
+
+        input_tokens = len(json.dumps(request.get("messages", []))) // 4
+        with self.stats_lock:
+            self.stats["calls"] += 1
+            self.stats["input_tokens"] += input_tokens
+            self.stats["output_tokens"] += self.output_tokens
+            self.stats["streamed"] += bool(request.get("stream"))
+
+        if request.get("stream"):
+            return self._stream(request, input_tokens)
+
+        time.sleep(self.latency)
+        self._send_json(self._message(request, input_tokens, ANALYSIS))
+
+    def _message(self, request, input_tokens, text):
+        return {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "claude-fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": self.output_tokens},
+        }
+
+    def _create_batch(self, request):
+        batch = {
+            "id": f"msgbatch_{uuid.uuid4().hex[:24]}",
+            "created": datetime.now(timezone.utc),
+            "requests": request.get("requests", []),
+        }
+        self.batches[batch["id"]] = batch
+        with self.stats_lock:
+            self.stats["batches"] += 1
+            self.stats["batch_requests"] += len(batch["requests"])
+        self._send_json(self._batch(batch))
+
+    def _batch(self, batch):
+        ended = datetime.now(timezone.utc) - batch["created"] >= timedelta(seconds=self.batch_latency)
+        n = len(batch["requests"])
+        iso = lambda when: when.isoformat().replace("+00:00", "Z") if when else None
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else n,
+                "succeeded": n if ended else 0,
+                "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": iso(batch["created"]),
+            "expires_at": iso(batch["created"] + timedelta(days=1)),
+            "ended_at": iso(batch["created"] + timedelta(seconds=self.batch_latency)) if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"http://{self.headers['Host']}/v1/messages/batches/{batch['id']}/results" if ended else None,
+        }
+
+    def _send_results(self, batch):
+        lines = []
+        for item in batch["requests"]:
+            params = item.get("params", {})
+            input_tokens = len(json.dumps(params.get("messages", []))) // 4
+            with self.stats_lock:
+                self.stats["input_tokens"] += input_tokens
+                self.stats["output_tokens"] += self.output_tokens
+            lines.append(json.dumps({
+                "custom_id": item["custom_id"],
+                "result": {"type": "succeeded", "message": self._message(params, input_tokens, ANALYSIS)},
+            }))
+        body = ("\n".join(lines) + "\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request, input_tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(name, data):
+            chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+
+        message = self._message(request, input_tokens, "")
+        message["content"] = []
+        message["stop_reason"] = None
+        message["usage"]["output_tokens"] = 0
+        event("message_start", {"type": "message_start", "message": message})
+        event("content_block_start", {"type": "content_block_start", "index": 0,
+                                      "content_block": {"type": "text", "text": ""}})
+
+        time.sleep(self.first_token_latency)
+        words = ANALYSIS.split(" ")
+        per_word = max(self.latency - self.first_token_latency, 0) / len(words)
+        for i, word in enumerate(words):
+            text = word if i == 0 else " " + word
+            event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                          "delta": {"type": "text_delta", "text": text}})
+            time.sleep(per_word)
+
+        event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        event("message_delta", {"type": "message_delta",
+                                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                "usage": {"output_tokens": self.output_tokens}})
+        event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def new_stats():
+    return {"calls": 0, "streamed": 0, "throttled": 0, "input_tokens": 0, "output_tokens": 0,
+            "batches": 0, "batch_requests": 0}
+
+
+def make_server(host="127.0.0.1", port=0, latency=1.0, first_token_latency=0.3, output_tokens=120, rate_limit=0,
+                batch_latency=2.0):
+    """Build (but do not start) a fake Anthropic server"""
+    handler = type("Handler", (FakeAnthropicHandler,), {
+        "limiter": RateLimiter(rate_limit),
+        "batch_latency": batch_latency,
+        "batches": {},
+        "latency": latency,
+        "first_token_latency": min(first_token_latency, latency),
+        "output_tokens": output_tokens,
+        "stats": new_stats(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds per response")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="Seconds before streaming starts")
+    parser.add_argument("--output-tokens", type=int, default=120, help="Output tokens reported per call")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before answering 429")
+    parser.add_argument("--batch-latency", type=float, default=2.0, help="Seconds before a message batch ends")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.first_token_latency, args.output_tokens,
+                         args.rate_limit, args.batch_latency)
+    print(f"Fake Anthropic listening on http://{args.host}:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Fake Jira REST server for offline benchmarks
+
+Serves deterministic synthetic projects over the subset of the Jira REST
+API that JiraIQ uses, with configurable issue counts, comment volume and
+latency. Request and byte counters are available at GET /__stats.
+
+Usage:
+    python -m benchmarks.fake_jira --port 8081 --projects ENG=500,OPS=200
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+STATUSES = ["To Do", "In Progress", "In Review", "Blocked", "Done"]
+STATUS_WEIGHTS = [30, 35, 15, 8, 12]
+STATUS_OBJECTS = {
+    name: {"id": status_id, "name": name, "statusCategory": {"key": category}}
+    for name, status_id, category in [
+        ("To Do", "1", "new"), ("In Progress", "3", "indeterminate"), ("In Review", "10001", "indeterminate"),
+        ("Blocked", "10002", "indeterminate"), ("Done", "10003", "done"),
+    ]
+}
+# Workflow steps an issue took to reach its current status
+STATUS_PATHS = {
+    "To Do": [],
+    "In Progress": ["In Progress"],
+    "In Review": ["In Progress", "In Review"],
+    "Blocked": ["In Progress", "Blocked"],
+    "Done": ["In Progress", "In Review", "Done"],
+}
+PRIORITIES = ["Highest", "High", "Medium", "Low"]
+PEOPLE = [f"Engineer {i}" for i in range(1, 16)]
+# Routine discussion: nothing here reads as a blocker or a risk
+WORDS = (
+    "the deploy pipeline is ready for review and the api returns an error when the "
+    "database query times out so we need a config patch before release the platform "
+    "team merged the fix stack trace attached looks good to me will retest"
+).split()
+# Closing sentences of the comments on troubled issues
+BLOCKER_PHRASES = [
+    "We are blocked by the platform team.",
+    "Still waiting on the vendor for a fix.",
+    "Stuck until the config patch lands.",
+    "This may slip the release deadline.",
+    "Escalating, we are behind schedule.",
+]
+LOG_LINE = "2026-01-01 10:00:00 ERROR com.example.Service - request failed status=500"
+
+# How an issue has been going: routine work most of the time, with some busy,
+# troubled or forgotten issues, so local triage has something to tell apart
+MOODS = ["quiet", "busy", "troubled", "idle"]
+MOOD_WEIGHTS = [55, 15, 20, 10]
+
+# The fake "now": every timestamp is relative to it, so the data never changes between
+# runs. Set JIRAIQ_NOW to jira_time(BASE_TIME) so JiraIQ measures ages from the same instant
+BASE_TIME = datetime(2026, 1, 5, 9, 0, tzinfo=timezone.utc)
+
+# One closed and one active sprint per project
+SPRINTS = {
+    "closed": (1, "Sprint 1", BASE_TIME - timedelta(days=24), BASE_TIME - timedelta(days=10)),
+    "active": (2, "Sprint 2", BASE_TIME - timedelta(days=10), BASE_TIME + timedelta(days=4)),
+}
+
+
+def jira_time(dt):
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000+0000")
+
+
+class RateLimiter:
+    """Quota of `rate` requests per one-second window (0 = unlimited)"""
+
+    def __init__(self, rate=0):
+        self.rate = rate
+        self.window = 0
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Use one request; return (allowed, remaining, reset time as a datetime)"""
+        if not self.rate:
+            return True, None, None
+        with self.lock:
+            now = time.time()
+            if int(now) != self.window:
+                self.window, self.used = int(now), 0
+            reset = datetime.fromtimestamp(self.window + 1, timezone.utc)
+            if self.used >= self.rate:
+                return False, 0, reset
+            self.used += 1
+            return True, self.rate - self.used, reset
+
+
+class FakeJiraData:
+    """Deterministic synthetic issues for a set of projects"""
+
+    def __init__(self, projects, comments_per_issue=4, comment_words=40, seed=7):
+        self.projects = projects
+        self.comments_per_issue = comments_per_issue
+        self.comment_words = comment_words
+        self.seed = seed
+        self._issues = {}
+        self._lock = threading.Lock()
+
+    def issues(self, project):
+        with self._lock:
+            if project not in self._issues:
+                count = self.projects.get(project, 0)
+                self._issues[project] = [self._make_issue(project, n) for n in range(1, count + 1)]
+            return self._issues[project]
+
+    def issue(self, key):
+        project, _, number = key.partition("-")
+        issues = self.issues(project)
+        if not number.isdigit() or not 1 <= int(number) <= len(issues):
+            return None
+        return issues[int(number) - 1]
+
+    def _make_issue(self, project, n):
+        rng = random.Random(f"{self.seed}-{project}-{n}")
+        created = BASE_TIME - timedelta(days=rng.randint(1, 90), minutes=rng.randint(0, 1440))
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        mood = "troubled" if status == "Blocked" else rng.choices(MOODS, MOOD_WEIGHTS)[0]
+
+        # Comments run from creation up to the issue's last activity
+        idle_days = {"quiet": rng.randint(1, 10), "busy": 0, "troubled": rng.randint(0, 5), "idle": rng.randint(15, 45)}[mood]
+        last = max(created + timedelta(hours=1), BASE_TIME - timedelta(days=idle_days, minutes=rng.randint(0, 600)))
+        count = rng.randint(0, self.comments_per_issue * 2)
+        if mood == "busy":
+            count = max(count, 4)
+        elif mood == "troubled":
+            count = max(count, 1)
+        times = sorted(
+            last - timedelta(hours=rng.randint(0, 96)) if mood == "busy"
+            else created + (last - created) * rng.random()
+            for _ in range(count)
+        )
+        if times:
+            times[-1] = last
+
+        comments = []
+        for c, when in enumerate(times):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(self.comment_words // 2, self.comment_words * 2))]
+            body = " ".join(words).capitalize() + "."
+            if mood == "troubled" and c == len(times) - 1:
+                body += " " + rng.choice(BLOCKER_PHRASES)
+            if rng.random() < 0.05:
+                body += "\n{noformat}\n" + "\n".join([LOG_LINE] * rng.randint(20, 200)) + "\n{noformat}"
+            comments.append({
+                "id": f"{n}{c:04d}",
+                "author": {"displayName": rng.choice(PEOPLE)},
+                "body": body,
+                "created": jira_time(when),
+                "updated": jira_time(when),
+            })
+
+        links = []
+        if n > 1 and rng.random() < 0.15:
+            target = rng.randint(1, n - 1)
+            links.append({
+                "id": f"{n}9",
+                "type": {"name": "Blocks", "inward": "is blocked by", "outward": "blocks"},
+                "inwardIssue": {"key": f"{project}-{target}"},
+            })
+
+        sprint_state = rng.choices(["active", "closed", None], [70, 20, 10])[0]
+        sprints = [self.sprint(project, sprint_state)] if sprint_state else []
+
+        return {
+            "id": str(abs(hash((project, n))) % 10**8),
+            "key": f"{project}-{n}",
+            "self": f"/rest/api/2/issue/{project}-{n}",
+            "fields": {
+                "summary": f"{rng.choice(['Fix', 'Build', 'Investigate', 'Migrate'])} "
+                           f"{rng.choice(['login', 'billing', 'search', 'export', 'sync'])} "
+                           f"{rng.choice(['flow', 'service', 'job', 'report'])} #{n}",
+                "description": " ".join(rng.choice(WORDS) for _ in range(60)),
+                "issuetype": {"name": rng.choice(["Story", "Bug", "Task"])},
+                "status": STATUS_OBJECTS[status],
+                "priority": {"name": rng.choices(PRIORITIES, [20, 30, 30, 20] if mood == "troubled" else [5, 15, 45, 35])[0]},
+                "assignee": {"displayName": rng.choice(PEOPLE)} if rng.random() < 0.85 else None,
+                "labels": ["blocked"] if mood == "troubled" and rng.random() < 0.4 else [],
+                "created": jira_time(created),
+                "updated": jira_time(last),
+                "comment": {"comments": comments, "total": len(comments)},
+                "issuelinks": links,
+                "customfield_10020": sprints,
+            },
+            "changelog": self._make_changelog(project, n, created, status, sprints),
+        }
+
+    def sprint(self, project, state):
+        sprint_id, name, start, end = SPRINTS[state]
+        return {
+            "id": sprint_id + 100 * (sorted(self.projects).index(project) if project in self.projects else 0),
+            "name": f"{project} {name}", "state": state,
+            "startDate": jira_time(start), "endDate": jira_time(end),
+        }
+
+    def _make_changelog(self, project, n, created, status, sprints):
+        """Status transitions leading to the current status, plus sprint scope changes"""
+        rng = random.Random(f"{self.seed}-{project}-{n}-changelog")
+        events = []
+
+        def sprint_item(before, after):
+            return {
+                "field": "Sprint", "fieldtype": "custom",
+                "from": str(before["id"]) if before else "", "fromString": before["name"] if before else "",
+                "to": str(after["id"]) if after else "", "toString": after["name"] if after else "",
+            }
+
+        if sprints:
+            sprint = sprints[0]
+            start = datetime.strptime(sprint["startDate"], "%Y-%m-%dT%H:%M:%S.000+0000").replace(tzinfo=timezone.utc)
+            # Most issues are planned in before the sprint starts; some are added mid-sprint
+            if rng.random() < 0.8:
+                added = created + timedelta(hours=rng.randint(0, 24))
+            else:
+                added = max(created, start) + timedelta(hours=rng.randint(1, 72))
+            events.append((added, sprint_item(None, sprint)))
+        elif rng.random() < 0.3:
+            # Pulled into the active sprint, then dropped from it again
+            sprint = self.sprint(project, "active")
+            start = datetime.strptime(sprint["startDate"], "%Y-%m-%dT%H:%M:%S.000+0000").replace(tzinfo=timezone.utc)
+            added = created + timedelta(hours=rng.randint(0, 24))
+            events.append((added, sprint_item(None, sprint)))
+            events.append((max(added, start) + timedelta(hours=rng.randint(1, 96)), sprint_item(sprint, None)))
+
+        when = created
+        previous = "To Do"
+        for step in STATUS_PATHS[status]:
+            when = min(when + timedelta(hours=rng.randint(2, 96)), BASE_TIME)
+            before, after = STATUS_OBJECTS[previous], STATUS_OBJECTS[step]
+            events.append((when, {
+                "field": "status", "fieldtype": "jira",
+                "from": before["id"], "fromString": previous, "to": after["id"], "toString": step,
+            }))
+            previous = step
+
+        events.sort(key=lambda event: event[0])
+        histories = [
+            {"id": str(n * 100 + i), "author": {"displayName": "Fake User"}, "created": jira_time(when), "items": [item]}
+            for i, (when, item) in enumerate(events, 1)
+        ]
+        return {"startAt": 0, "maxResults": len(histories), "total": len(histories), "histories": histories}
+
+    def search(self, jql):
+        """Evaluate the handful of JQL shapes JiraIQ sends"""
+        projects = re.findall(r"project\s*=\s*\"?([A-Z][A-Z0-9]*)", jql)
+        in_list = re.search(r"project\s+in\s*\(([^)]*)\)", jql)
+        if in_list:
+            projects += [p.strip().strip('"') for p in in_list.group(1).split(",")]
+        elif re.search(r"filter\s*=\s*\d+", jql):
+            # Every saved filter matches the whole fake instance
+            projects += list(self.projects)
+
+        results = []
+        for project in projects:
+            for issue in self.issues(project):
+                fields = issue["fields"]
+                if "status != Done" in jql and fields["status"]["name"] == "Done":
+                    continue
+                if "openSprints()" in jql and not any(s["state"] == "active" for s in fields["customfield_10020"]):
+                    continue
+                sprint = re.search(r'sprint\s*=\s*"([^"]+)"', jql)
+                if sprint and not any(s["name"] == sprint.group(1) for s in fields["customfield_10020"]):
+                    continue
+                if '~ "blocked"' in jql and not (
+                    "blocked" in fields["labels"]
+                    or fields["status"]["name"] == "Blocked"
+                    or "blocked" in fields["description"]
+                    or any("blocked" in c["body"] for c in fields["comment"]["comments"])
+                ):
+                    continue
+                results.append(issue)
+        return results
+
+
+def project_fields(issue, fields, expand=()):
+    if "changelog" not in expand:
+        issue = {k: v for k, v in issue.items() if k != "changelog"}
+    if not fields or "*all" in fields or "*navigable" in fields:
+        return issue
+    return {**issue, "fields": {k: v for k, v in issue["fields"].items() if k in fields}}
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    data = None
+    latency = 0.0
+    deployment = "Server"
+    max_page = 0
+    limiter = RateLimiter()
+    stats = None
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _params(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if self.command == "POST":
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                body = json.loads(self.rfile.read(length))
+                for key, value in body.items():
+                    params[key] = value if isinstance(value, list) else [value]
+        return url.path, params
+
+    def _send(self, payload, status=200, endpoint="other", headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in {**getattr(self, "rate_headers", {}), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(body)
+            self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+            self.stats["throttled"] += status == 429
+
+    def do_GET(self):
+        path, params = self._params()
+
+        if path == "/__stats":
+            with self.stats_lock:
+                body = json.dumps(self.stats).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # Jira Cloud style rate limiting
+        allowed, remaining, reset = self.limiter.take()
+        self.rate_headers = {}
+        if reset is not None:
+            self.rate_headers = {
+                "X-RateLimit-Limit": str(self.limiter.rate),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": reset.isoformat().replace("+00:00", "Z"),
+            }
+        if not allowed:
+            return self._send({"errorMessages": ["Rate limit exceeded"]}, 429, endpoint="throttled",
+                              headers={"Retry-After": "1"})
+
+        time.sleep(self.latency)
+        fields = [f for value in params.get("fields", []) for f in str(value).split(",") if f]
+        max_results = int(params.get("maxResults", ["50"])[0])
+        if self.max_page:
+            # Like Jira's server-side cap: fewer rows than asked for, whatever maxResults says
+            max_results = min(max_results, self.max_page)
+        expand = [e for value in params.get("expand", []) for e in str(value).split(",") if e]
+
+        if path.endswith("/serverInfo"):
+            return self._send({
+                "baseUrl": "http://fake-jira", "version": "9.12.0", "versionNumbers": [9, 12, 0],
+                "deploymentType": self.deployment, "buildNumber": 1, "serverTitle": "Fake Jira",
+            }, endpoint="serverInfo")
+        if path.endswith("/myself"):
+            return self._send({"name": "bench", "displayName": "Bench User"}, endpoint="myself")
+        if path.endswith("/field"):
+            return self._send([], endpoint="field")
+        if path.endswith("/status"):
+            return self._send(list(STATUS_OBJECTS.values()), endpoint="status")
+
+        match = re.search(r"/sprint/(\d+)$", path)
+        if match:
+            sprint_id = int(match.group(1))
+            for project in sorted(self.data.projects):
+                for state in SPRINTS:
+                    sprint = self.data.sprint(project, state)
+                    if sprint["id"] == sprint_id:
+                        return self._send(sprint, endpoint="sprint")
+            return self._send({"errorMessages": ["Sprint does not exist"]}, 404, endpoint="sprint")
+
+        match = re.search(r"/issue/([A-Z][A-Z0-9]*-\d+)$", path)
+        if match:
+            issue = self.data.issue(match.group(1))
+            if issue is None:
+                return self._send({"errorMessages": ["Issue does not exist"]}, 404, endpoint="issue")
+            return self._send(project_fields(issue, fields, expand), endpoint="issue")
+
+        if path.endswith("/search/jql"):
+            matches = self.data.search(params.get("jql", [""])[0])
+            start = int(params.get("nextPageToken", ["0"])[0] or 0)
+            page = matches[start:start + max_results]
+            payload = {"issues": [project_fields(i, fields, expand) for i in page], "isLast": start + max_results >= len(matches)}
+            if not payload["isLast"]:
+                payload["nextPageToken"] = str(start + max_results)
+            return self._send(payload, endpoint="search")
+
+        if path.endswith("/search"):
+            matches = self.data.search(params.get("jql", [""])[0])
+            start = int(params.get("startAt", ["0"])[0])
+            page = matches[start:start + max_results]
+            return self._send({
+                "startAt": start, "maxResults": max_results, "total": len(matches),
+                "issues": [project_fields(i, fields, expand) for i in page],
+            }, endpoint="search")
+
+        self._send({"errorMessages": [f"No fake for {path}"]}, 404)
+
+    def do_POST(self):
+        if self.path == "/__reset":
+            with self.stats_lock:
+                self.stats.update(new_stats())
+            return self._send({})
+        self.do_GET()
+
+
+def new_stats():
+    return {"requests": 0, "bytes": 0, "throttled": 0, "by_endpoint": {}}
+
+
+def make_server(host="127.0.0.1", port=0, projects=None, comments_per_issue=4,
+                comment_words=40, latency=0.0, deployment="Server", rate_limit=0, max_page=0):
+    """Build (but do not start) a fake Jira server"""
+    handler = type("Handler", (FakeJiraHandler,), {
+        "data": FakeJiraData(projects or {"ENG": 200}, comments_per_issue, comment_words),
+        "latency": latency,
+        "deployment": deployment,
+        "max_page": max_page,
+        "limiter": RateLimiter(rate_limit),
+        "stats": new_stats(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_projects(value):
+    return {key.upper(): int(count) for key, count in (p.split("=") for p in value.split(","))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--projects", default="ENG=200", help="KEY=issue_count pairs, comma separated")
+    parser.add_argument("--comments", type=int, default=4, help="Average comments per issue")
+    parser.add_argument("--comment-words", type=int, default=40, help="Average words per comment")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every request")
+    parser.add_argument("--cloud", action="store_true", help="Behave like Jira Cloud (token paging)")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before answering 429")
+    parser.add_argument("--max-page", type=int, default=0, help="Most issues one search page returns, whatever maxResults asks")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, parse_projects(args.projects), args.comments,
+        args.comment_words, args.latency, "Cloud" if args.cloud else "Server", args.rate_limit,
+        args.max_page,
+    )
+    print(f"Fake Jira listening on http://{args.host}:{server.server_port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
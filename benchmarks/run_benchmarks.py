@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+JiraIQ offline benchmarks
+
+Starts the fake Jira and Anthropic servers in a child process, points the
+MCP server at them and drives each tool through `call_tool`, reporting
+p50/p95 latency, throughput at the chosen concurrency, peak traced memory
+and the Jira/Anthropic calls each tool invocation made.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --issues 2000 --jira-latency 0.1 --concurrency 16
+    python -m benchmarks.run_benchmarks --tools analyze_jira_issue --json bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import fake_anthropic, fake_jira
+
+
+PROJECT = "ENG"
+
+# Tool name -> (MCP tool, arguments for the i-th call)
+SCENARIOS = {
+    "analyze_jira_issue": ("analyze_jira_issue", lambda i, n: {"issue_key": f"{PROJECT}-{i % n + 1}", "template": "executive"}),
+    "find_blocked_issues": ("find_blocked_issues", lambda i, n: {"project_key": PROJECT}),
+    "analyze_sprint": ("analyze_sprint", lambda i, n: {"project_key": PROJECT}),
+    "analyze_sprint_deep": ("analyze_sprint", lambda i, n: {"project_key": PROJECT, "deep": True, "max_issues": 20}),
+    "analyze_sprint_deep_untriaged": ("analyze_sprint", lambda i, n: {"project_key": PROJECT, "deep": True, "max_issues": 20, "triage": False}),
+}
+
+
+def serve_fakes(conn, options):
+    """Child process: run both fake servers until terminated"""
+    jira = fake_jira.make_server(
+        projects={PROJECT: options["issues"]},
+        comments_per_issue=options["comments"],
+        comment_words=options["comment_words"],
+        latency=options["jira_latency"],
+        deployment="Cloud" if options["cloud"] else "Server",
+        rate_limit=options["jira_rate_limit"],
+    )
+    anthropic = fake_anthropic.make_server(
+        latency=options["llm_latency"],
+        output_tokens=options["output_tokens"],
+        rate_limit=options["llm_rate_limit"],
+    )
+    # Build the synthetic project up front so generation is not timed
+    jira.RequestHandlerClass.data.issues(PROJECT)
+    for server in (jira, anthropic):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    conn.send((jira.server_port, anthropic.server_port))
+    threading.Event().wait()
+
+
+def fake_stats(url):
+    with urllib.request.urlopen(f"{url}/__stats") as response:
+        return json.load(response)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+async def run_scenario(server, name, iterations, concurrency, distinct, warm, jira_url, anthropic_url):
+    """Run one tool `iterations` times and collect latency, throughput and call counts"""
+    tool, make_args = SCENARIOS[name]
+    server.get_analysis_cache().clear()
+
+    # Warm-up call so client construction and imports are not counted
+    await server.call_tool(tool, make_args(0, distinct))
+    if not warm:
+        server.get_analysis_cache().clear()
+
+    jira_before = fake_stats(jira_url)
+    llm_before = fake_stats(anthropic_url)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            result = await server.call_tool(tool, make_args(i, distinct))
+            latencies.append(time.perf_counter() - started)
+            if result[0].text.startswith("Error executing"):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    wall = time.perf_counter() - started
+
+    jira_after = fake_stats(jira_url)
+    llm_after = fake_stats(anthropic_url)
+
+    # Peak memory of a single call, measured separately so tracing does not skew latency
+    if not warm:
+        server.get_analysis_cache().clear()
+    tracemalloc.start()
+    await server.call_tool(tool, make_args(0, distinct))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "tool": name,
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "throughput_per_s": round(iterations / wall, 2),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "jira_requests_per_call": round((jira_after["requests"] - jira_before["requests"]) / iterations, 2),
+        "jira_kib_per_call": round((jira_after["bytes"] - jira_before["bytes"]) / iterations / 1024, 1),
+        "throttled_per_call": round(
+            (jira_after["throttled"] - jira_before["throttled"] + llm_after["throttled"] - llm_before["throttled"]) / iterations, 2
+        ),
+        "llm_calls_per_call": round((llm_after["calls"] - llm_before["calls"]) / iterations, 2),
+        "llm_input_tokens_per_call": round((llm_after["input_tokens"] - llm_before["input_tokens"]) / iterations),
+    }
+
+
+def print_table(results):
+    columns = [
+        ("tool", "Tool"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"),
+        ("throughput_per_s", "calls/s"), ("peak_memory_kib", "peak KiB"),
+        ("jira_requests_per_call", "Jira req"), ("jira_kib_per_call", "Jira KiB"),
+        ("llm_calls_per_call", "LLM calls"), ("llm_input_tokens_per_call", "LLM in tok"),
+        ("throttled_per_call", "429s"), ("errors", "errors"),
+    ]
+    rows = [[title for _, title in columns]] + [[str(r[key]) for key, _ in columns] for r in results]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for n, row in enumerate(rows):
+        print("  ".join(cell.ljust(width) if i == 0 else cell.rjust(width) for i, (cell, width) in enumerate(zip(row, widths))))
+        if n == 0:
+            print("  ".join("-" * width for width in widths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--iterations", type=int, default=20, help="Calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Calls in flight at once")
+    parser.add_argument("--issues", type=int, default=500, help="Issues in the synthetic project")
+    parser.add_argument("--comments", type=int, default=4, help="Average comments per issue")
+    parser.add_argument("--comment-words", type=int, default=40, help="Average words per comment")
+    parser.add_argument("--jira-latency", type=float, default=0.05, help="Seconds per Jira request")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per Claude response")
+    parser.add_argument("--output-tokens", type=int, default=120, help="Output tokens reported per Claude call")
+    parser.add_argument("--jira-rate-limit", type=int, default=0, help="Jira requests per second before 429s")
+    parser.add_argument("--llm-rate-limit", type=int, default=0, help="Claude requests per second before 429s")
+    parser.add_argument("--cloud", action="store_true", help="Fake Jira Cloud (token paging) instead of Server")
+    parser.add_argument("--warm", action="store_true", help="Repeat the same issue so the analysis cache is hit")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.tools.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    # Start the fakes in their own process so they do not compete for the GIL
+    parent, child = multiprocessing.Pipe()
+    fakes = multiprocessing.Process(target=serve_fakes, args=(child, vars(args)), daemon=True)
+    fakes.start()
+    jira_port, anthropic_port = parent.recv()
+    jira_url = f"http://127.0.0.1:{jira_port}"
+    anthropic_url = f"http://127.0.0.1:{anthropic_port}"
+
+    # Point JiraIQ at the fakes before it is imported
+    os.environ.update({
+        "JIRA_URL": jira_url,
+        "JIRA_EMAIL": "bench@example.com",
+        "JIRA_TOKEN": "bench",
+        "ANTHROPIC_API_KEY": "bench",
+        "ANTHROPIC_BASE_URL": anthropic_url,
+        "JIRAIQ_CACHE_PATH": "memory",
+        "JIRAIQ_MIRROR_PATH": "off",
+        "JIRAIQ_NOW": fake_jira.jira_time(fake_jira.BASE_TIME),
+    })
+    import jiraiq_server
+
+    print(f"JiraIQ benchmarks: {args.issues} issues, Jira {args.jira_latency * 1000:.0f} ms, "
+          f"Claude {args.llm_latency * 1000:.0f} ms, {args.iterations} calls at concurrency {args.concurrency}\n")
+
+    distinct = 1 if args.warm else args.issues
+
+    async def run_all():
+        return [
+            await run_scenario(
+                jiraiq_server, name, args.iterations, args.concurrency, distinct, args.warm, jira_url, anthropic_url,
+            )
+            for name in names
+        ]
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        fakes.terminate()
+
+    print_table(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"options": vars(args), "results": results}, indent=2))
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+JiraIQ bulk reports
+Offline executive, technical and PM reports for a whole project or sprint via the Message Batches API
+
+Usage:
+    python jiraiq_batch.py run ENG [--sprint "ENG Sprint 4" | --project] [--max-issues N] [--no-wait]
+    python jiraiq_batch.py resume [JOB_ID]
+    python jiraiq_batch.py status
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import aclosing
+from pathlib import Path
+
+from jiraiq_cache import DEFAULT_CACHE_DIR, get_analysis_cache, make_cache_key
+from jiraiq_clients import anthropic_clients, env_float
+from jiraiq_metrics import count
+from jiraiq_search import stream_issues, ANALYZE_FIELDS
+from jiraiq_snapshot import snapshot_to_dict, snapshot_from_dict
+
+
+TEMPLATES = ("executive", "technical", "pm")
+
+# The Message Batches API accepts at most this many requests per batch
+MAX_BATCH_REQUESTS = 100000
+
+# Job states
+PENDING = "pending"        # issues collected, batch not created yet
+SUBMITTED = "submitted"    # batch created, waiting for it to end
+COMPLETE = "complete"      # results collected and reports written
+FAILED = "failed"          # the batch expired or was canceled before any analysis came back
+
+# Issue states within a job
+QUEUED, CACHED, DONE, ERRORED = "queued", "cached", "done", "errored"
+
+
+def batch_dir():
+    return Path(os.getenv("JIRAIQ_BATCH_DIR") or DEFAULT_CACHE_DIR / "batches")
+
+
+def scope_jql(project_key, sprint_name=None, whole_project=False):
+    """JQL for the open issues a bulk report covers"""
+    if whole_project:
+        return f'project = {project_key} AND status != Done'
+    if sprint_name:
+        return f'project = {project_key} AND sprint = "{sprint_name}" AND status != Done'
+    return f'project = {project_key} AND sprint in openSprints() AND status != Done'
+
+
+class BulkReportJob:
+    """One bulk report run, persisted as job.json so it survives restarts
+
+    The job file holds the snapshot and analysis cache key of every issue
+    as it was when the job started, the batch id once the batch exists and
+    the state of each issue. Any process can carry the job on: `advance()`
+    submits a batch that was never created, polls one that is running and,
+    once it has ended, writes the reports and fills the analysis cache. If
+    the results cannot be downloaded, the job stays submitted and the next
+    `advance()` tries again.
+    """
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+
+    @classmethod
+    def create(cls, scope, jql, max_issues=None, output_dir=None):
+        job_id = f"{scope['project_key']}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        path = batch_dir() / job_id / "job.json"
+        return cls(path, {
+            "id": job_id,
+            "scope": scope,
+            "jql": jql,
+            "options": {"max_issues": max_issues, "output_dir": output_dir and str(output_dir)},
+            "status": PENDING,
+            "created": time.time(),
+            "updated": time.time(),
+            "batch_id": None,
+            "submitting": None,
+            "batch_ended": False,
+            "request_counts": None,
+            "output_dir": str(output_dir or path.parent / "reports"),
+            "error": None,
+            "issues": {},
+        })
+
+    @classmethod
+    def load(cls, job_id):
+        path = batch_dir() / job_id / "job.json"
+        if not path.exists():
+            raise KeyError(f"No bulk report job {job_id}")
+        return cls(path, json.loads(path.read_text()))
+
+    @classmethod
+    def all(cls):
+        """Every job on disk, newest first"""
+        jobs = [cls(path, json.loads(path.read_text())) for path in batch_dir().glob("*/job.json")]
+        return sorted(jobs, key=lambda job: job.data["created"], reverse=True)
+
+    @property
+    def id(self):
+        return self.data["id"]
+
+    @property
+    def status(self):
+        return self.data["status"]
+
+    @property
+    def finished(self):
+        return self.status in (COMPLETE, FAILED)
+
+    def save(self):
+        """Write the job file atomically"""
+        self.data["updated"] = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.data))
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        states = {}
+        for entry in self.data["issues"].values():
+            states[entry["state"]] = states.get(entry["state"], 0) + 1
+        return {
+            "id": self.id,
+            "scope": self.data["scope"],
+            "status": self.status,
+            "batch_id": self.data["batch_id"],
+            "issues": len(self.data["issues"]),
+            "issue_states": states,
+            "request_counts": self.data["request_counts"],
+            "output_dir": self.data["output_dir"],
+            "error": self.data["error"],
+            "age_seconds": round(time.time() - self.data["created"]),
+        }
+
+
+def find_open_job(scope, max_issues=None, output_dir=None):
+    """The newest unfinished job for the same scope and options, if any"""
+    options = {"max_issues": max_issues, "output_dir": output_dir and str(output_dir)}
+    for job in BulkReportJob.all():
+        if job.data["scope"] == scope and job.data.get("options", options) == options and not job.finished:
+            return job
+    return None
+
+
+async def start_job(project_key, sprint_name=None, whole_project=False, max_issues=None, output_dir=None):
+    """Collect the issues of a project or sprint and submit their analyses as one batch
+
+    Issues whose analysis is already cached get their reports straight away
+    and are left out of the batch. Starting a job with the same scope and
+    options as an unfinished job resumes that job instead.
+    """
+    from jiraiq_server import analysis_inputs, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE
+
+    project_key = project_key.upper()
+    scope = {"project_key": project_key, "sprint_name": sprint_name, "whole_project": bool(whole_project)}
+    existing = find_open_job(scope, max_issues, output_dir)
+    if existing is not None:
+        return await advance(existing)
+
+    jql = scope_jql(project_key, sprint_name, whole_project)
+    job = BulkReportJob.create(scope, jql, max_issues, output_dir)
+    cache = get_analysis_cache()
+
+    async with aclosing(stream_issues(jql, ANALYZE_FIELDS, limit=max_issues)) as issues:
+        async for issue in issues:
+            inputs, _ = analysis_inputs(issue, issue.comments)
+            cache_key = make_cache_key(inputs, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE)
+            entry = {"issue": snapshot_to_dict(issue), "cache_key": cache_key, "state": QUEUED, "error": None}
+            analysis = cache.get(cache_key)
+            if analysis is not None:
+                write_reports(job, issue, analysis)
+                entry["state"] = CACHED
+            job.data["issues"][issue.key] = entry
+
+    if len(job.data["issues"]) > MAX_BATCH_REQUESTS:
+        raise ValueError(f"{len(job.data['issues'])} issues exceed the {MAX_BATCH_REQUESTS} requests one batch allows; use max_issues")
+
+    # Saved before the batch is created, so a crash in between resubmits rather than loses the job
+    job.save()
+    return await advance(job)
+
+
+async def advance(job):
+    """Move a job one step on: submit, poll, or collect once the batch has ended"""
+    if job.status == PENDING:
+        await submit(job)
+    elif job.status == SUBMITTED:
+        await poll(job)
+    if job.status == SUBMITTED and job.data["batch_ended"]:
+        await collect(job)
+    return job
+
+
+async def wait(job, interval=None):
+    """Poll until the job finishes"""
+    interval = interval or env_float("JIRAIQ_BATCH_POLL_INTERVAL", 30.0)
+    await advance(job)
+    while not job.finished:
+        await asyncio.sleep(interval)
+        await advance(job)
+    return job
+
+
+async def submit(job):
+    from jiraiq_server import analysis_inputs, build_analysis_prompt
+    from jiraiq_server import ANALYSIS_MODEL, ANALYSIS_MAX_TOKENS, ANALYSIS_TEMPERATURE
+
+    requests = []
+    for key, entry in job.data["issues"].items():
+        if entry["state"] != QUEUED:
+            continue
+        issue = snapshot_from_dict(entry["issue"])
+        inputs, _ = analysis_inputs(issue, issue.comments)
+        requests.append({
+            "custom_id": key,
+            "params": {
+                "model": ANALYSIS_MODEL,
+                "max_tokens": ANALYSIS_MAX_TOKENS,
+                "temperature": ANALYSIS_TEMPERATURE,
+                "messages": [{"role": "user", "content": build_analysis_prompt(inputs)}],
+            },
+        })
+
+    if not requests:
+        job.data["status"] = COMPLETE
+        job.save()
+        return
+
+    # A batch is billed once created, so creation is never retried blindly: an earlier
+    # attempt whose answer was lost (or a crash right after it) may have gone through
+    batch = None
+    if job.data.get("submitting"):
+        batch = await find_submitted_batch(job.data["submitting"], len(requests))
+    if batch is None:
+        job.data["submitting"] = time.time()
+        job.save()
+        try:
+            batch = await anthropic_clients.run(
+                lambda anthropic: anthropic.messages.batches.create(requests=requests), retry=False
+            )
+        except Exception as e:
+            if not anthropic_clients.is_transient(e):
+                raise
+            batch = await find_submitted_batch(job.data["submitting"], len(requests))
+            if batch is None:
+                job.data["error"] = f"Could not create the batch, will retry: {str(e)}"
+                job.save()
+                return
+
+    job.data["batch_id"] = batch.id
+    job.data["status"] = SUBMITTED
+    job.data["submitting"] = None
+    job.data["error"] = None
+    record_batch(job, batch)
+    job.save()
+
+
+async def find_submitted_batch(since, size):
+    """A batch of `size` requests created since `since` that no job has claimed, or None
+
+    Batches do not list their custom ids until they end, so a lost
+    submission is recognised by when it was created and how many
+    requests it holds.
+    """
+    claimed = {job.data["batch_id"] for job in BulkReportJob.all()}
+
+    def recent(anthropic):
+        return anthropic.messages.batches.list(limit=20).data
+
+    for batch in await anthropic_clients.run(recent):
+        total = sum(batch.request_counts.model_dump().values())
+        if batch.created_at.timestamp() >= since - 60 and total == size and batch.id not in claimed:
+            return batch
+    return None
+
+
+async def poll(job):
+    batch_id = job.data["batch_id"]
+    batch = await anthropic_clients.run(lambda anthropic: anthropic.messages.batches.retrieve(batch_id))
+    record_batch(job, batch)
+    job.save()
+
+
+def record_batch(job, batch):
+    job.data["request_counts"] = batch.request_counts.model_dump()
+    job.data["batch_ended"] = batch.processing_status == "ended"
+
+
+async def collect(job):
+    """Download the results, cache every analysis and write the reports
+
+    A failed download leaves the job submitted with the error recorded, so
+    the next `advance()` downloads the results again. The job only fails if
+    the batch expired or was canceled before any request succeeded.
+    """
+    batch_id = job.data["batch_id"]
+
+    def fetch(anthropic):
+        return [(r.custom_id, r.result) for r in anthropic.messages.batches.results(batch_id)]
+
+    try:
+        results = await anthropic_clients.run(fetch)
+    except Exception as e:
+        count("errors")
+        job.data["error"] = f"Could not download results, will retry: {str(e)}"
+        job.save()
+        return
+
+    cache = get_analysis_cache()
+    succeeded, lost = 0, 0
+    for custom_id, result in results:
+        entry = job.data["issues"].get(custom_id)
+        if entry is None:
+            continue
+        if result.type in ("expired", "canceled"):
+            lost += 1
+        if result.type != "succeeded":
+            entry["state"] = ERRORED
+            error = getattr(result, "error", None)
+            entry["error"] = getattr(getattr(error, "error", None), "message", None) or result.type
+            continue
+
+        message = result.message
+        analysis = message.content[0].text
+        count("llm_input_tokens", message.usage.input_tokens)
+        count("llm_output_tokens", message.usage.output_tokens)
+        cache.put(entry["cache_key"], analysis, issue_key=custom_id)
+        write_reports(job, snapshot_from_dict(entry["issue"]), analysis)
+        entry["state"] = DONE
+        succeeded += 1
+
+    if lost and not succeeded:
+        job.data["status"] = FAILED
+        job.data["error"] = f"The batch expired or was canceled; {lost} request(s) never ran"
+    else:
+        job.data["status"] = COMPLETE
+        job.data["error"] = None
+    job.save()
+
+
+def write_reports(job, issue, analysis):
+    """Write the executive, technical and PM reports for one issue"""
+    from jiraiq_server import render_issue_report
+
+    output_dir = Path(job.data["output_dir"])
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for template in TEMPLATES:
+        report = render_issue_report(issue, issue.comments, analysis, template)
+        (output_dir / f"{issue.key}.{template}.md").write_text(report)
+
+
+def format_job(job):
+    """Human-readable job summary for the MCP tools and the CLI"""
+    summary = job.summary()
+    scope = summary["scope"]
+    target = scope["project_key"] + (
+        " (all open issues)" if scope["whole_project"]
+        else f" sprint \"{scope['sprint_name']}\"" if scope["sprint_name"] else " (open sprints)"
+    )
+    icon = {PENDING: "⏳", SUBMITTED: "⏳", COMPLETE: "✅", FAILED: "❌"}[job.status]
+    states = summary["issue_states"]
+
+    output = f"{icon} Bulk report {job.id}: {target}\n"
+    output += f"   Status: {job.status} | Issues: {summary['issues']}"
+    output += f" ({states.get(CACHED, 0)} from cache, {states.get(DONE, 0)} analyzed, {states.get(ERRORED, 0)} failed)\n"
+    if summary["batch_id"]:
+        counts = summary["request_counts"] or {}
+        output += f"   Batch: {summary['batch_id']} | " + ", ".join(f"{k} {v}" for k, v in counts.items() if v) + "\n"
+    if summary["error"]:
+        output += f"   ⚠️ {summary['error']}\n"
+    output += f"   Reports: {summary['output_dir']}\n"
+    return output
+
+
+def main(argv):
+    """Command line entry point for nightly bulk reports"""
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Start (or resume) a bulk report and wait for it")
+    run.add_argument("project_key")
+    run.add_argument("--sprint", help="Sprint name (default: open sprints)")
+    run.add_argument("--project", action="store_true", help="Every open issue in the project, not just the sprint")
+    run.add_argument("--max-issues", type=int)
+    run.add_argument("--output-dir")
+    run.add_argument("--no-wait", action="store_true", help="Submit and exit; finish later with `resume`")
+    resume = commands.add_parser("resume", help="Wait for unfinished jobs and write their reports")
+    resume.add_argument("job_id", nargs="?")
+    commands.add_parser("status", help="List bulk report jobs")
+    args = parser.parse_args(argv)
+
+    async def run_command():
+        if args.command == "run":
+            job = await start_job(args.project_key, args.sprint, args.project, args.max_issues, args.output_dir)
+            if not args.no_wait:
+                await wait(job)
+            print(format_job(job))
+        elif args.command == "resume":
+            jobs = [BulkReportJob.load(args.job_id)] if args.job_id else [j for j in BulkReportJob.all() if not j.finished]
+            for job in jobs:
+                await wait(job)
+                print(format_job(job))
+        else:
+            for job in BulkReportJob.all():
+                print(format_job(job))
+
+    asyncio.run(run_command())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
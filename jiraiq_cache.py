@@ -0,0 +1,224 @@
+"""
+JiraIQ analysis cache
+Content-addressed cache of LLM analyses with an in-memory LRU tier
+and a persistent SQLite tier
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from jiraiq_clients import env_int, env_float
+
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "jiraiq"
+
+
+def make_cache_key(inputs, model, temperature):
+    """Hash the prompt inputs together with the model settings"""
+    payload = json.dumps(
+        {"inputs": inputs, "model": model, "temperature": temperature},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier cache mapping a prompt hash to the analysis text
+
+    Lookups try the in-memory LRU first and fall back to SQLite; disk hits
+    are promoted into memory. Entries older than `ttl` seconds count as
+    misses and are dropped. Both tiers are capped by entry count and evict
+    the least recently used entries first.
+    """
+
+    def __init__(self, path=None, memory_entries=512, disk_entries=10000, ttl=86400.0):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._puts_since_prune = 0
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "writes": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    key TEXT PRIMARY KEY,
+                    issue_key TEXT,
+                    analysis TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_issue ON analyses (issue_key)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build a cache configured from JIRAIQ_CACHE_* environment variables"""
+        path = os.getenv("JIRAIQ_CACHE_PATH", str(DEFAULT_CACHE_DIR / "analysis.sqlite3"))
+        if path.lower() in ("", "off", "none", "memory"):
+            path = None
+        return cls(
+            path=path,
+            memory_entries=env_int("JIRAIQ_CACHE_MEMORY_ENTRIES", 512),
+            disk_entries=env_int("JIRAIQ_CACHE_DISK_ENTRIES", 10000),
+            ttl=env_float("JIRAIQ_CACHE_TTL", 86400.0),
+        )
+
+    def get(self, key):
+        """Return the cached analysis for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                analysis, created, _ = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return analysis
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT analysis, created, issue_key FROM analyses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    analysis, created, issue_key = row
+                    if now - created <= self.ttl:
+                        self._db.execute("UPDATE analyses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, analysis, created, issue_key)
+                        self.stats["disk_hits"] += 1
+                        return analysis
+                    self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, analysis, issue_key=None):
+        """Store an analysis in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, analysis, now, issue_key)
+            self.stats["writes"] += 1
+            if self._db is None:
+                return
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO analyses (key, issue_key, analysis, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, issue_key, analysis, now, now),
+            )
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= 100:
+                self._prune_disk(now)
+            self._db.commit()
+
+    def has_issue(self, issue_key):
+        """True if any analysis of the issue is cached"""
+        with self._lock:
+            if any(entry[2] == issue_key for entry in self._memory.values()):
+                return True
+            if self._db is None:
+                return False
+            return self._db.execute(
+                "SELECT 1 FROM analyses WHERE issue_key = ? LIMIT 1", (issue_key,)
+            ).fetchone() is not None
+
+    def invalidate_issue(self, issue_key, keep=()):
+        """Drop the cached analyses of one issue, except the keys in `keep`; returns how many went"""
+        keep = set(keep)
+        with self._lock:
+            stale = [k for k, entry in self._memory.items() if entry[2] == issue_key and k not in keep]
+            for k in stale:
+                del self._memory[k]
+            removed = len(stale)
+            if self._db is not None:
+                cursor = self._db.execute(
+                    f"DELETE FROM analyses WHERE issue_key = ? AND key NOT IN ({','.join('?' * len(keep))})",
+                    (issue_key, *keep),
+                )
+                self._db.commit()
+                # Entries held in both tiers are counted once
+                removed = max(removed, cursor.rowcount)
+            self.stats["invalidations"] += removed
+            return removed
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM analyses")
+                self._db.commit()
+
+    def summary(self):
+        """Hit/miss counters plus the current size of each tier"""
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            disk_size = None
+            if self._db is not None:
+                disk_size = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else None,
+                "memory_size": len(self._memory),
+                "disk_size": disk_size,
+                "path": str(self.path) if self.path else None,
+            }
+
+    def _remember(self, key, analysis, created, issue_key=None):
+        self._memory[key] = (analysis, created, issue_key)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _prune_disk(self, now):
+        self._puts_since_prune = 0
+        self._db.execute("DELETE FROM analyses WHERE created < ?", (now - self.ttl,))
+        cursor = self._db.execute(
+            "DELETE FROM analyses WHERE key IN ("
+            "SELECT key FROM analyses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,),
+        )
+        self.stats["evictions"] += max(cursor.rowcount, 0)
+
+
+_analysis_cache = None
+_analysis_cache_lock = threading.Lock()
+
+
+def get_analysis_cache():
+    """Return the process-wide analysis cache, creating it on first use"""
+    global _analysis_cache
+    with _analysis_cache_lock:
+        if _analysis_cache is None:
+            _analysis_cache = AnalysisCache.from_env()
+        return _analysis_cache
@@ -0,0 +1,145 @@
+"""
+JiraIQ text classifier
+Labels comment text as blocker, risk and/or technical in a single regex pass
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+
+BLOCKER = "blocker"
+RISK = "risk"
+TECH = "tech"
+
+# Terms match at the start of a word, so "block" covers blocked/blocker/blocking
+# but not "unblocked"; multi-word phrases tolerate any whitespace between words
+DEFAULT_VOCABULARIES = {
+    BLOCKER: [
+        "block", "stuck", "impediment", "waiting on", "waiting for", "held up",
+        "can't proceed", "cannot proceed",
+    ],
+    RISK: [
+        "risk", "delay", "slip", "deadline", "escalat", "concern", "overdue",
+        "behind schedule",
+    ],
+    TECH: ["code", "api", "database", "error", "config", "patch", "stack", "query"],
+}
+
+# Environment variables that replace a vocabulary (comma-separated terms)
+VOCABULARY_ENV = {
+    BLOCKER: "JIRAIQ_BLOCKER_TERMS",
+    RISK: "JIRAIQ_RISK_TERMS",
+    TECH: "JIRAIQ_TECH_TERMS",
+}
+
+# A match preceded by one of these ("not blocked", "no longer blocked by X",
+# "no blockers", "not a blocker") does not count for the labels in NEGATABLE
+NEGATION = (
+    r"(?:no\s+longer|no\s+more|not|never|no|without|isn't|isnt|aren't|arent|wasn't|wasnt|weren't|werent)"
+    r"\s+(?:(?:be|been|being|getting|really|currently|actually)\s+)?"
+    r"(?:(?:a|an|the|any)\s+)?"
+)
+NEGATABLE = {BLOCKER, RISK}
+
+CACHE_SIZE = 50000
+
+
+def _term_pattern(term):
+    words = [re.escape(word) for word in term.lower().split()]
+    return r"\b" + r"\s+".join(words) + r"\w*"
+
+
+class TextClassifier:
+    """Multi-label keyword classifier compiled into one regex alternation
+
+    Each text is lowercased once and scanned once. Labels for Jira comments
+    are cached per (comment id, last update) so re-scanning the same thread
+    from the mirror or the cache costs a dictionary lookup.
+    """
+
+    def __init__(self, vocabularies):
+        self.vocabularies = {label: list(terms) for label, terms in vocabularies.items() if terms}
+        self._groups = {}
+        alternatives = []
+        for i, (label, terms) in enumerate(self.vocabularies.items()):
+            group = f"g{i}"
+            self._groups[group] = label
+            # Longest terms first so phrases win over their prefixes
+            ordered = sorted(terms, key=len, reverse=True)
+            alternatives.append(f"(?P<{group}>" + "|".join(_term_pattern(t) for t in ordered) + ")")
+
+        self._pattern = re.compile(
+            rf"(?P<neg>\b{NEGATION})?(?:" + "|".join(alternatives) + ")"
+        ) if alternatives else None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"texts": 0, "cache_hits": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Default vocabularies, each optionally replaced from the environment"""
+        vocabularies = {}
+        for label, terms in DEFAULT_VOCABULARIES.items():
+            configured = os.getenv(VOCABULARY_ENV[label])
+            if configured is not None:
+                terms = [t.strip() for t in configured.split(",") if t.strip()]
+            vocabularies[label] = terms
+        return cls(vocabularies)
+
+    def labels(self, text):
+        """Return the set of labels whose terms appear (un-negated) in text"""
+        self.stats["texts"] += 1
+        if not text or self._pattern is None:
+            return frozenset()
+
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            label = self._groups[match.lastgroup]
+            if match.group("neg") and label in NEGATABLE:
+                continue
+            found.add(label)
+        return frozenset(found)
+
+    def classify(self, comments):
+        """Label a batch of Jira comments, reusing cached labels by comment id"""
+        results = []
+        for comment in comments:
+            comment_id = getattr(comment, "id", None)
+            if comment_id is None:
+                results.append(self.labels(comment.body))
+                continue
+
+            key = (comment_id, getattr(comment, "updated", None) or getattr(comment, "created", None))
+            with self._lock:
+                labels = self._cache.get(key)
+                if labels is not None:
+                    self._cache.move_to_end(key)
+                    self.stats["cache_hits"] += 1
+            if labels is None:
+                labels = self.labels(comment.body)
+                with self._lock:
+                    self._cache[key] = labels
+                    if len(self._cache) > CACHE_SIZE:
+                        self._cache.popitem(last=False)
+            results.append(labels)
+        return results
+
+    def has(self, label, comments):
+        """True if any of the comments carries the label"""
+        return any(label in labels for labels in self.classify(comments))
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    """Return the process-wide classifier built from the configured vocabularies"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = TextClassifier.from_env()
+        return _classifier
+
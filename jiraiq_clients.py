@@ -0,0 +1,513 @@
+"""
+JiraIQ client management
+Keeps one pooled, keep-alive Jira and Anthropic client per process
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jiraiq_metrics import count
+from jiraiq_ratelimit import RateGovernor, call_priority, parse_retry_after
+
+# The jira, anthropic, requests and httpx SDKs are imported on first use
+# (or by warm_up()) so the MCP server can answer list_tools without them
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment"""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name, default):
+    """Read a float setting from the environment"""
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared thread pool that runs blocking SDK calls off the event loop"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=env_int("JIRAIQ_MAX_WORKERS", 32),
+                thread_name_prefix="jiraiq",
+            )
+        return _executor
+
+
+class ClientManager:
+    """Process-wide holder for one lazily built, health-checked client
+
+    The client is built on first use and then shared by every tool call.
+    If it has been idle for longer than the health check interval it is
+    probed (by one caller, outside the lock) before being handed out, and
+    `call()` rebuilds it once and retries when an operation fails with an
+    auth or connection error. A replaced client is closed only after the
+    calls still running on it have finished.
+
+    `run()` is the async counterpart of `call()`: it runs the operation on
+    the shared thread pool once the backend's rate governor admits it (at
+    most `concurrency` in flight, read from `concurrency_env`, and at most
+    the rate from `rate_env`), and retries it with jittered exponential
+    backoff when `retry_after(error)` says the error is transient.
+    """
+
+    def __init__(self, name, factory, is_reconnect_error, health_check=None, close=None,
+                 concurrency_env=None, rate_env=None, retry_after=None):
+        self.name = name
+        self._concurrency_env = concurrency_env
+        self._rate_env = rate_env
+        self._retry_after = retry_after
+        self._governor = None
+        self._factory = factory
+        self._is_reconnect_error = is_reconnect_error
+        self._health_check = health_check
+        self._close = close
+        self._client = None
+        self._last_ok = 0.0
+        self._checking = False
+        self._users = {}      # id(client) -> calls running on it
+        self._retired = {}    # id(client) -> replaced client waiting for its calls to finish
+        self._lock = threading.Lock()
+        self.stats = {
+            "clients_created": 0,
+            "client_reuses": 0,
+            "reconnects": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+            "retries": 0,
+        }
+
+    @property
+    def concurrency(self):
+        return env_int(self._concurrency_env, 8) if self._concurrency_env else 8
+
+    @property
+    def governor(self):
+        # Built on first use so the settings are read after .env is loaded
+        if self._governor is None:
+            rate = env_float(self._rate_env, 0.0) if self._rate_env else 0.0
+            self._governor = RateGovernor(self.name, rate=rate, concurrency=self.concurrency)
+        return self._governor
+
+    @property
+    def health_check_interval(self):
+        return env_float("JIRAIQ_HEALTH_CHECK_INTERVAL", 300.0)
+
+    def get(self):
+        """Return the shared client, building or re-validating it if needed"""
+        return self._checkout(track=False)
+
+    def call(self, fn):
+        """Run fn(client), reconnecting once on auth or socket errors"""
+        client = self._checkout(track=True)
+        try:
+            result = fn(client)
+        except Exception as e:
+            if not self._is_reconnect_error(e):
+                raise
+            stale, client = client, None
+            self._checkin(stale)
+            self._replace(stale)
+            client = self._checkout(track=True)
+            result = fn(client)
+        finally:
+            if client is not None:
+                self._checkin(client)
+        self._last_ok = time.monotonic()
+        return result
+
+    async def run(self, fn, retry=True):
+        """Run fn(client) on the shared thread pool without blocking the event loop
+
+        Rate-limit, overload and transient network errors are retried until
+        JIRAIQ_MAX_RETRIES or the JIRAIQ_CALL_DEADLINE for the whole call
+        (queueing included) runs out. Pass `retry=False` for operations that
+        must not be repeated blindly, such as creating something billable.
+        """
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context into the worker so metrics land on the right tool
+        context = contextvars.copy_context()
+        governor = self.governor
+        deadline = time.monotonic() + env_float("JIRAIQ_CALL_DEADLINE", 120.0)
+        max_retries = env_int("JIRAIQ_MAX_RETRIES", 5)
+
+        attempt = 0
+        while True:
+            await governor.acquire(call_priority.get(), deadline)
+            try:
+                return await loop.run_in_executor(get_executor(), context.run, self.call, fn)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt) if retry else None
+                if delay is None or attempt >= max_retries or time.monotonic() + delay > deadline:
+                    raise
+            finally:
+                governor.release()
+
+            attempt += 1
+            self.stats["retries"] += 1
+            count("retries")
+            await asyncio.sleep(delay)
+
+    def is_transient(self, e):
+        """True if e is a rate-limit, overload or network error that `run()` would retry"""
+        return (self._retry_after(e) if self._retry_after else None) is not None
+
+    def _retry_delay(self, e, attempt):
+        """Seconds to wait before retrying after e, or None if e is not retryable"""
+        retry_after = self._retry_after(e) if self._retry_after else None
+        if retry_after is None:
+            return None
+        if retry_after > 0:
+            # Honour the server's hint, spreading retries out a little
+            return retry_after + random.uniform(0, min(retry_after * 0.1, 1.0))
+        # Full jitter: anywhere up to an exponentially growing cap
+        base = env_float("JIRAIQ_RETRY_BASE", 0.5)
+        return random.uniform(0, min(base * 2 ** attempt, env_float("JIRAIQ_RETRY_MAX_DELAY", 30.0)))
+
+    def reconnect(self, stale):
+        """Replace a client that just failed, unless another caller already did"""
+        self._replace(stale)
+        return self.get()
+
+    def reset(self):
+        """Drop the shared client so the next call builds a fresh one"""
+        with self._lock:
+            retired = self._retire(self._client)
+            self._client = None
+        self._close_quietly(retired)
+
+    def _checkout(self, track):
+        """The current client, counted as in use by the caller when `track` is set
+
+        An idle client is health-checked outside the lock, so other callers
+        keep using it meanwhile instead of queueing behind one slow probe.
+        """
+        with self._lock:
+            if self._client is None:
+                # Nothing to serve meanwhile, so the first client is built under the lock
+                return self._enter(self._create(), track)
+            idle = time.monotonic() - self._last_ok
+            if not self._health_check or self._checking or idle <= self.health_check_interval:
+                self.stats["client_reuses"] += 1
+                return self._enter(self._client, track)
+            self._checking = True
+            client = self._client
+
+        self.stats["health_checks"] += 1
+        try:
+            self._health_check(client)
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._lock:
+            self._checking = False
+            if healthy:
+                self._last_ok = time.monotonic()
+                self.stats["client_reuses"] += 1
+        if not healthy:
+            self.stats["health_check_failures"] += 1
+            self._replace(client)
+        with self._lock:
+            if self._client is None:
+                self._create()
+            return self._enter(self._client, track)
+
+    def _enter(self, client, track):
+        if track:
+            self._users[id(client)] = self._users.get(id(client), 0) + 1
+        return client
+
+    def _checkin(self, client):
+        """A tracked caller is done with `client`; a retired client closes with its last user"""
+        with self._lock:
+            users = self._users.get(id(client), 0) - 1
+            if users > 0:
+                self._users[id(client)] = users
+                return
+            self._users.pop(id(client), None)
+            retired = self._retired.pop(id(client), None)
+        self._close_quietly(retired)
+
+    def _replace(self, stale):
+        """Build a client and swap it in, unless another caller already replaced `stale`
+
+        The new client is built outside the lock. The old one is closed once
+        the calls still running on it have finished.
+        """
+        with self._lock:
+            if self._client is not stale:
+                return
+        fresh = self._factory()
+        with self._lock:
+            swapped = self._client is stale
+            if swapped:
+                self.stats["reconnects"] += 1
+                self.stats["clients_created"] += 1
+                retired = self._retire(stale)
+                self._client = fresh
+                self._last_ok = time.monotonic()
+        self._close_quietly(retired if swapped else fresh)
+
+    def _create(self):
+        self._client = self._factory()
+        self._last_ok = time.monotonic()
+        self.stats["clients_created"] += 1
+        return self._client
+
+    def _retire(self, client):
+        """Take a client out of service; returns it if it can be closed now (no one is using it)"""
+        if client is None:
+            return None
+        if self._users.get(id(client)):
+            self._retired[id(client)] = client
+            return None
+        return client
+
+    def _close_quietly(self, client):
+        if client is not None and self._close:
+            try:
+                self._close(client)
+            except Exception:
+                pass
+
+
+# HTTP statuses worth retrying: rate limited, bad gateway, unavailable,
+# gateway timeout and Anthropic's "overloaded"
+RETRYABLE_STATUSES = {429, 502, 503, 504, 529}
+
+
+# ---------------------------------------------------------------------------
+# Jira
+# ---------------------------------------------------------------------------
+
+def _build_jira():
+    """Build a Jira client whose session keeps a pool of live connections"""
+    from jira import JIRA
+    from requests.adapters import HTTPAdapter
+
+    pool_size = env_int("JIRAIQ_JIRA_POOL_SIZE", 10)
+
+    jira = JIRA(
+        server=os.getenv('JIRA_URL'),
+        basic_auth=(os.getenv('JIRA_EMAIL'), os.getenv('JIRA_TOKEN')),
+        timeout=env_float("JIRAIQ_JIRA_TIMEOUT", 30.0),
+        # Retries are handled by ClientManager.run so they respect the rate governor
+        max_retries=0,
+    )
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    jira._session.mount("https://", adapter)
+    jira._session.mount("http://", adapter)
+    jira._session.hooks["response"].append(_count_jira_response)
+    return jira
+
+
+def _count_jira_response(response, *args, **kwargs):
+    count("jira_requests")
+    count("jira_bytes", len(response.content))
+    jira_clients.governor.observe(response.status_code, response.headers)
+
+
+def _is_jira_reconnect_error(e):
+    import requests
+    from jira import JIRAError
+
+    if isinstance(e, JIRAError):
+        return e.status_code == 401
+    return isinstance(e, (requests.exceptions.ConnectionError, ConnectionError))
+
+
+def _jira_retry_after(e):
+    import requests
+    from jira import JIRAError
+
+    if isinstance(e, JIRAError):
+        if e.status_code not in RETRYABLE_STATUSES:
+            return None
+        return parse_retry_after(e.response.headers if e.response is not None else None)
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ConnectionError)):
+        return 0.0
+    return None
+
+
+def _check_jira(jira):
+    jira.myself()
+
+
+def _close_jira(jira):
+    jira.close()
+
+
+jira_clients = ClientManager(
+    "jira",
+    _build_jira,
+    _is_jira_reconnect_error,
+    health_check=_check_jira,
+    close=_close_jira,
+    concurrency_env="JIRAIQ_JIRA_CONCURRENCY",
+    rate_env="JIRAIQ_JIRA_RATE",
+    retry_after=_jira_retry_after,
+)
+
+
+# ---------------------------------------------------------------------------
+# Anthropic
+# ---------------------------------------------------------------------------
+
+_anthropic_connections = {"requests": 0, "new_connections": 0}
+
+
+def _trace_connection(event_name, info):
+    if event_name == "connection.connect_tcp.complete":
+        _anthropic_connections["new_connections"] += 1
+
+
+def _count_request(request):
+    _anthropic_connections["requests"] += 1
+    request.extensions["trace"] = _trace_connection
+
+
+def _observe_anthropic_response(response):
+    anthropic_clients.governor.observe(response.status_code, response.headers)
+
+
+def _build_anthropic():
+    """Build an Anthropic client on top of a pooled keep-alive httpx client"""
+    api_key = os.getenv('ANTHROPIC_API_KEY')
+    if not api_key:
+        raise ValueError("ANTHROPIC_API_KEY not found in environment")
+
+    import httpx
+    from anthropic import Anthropic
+
+    pool_size = env_int("JIRAIQ_ANTHROPIC_POOL_SIZE", 10)
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=env_float("JIRAIQ_KEEPALIVE_SECONDS", 60.0),
+        ),
+        timeout=httpx.Timeout(env_float("JIRAIQ_ANTHROPIC_TIMEOUT", 120.0), connect=10.0),
+        event_hooks={"request": [_count_request], "response": [_observe_anthropic_response]},
+    )
+    # Retries are handled by ClientManager.run so they respect the rate governor
+    return Anthropic(api_key=api_key, http_client=http_client, max_retries=0)
+
+
+def _is_anthropic_reconnect_error(e):
+    import anthropic
+
+    return isinstance(e, (anthropic.AuthenticationError, anthropic.APIConnectionError))
+
+
+def _anthropic_retry_after(e):
+    import anthropic
+
+    if isinstance(e, anthropic.APIConnectionError):
+        return 0.0
+    if isinstance(e, anthropic.APIStatusError) and (e.status_code in RETRYABLE_STATUSES or e.status_code >= 500):
+        return parse_retry_after(e.response.headers)
+    return None
+
+
+def _close_anthropic(client):
+    client.close()
+
+
+anthropic_clients = ClientManager(
+    "anthropic",
+    _build_anthropic,
+    _is_anthropic_reconnect_error,
+    close=_close_anthropic,
+    concurrency_env="JIRAIQ_ANTHROPIC_CONCURRENCY",
+    rate_env="JIRAIQ_ANTHROPIC_RATE",
+    retry_after=_anthropic_retry_after,
+)
+
+
+# ---------------------------------------------------------------------------
+# Warm-up
+# ---------------------------------------------------------------------------
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+def warm_up(mode=None):
+    """Load the SDKs ahead of the first tool call
+
+    JIRAIQ_WARMUP selects how much is done: "imports" (default) loads the
+    jira and anthropic packages, "clients" also builds and connects both
+    clients, and "off" does nothing.
+    """
+    mode = mode or os.getenv("JIRAIQ_WARMUP", "imports")
+    if mode == "off":
+        return
+
+    import anthropic
+    import httpx
+    import jira.resources
+    import requests
+
+    if mode == "clients":
+        for manager in (jira_clients, anthropic_clients):
+            try:
+                manager.get()
+            except Exception:
+                pass  # the first tool call builds it again and reports the error
+
+
+def start_warm_up():
+    """Run warm_up() once, in a background thread"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="jiraiq-warmup", daemon=True)
+            _warm_up_thread.start()
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+def _jira_pool_counts():
+    counts = {"requests": 0, "new_connections": 0}
+    jira = jira_clients._client
+    if jira is None:
+        return counts
+
+    for adapter in set(jira._session.adapters.values()):
+        poolmanager = getattr(adapter, "poolmanager", None)
+        if poolmanager is None:
+            continue
+        for key in list(poolmanager.pools.keys()):
+            pool = poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            counts["requests"] += pool.num_requests
+            counts["new_connections"] += pool.num_connections
+    return counts
+
+
+def connection_stats():
+    """Client and connection reuse counters for both backends"""
+    stats = {}
+    for manager, counts in (
+        (jira_clients, _jira_pool_counts()),
+        (anthropic_clients, dict(_anthropic_connections)),
+    ):
+        counts["reused_connections"] = max(counts["requests"] - counts["new_connections"], 0)
+        stats[manager.name] = {**manager.stats, **counts, "governor": manager.governor.summary()}
+    return stats
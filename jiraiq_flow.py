@@ -0,0 +1,864 @@
+#!/usr/bin/env python3
+"""
+JiraIQ flow metrics
+Cycle time, time in status, WIP age and sprint scope change from issue changelogs,
+kept as incrementally updated rollups in SQLite
+
+Usage:
+    python jiraiq_flow.py sync ENG [--full]
+    python jiraiq_flow.py report ENG [--sprints 20]
+"""
+
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from contextlib import aclosing
+from pathlib import Path
+
+from jiraiq_cache import DEFAULT_CACHE_DIR
+from jiraiq_clients import jira_clients, env_float, env_int, get_executor
+from jiraiq_graph import DONE_STATUSES
+from jiraiq_mirror import parse_sprints, sprint_field, SYNC_OVERLAP_MINUTES
+from jiraiq_search import stream_issues
+from jiraiq_singleflight import flow_flights
+from jiraiq_triage import parse_jira_time
+
+
+# Fields read next to the changelog; the sprint field is added at sync time
+FLOW_FIELDS = ["status", "created"]
+
+# Upper bounds (hours) of the cycle time histogram buckets; the last bucket is open-ended
+CYCLE_BUCKETS = [4, 8, 24, 48, 72, 120, 168, 240, 336, 504, 720]
+
+# Jira status categories
+NEW, IN_PROGRESS, DONE = "new", "indeterminate", "done"
+
+# Issues processed per transaction during a sync
+SYNC_BATCH = 200
+
+# Tables whose rows belong to one project; a full sync replaces them wholesale
+PROJECT_TABLES = ("issues", "scope_events", "sprint_rollups", "cycle_histogram", "status_rollups")
+
+
+def epoch(value):
+    """Seconds since the epoch for a Jira timestamp, or None"""
+    parsed = parse_jira_time(value)
+    return int(parsed.timestamp()) if parsed else None
+
+
+def cycle_bucket(seconds):
+    hours = seconds / 3600
+    for i, bound in enumerate(CYCLE_BUCKETS):
+        if hours <= bound:
+            return i
+    return len(CYCLE_BUCKETS)
+
+
+def histogram_percentile(histogram, fraction):
+    """Upper bound in hours of the bucket holding the given fraction of issues (None if open-ended or empty)"""
+    total = sum(histogram)
+    if not total:
+        return None
+    seen = 0
+    for i, issues in enumerate(histogram):
+        seen += issues
+        if seen >= fraction * total:
+            return CYCLE_BUCKETS[i] if i < len(CYCLE_BUCKETS) else None
+    return None
+
+
+def sprint_ids(value):
+    """Sprint ids from a changelog item's "from"/"to" ("12, 15" on Cloud)"""
+    return [int(s) for s in (value or "").replace(" ", "").split(",") if s.isdigit()]
+
+
+def is_status_item(item):
+    return (item.get("fieldId") or item.get("field") or "").lower() == "status"
+
+
+def is_sprint_item(item):
+    return (item.get("field") or "").lower() == "sprint" or item.get("fieldId") == sprint_field()
+
+
+def full_changelog(jira, issue_key):
+    """Every history of one issue, for changelogs a search response truncated (blocking)"""
+    if getattr(jira, "_is_cloud", False):
+        histories, start_at = [], 0
+        while True:
+            page = jira._get_json(f"issue/{issue_key}/changelog", params={"startAt": start_at, "maxResults": 100})
+            histories += page.get("values", [])
+            start_at += len(page.get("values", []))
+            if page.get("isLast", True) or not page.get("values"):
+                return histories
+    return jira.issue(issue_key, fields="status", expand="changelog").raw["changelog"]["histories"]
+
+
+class IssueFlow:
+    """One issue's flow state as stored between syncs
+
+    `times` and `states` are parallel arrays of transition times (epoch
+    seconds) and the status id entered, starting with the status the issue
+    was created in. `completion` remembers which sprint rollups a completion
+    was added to, so a reopen can take it back out.
+    """
+
+    __slots__ = ("key", "project", "created", "last_history", "times", "states",
+                 "status_since", "started", "completed", "sprints", "completion")
+
+    def __init__(self, key, project, created, status):
+        self.key = key
+        self.project = project
+        self.created = created
+        self.last_history = 0
+        self.times = array("I", [created])
+        self.states = array("I", [status])
+        self.status_since = created
+        self.started = None
+        self.completed = None
+        self.sprints = []
+        self.completion = None
+
+    @property
+    def status(self):
+        return self.states[-1]
+
+    @classmethod
+    def from_row(cls, row):
+        key, project, created, last_history, times, states, since, started, completed, sprints, completion = row
+        flow = cls.__new__(cls)
+        flow.key, flow.project, flow.created, flow.last_history = key, project, created, last_history
+        flow.times, flow.states = array("I"), array("I")
+        flow.times.frombytes(times)
+        flow.states.frombytes(states)
+        flow.status_since, flow.started, flow.completed = since, started, completed
+        flow.sprints = json.loads(sprints)
+        flow.completion = json.loads(completion) if completion else None
+        return flow
+
+    def row(self):
+        return (
+            self.key, self.project, self.created, self.last_history, self.times.tobytes(), self.states.tobytes(),
+            self.status, self.status_since, self.started, self.completed,
+            json.dumps(self.sprints), json.dumps(self.completion) if self.completion else None,
+        )
+
+
+class Rollups:
+    """Deltas to the stored aggregates collected while a batch of issues is processed"""
+
+    def __init__(self):
+        self.status = {}      # (project, status) -> [seconds, visits]
+        self.sprints = {}     # (sprint, project) -> [completed, cycle_seconds]
+        self.histogram = {}   # (sprint, project, bucket) -> issues
+        self.scope = []       # (project, sprint, issue, at, delta)
+
+    def leave_status(self, project, status, seconds, sign=1):
+        entry = self.status.setdefault((project, status), [0, 0])
+        entry[0] += sign * seconds
+        entry[1] += sign
+
+    def complete(self, project, sprints, cycle, sign=1):
+        bucket = cycle_bucket(cycle)
+        for sprint in sprints:
+            entry = self.sprints.setdefault((sprint, project), [0, 0])
+            entry[0] += sign
+            entry[1] += sign * cycle
+            key = (sprint, project, bucket)
+            self.histogram[key] = self.histogram.get(key, 0) + sign
+
+
+class FlowStore:
+    """SQLite store of per-issue status transitions and the rollups built from them
+
+    Each sync asks Jira for the issues updated since the previous one with
+    `expand=changelog` and applies only the histories it has not seen, so
+    the rollups (time spent per status, completions and cycle time per
+    sprint, sprint scope events) grow by deltas and are never recomputed
+    from the whole history. Reports over the last sprints are then a few
+    aggregate queries. A full sync rebuilds a project in a scratch file and
+    swaps it in only once every page has been applied, so a failed rebuild
+    leaves the previous data in place. Issues deleted or moved away never
+    show up in a delta, so their keys are reconciled against Jira every
+    JIRAIQ_FLOW_RECONCILE_INTERVAL seconds and their share of the rollups
+    is taken back out.
+
+    Cycle time runs from the first move out of a to-do status to the move
+    into a done status. A completion counts towards the sprints the issue
+    was in at that moment; a reopen takes it back out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS statuses (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                category TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS issues (
+                key TEXT PRIMARY KEY,
+                project TEXT NOT NULL,
+                created INTEGER NOT NULL,
+                last_history INTEGER NOT NULL,
+                times BLOB NOT NULL,
+                states BLOB NOT NULL,
+                status INTEGER NOT NULL,
+                status_since INTEGER NOT NULL,
+                started INTEGER,
+                completed INTEGER,
+                sprints TEXT NOT NULL,
+                completion TEXT
+            );
+            CREATE INDEX IF NOT EXISTS issues_wip ON issues (project, completed, started);
+            CREATE TABLE IF NOT EXISTS sprints (
+                id INTEGER PRIMARY KEY,
+                name TEXT,
+                state TEXT,
+                start INTEGER,
+                end INTEGER,
+                closes INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS scope_events (
+                project TEXT NOT NULL,
+                sprint INTEGER NOT NULL,
+                issue TEXT NOT NULL,
+                at INTEGER NOT NULL,
+                delta INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scope_events_sprint ON scope_events (project, sprint);
+            CREATE TABLE IF NOT EXISTS sprint_rollups (
+                sprint INTEGER NOT NULL,
+                project TEXT NOT NULL,
+                completed INTEGER NOT NULL,
+                cycle_seconds INTEGER NOT NULL,
+                PRIMARY KEY (sprint, project)
+            );
+            CREATE TABLE IF NOT EXISTS cycle_histogram (
+                sprint INTEGER NOT NULL,
+                project TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                issues INTEGER NOT NULL,
+                PRIMARY KEY (sprint, project, bucket)
+            );
+            CREATE TABLE IF NOT EXISTS status_rollups (
+                project TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                seconds INTEGER NOT NULL,
+                visits INTEGER NOT NULL,
+                PRIMARY KEY (project, status)
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                project TEXT PRIMARY KEY,
+                last_sync REAL NOT NULL,
+                syncs INTEGER NOT NULL DEFAULT 0,
+                last_reconcile REAL
+            );
+        """)
+        if "last_reconcile" not in {row[1] for row in self._db.execute("PRAGMA table_info(sync_state)")}:
+            # Stores written before reconciliation existed
+            self._db.execute("ALTER TABLE sync_state ADD COLUMN last_reconcile REAL")
+        self._db.commit()
+        self._statuses = {row[0]: (row[1], row[2]) for row in self._db.execute("SELECT id, name, category FROM statuses")}
+        self._sprints = {row[0]: row[1:] for row in self._db.execute("SELECT id, start, closes FROM sprints")}
+        self.stats = {
+            "syncs": 0,
+            "full_syncs": 0,
+            "issues_fetched": 0,
+            "histories_applied": 0,
+            "transitions": 0,
+            "scope_events": 0,
+            "changelog_refetches": 0,
+            "sprint_fetches": 0,
+            "issues_removed": 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build the store configured by JIRAIQ_FLOW_PATH, or None if disabled"""
+        path = os.getenv("JIRAIQ_FLOW_PATH", str(DEFAULT_CACHE_DIR / "flow.sqlite3"))
+        if path.lower() in ("", "off", "none"):
+            return None
+        return cls(path)
+
+    @property
+    def max_age(self):
+        return env_float("JIRAIQ_FLOW_MAX_AGE", 900.0)
+
+    @property
+    def reconcile_interval(self):
+        return env_float("JIRAIQ_FLOW_RECONCILE_INTERVAL", 21600.0)
+
+    # -- Sync ---------------------------------------------------------------
+
+    async def sync(self, project_key, full=False):
+        """Apply the changelog histories added since the last sync; returns a summary
+
+        Each search page, changelog and sprint lookup is its own Jira call,
+        so a retried page does not restart the crawl; batches are applied
+        off the event loop as pages arrive.
+        """
+        project_key = project_key.upper()
+        if full:
+            return await self._rebuild(project_key)
+        state = self._state(project_key)
+        started = time.time()
+        if not self._statuses:
+            await jira_clients.run(self._load_statuses)
+
+        jql = f'project = {project_key}'
+        if state:
+            minutes = math.ceil((started - state["last_sync"]) / 60) + SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+        jql += ' ORDER BY updated ASC'
+
+        before = dict(self.stats)
+        batch = []
+        fields = FLOW_FIELDS + [sprint_field()]
+        async with aclosing(stream_issues(jql, fields, expand="changelog", convert=lambda raw: raw)) as issues:
+            async for raw in issues:
+                batch.append(raw)
+                if len(batch) >= SYNC_BATCH:
+                    await self._apply_batch(batch)
+                    batch = []
+        await self._apply_batch(batch)
+
+        last_reconcile = (state["last_reconcile"] or state["last_sync"]) if state else started
+        if state and started - last_reconcile > self.reconcile_interval:
+            await self._reconcile(project_key)
+            last_reconcile = started
+
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO sync_state (project, last_sync, syncs, last_reconcile) VALUES (?, ?, 1, ?)
+                ON CONFLICT (project) DO UPDATE SET
+                    last_sync = excluded.last_sync, syncs = syncs + 1, last_reconcile = excluded.last_reconcile
+            """, (project_key, started, last_reconcile))
+            self._db.commit()
+        self.stats["syncs"] += 1
+        self.stats["full_syncs"] += int(state is None)
+
+        return {
+            "project": project_key,
+            "mode": "delta" if state else "full",
+            "fetched": self.stats["issues_fetched"] - before["issues_fetched"],
+            "histories": self.stats["histories_applied"] - before["histories_applied"],
+            "transitions": self.stats["transitions"] - before["transitions"],
+            "removed": self.stats["issues_removed"] - before["issues_removed"],
+            "seconds": round(time.time() - started, 2),
+        }
+
+    async def _rebuild(self, project_key):
+        """Full sync into a scratch store next to this one, swapped in once it has completed"""
+        started = time.time()
+        fd, scratch_path = tempfile.mkstemp(prefix="flow-rebuild-", suffix=".sqlite3", dir=Path(self.path).parent)
+        os.close(fd)
+        try:
+            scratch = FlowStore(scratch_path)
+            # Known statuses and sprints carry over, so only new ones are looked up or written
+            scratch._statuses = dict(self._statuses)
+            scratch._sprints = dict(self._sprints)
+            try:
+                result = await scratch.sync(project_key)
+            finally:
+                scratch._db.close()
+            await asyncio.get_running_loop().run_in_executor(get_executor(), self._swap_in, scratch_path, project_key)
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                Path(scratch_path + suffix).unlink(missing_ok=True)
+
+        self._statuses.update(scratch._statuses)
+        self._sprints.update(scratch._sprints)
+        for name, value in scratch.stats.items():
+            self.stats[name] += value
+        return {**result, "seconds": round(time.time() - started, 2)}
+
+    def _swap_in(self, scratch_path, project_key):
+        """Replace a project's rows with those of a rebuilt scratch store in one transaction"""
+        with self._lock:
+            self._db.execute("ATTACH DATABASE ? AS scratch", (scratch_path,))
+            try:
+                with self._db:
+                    for table in PROJECT_TABLES:
+                        self._db.execute(f"DELETE FROM main.{table} WHERE project = ?", (project_key,))
+                        self._db.execute(f"INSERT INTO main.{table} SELECT * FROM scratch.{table} WHERE project = ?", (project_key,))
+                    self._db.execute("INSERT OR REPLACE INTO main.sprints SELECT * FROM scratch.sprints")
+                    # The rebuild read every key, so it also counts as a reconciliation
+                    self._db.execute("""
+                        INSERT INTO main.sync_state (project, last_sync, syncs, last_reconcile)
+                        SELECT project, last_sync, 1, last_sync FROM scratch.sync_state WHERE project = ?
+                        ON CONFLICT (project) DO UPDATE SET
+                            last_sync = excluded.last_sync, syncs = syncs + 1, last_reconcile = excluded.last_reconcile
+                    """, (project_key,))
+            finally:
+                self._db.execute("DETACH DATABASE scratch")
+
+    async def _reconcile(self, project_key):
+        """Take issues deleted or moved out of the project back out of the store and its rollups"""
+        live = set()
+        async with aclosing(stream_issues(f'project = {project_key}', ["key"], convert=lambda raw: raw["key"])) as keys:
+            async for key in keys:
+                live.add(key)
+        with self._lock:
+            gone = [row[0] for row in self._db.execute("SELECT key FROM issues WHERE project = ?", (project_key,))
+                    if row[0] not in live]
+        loop = asyncio.get_running_loop()
+        for i in range(0, len(gone), SYNC_BATCH):
+            await loop.run_in_executor(get_executor(), self._remove, gone[i:i + SYNC_BATCH])
+
+    def _remove(self, keys):
+        """Delete issues along with everything they added to the rollups"""
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            flows = [IssueFlow.from_row(row) for row in self._db.execute(
+                f"SELECT key, project, created, last_history, times, states, status_since, started, completed, "
+                f"sprints, completion FROM issues WHERE key IN ({marks})", keys
+            )]
+        rollups = Rollups()
+        for flow in flows:
+            for i in range(len(flow.states) - 1):
+                rollups.leave_status(flow.project, flow.states[i], flow.times[i + 1] - flow.times[i], sign=-1)
+            if flow.completion:
+                rollups.complete(flow.project, flow.completion["sprints"], flow.completion["cycle"], sign=-1)
+        self._write([], rollups, removed=[flow.key for flow in flows])
+        self.stats["issues_removed"] += len(flows)
+
+    def _load_statuses(self, jira):
+        rows = []
+        for status in jira.statuses():
+            raw = status.raw
+            rows.append((int(raw["id"]), raw.get("name") or "", (raw.get("statusCategory") or {}).get("key") or ""))
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO statuses (id, name, category) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+        self._statuses.update({row[0]: row[1:] for row in rows})
+
+    def _note_status(self, status_id, name):
+        """Remember a status first met in a changelog, guessing its category from the name"""
+        if status_id not in self._statuses:
+            lowered = (name or "").lower()
+            category = DONE if lowered in DONE_STATUSES else NEW if lowered in ("to do", "open", "backlog") else IN_PROGRESS
+            self._statuses[status_id] = (name or str(status_id), category)
+
+    async def _apply_batch(self, raws):
+        if not raws:
+            return
+        field = sprint_field()
+        for raw in raws:
+            # Search responses cap embedded changelogs; fetch the rest for the few issues that have more
+            changelog = raw.get("changelog") or {}
+            histories = changelog.get("histories") or []
+            if changelog.get("total", len(histories)) > len(histories):
+                changelog["histories"] = await jira_clients.run(lambda jira: full_changelog(jira, raw["key"]))
+                self.stats["changelog_refetches"] += 1
+            self._remember_sprints(parse_sprints(raw["fields"].get(field)))
+        await self._fetch_missing_sprints(raws)
+        await asyncio.get_running_loop().run_in_executor(get_executor(), self._apply_raws, raws)
+
+    def _apply_raws(self, raws):
+        keys = [raw["key"] for raw in raws]
+        with self._lock:
+            stored = {
+                row[0]: IssueFlow.from_row(row) for row in self._db.execute(
+                    f"SELECT key, project, created, last_history, times, states, status_since, started, completed, "
+                    f"sprints, completion FROM issues WHERE key IN ({','.join('?' * len(keys))})", keys
+                )
+            }
+
+        rollups = Rollups()
+        flows = [self._apply_issue(raw, stored.get(raw["key"]), rollups) for raw in raws]
+        self._write(flows, rollups)
+        self.stats["issues_fetched"] += len(raws)
+
+    def _apply_issue(self, raw, flow, rollups):
+        """Fold the unseen histories of one issue into its flow state and the rollups"""
+        histories = sorted(
+            (raw.get("changelog") or {}).get("histories") or [], key=lambda h: int(h["id"])
+        )
+        if flow is None:
+            flow = self._new_flow(raw, histories, rollups)
+
+        for history in histories:
+            history_id = int(history["id"])
+            if history_id <= flow.last_history:
+                continue
+            at = epoch(history.get("created")) or flow.status_since
+            for item in history.get("items") or []:
+                if is_status_item(item) and str(item.get("to") or "").isdigit():
+                    self._note_status(int(item["to"]), item.get("toString"))
+                    self._transition(flow, int(item["to"]), at, rollups)
+                elif is_sprint_item(item):
+                    before, after = sprint_ids(item.get("from")), sprint_ids(item.get("to"))
+                    for sprint in after:
+                        if sprint not in before and sprint not in flow.sprints:
+                            flow.sprints.append(sprint)
+                            rollups.scope.append((flow.project, sprint, flow.key, at, 1))
+                    for sprint in before:
+                        if sprint not in after and sprint in flow.sprints:
+                            flow.sprints.remove(sprint)
+                            rollups.scope.append((flow.project, sprint, flow.key, at, -1))
+            flow.last_history = history_id
+            self.stats["histories_applied"] += 1
+        return flow
+
+    def _new_flow(self, raw, histories, rollups):
+        """Flow state as of the issue's creation, worked back from its first changes"""
+        fields = raw["fields"]
+        created = epoch(fields.get("created")) or int(time.time())
+        status = fields.get("status") or {}
+        first_status = next((item for h in histories for item in h.get("items") or [] if is_status_item(item)), None)
+        if first_status and str(first_status.get("from") or "").isdigit():
+            initial, name = int(first_status["from"]), first_status.get("fromString")
+        else:
+            initial, name = int(status.get("id") or 0), status.get("name")
+        self._note_status(initial, name)
+
+        project = raw["key"].split("-")[0]
+        flow = IssueFlow(raw["key"], project, created, initial)
+        if self._category(initial) != NEW:
+            flow.started = created
+        if self._category(initial) == DONE:
+            flow.completed = created
+
+        # Sprints set when the issue was created leave no Sprint history behind
+        first_sprint = next((item for h in histories for item in h.get("items") or [] if is_sprint_item(item)), None)
+        if first_sprint is not None:
+            initial_sprints = sprint_ids(first_sprint.get("from"))
+        else:
+            initial_sprints = [s["id"] for s in parse_sprints(fields.get(sprint_field())) if s["id"] is not None]
+        for sprint in initial_sprints:
+            flow.sprints.append(sprint)
+            rollups.scope.append((project, sprint, flow.key, created, 1))
+        return flow
+
+    def _category(self, status_id):
+        return self._statuses.get(status_id, ("", IN_PROGRESS))[1]
+
+    def _transition(self, flow, status, at, rollups):
+        if status == flow.status:
+            return
+        at = max(at, flow.status_since)
+        rollups.leave_status(flow.project, flow.status, at - flow.status_since)
+        flow.times.append(at)
+        flow.states.append(status)
+        flow.status_since = at
+        self.stats["transitions"] += 1
+
+        category = self._category(status)
+        if category != NEW and flow.started is None:
+            flow.started = at
+        if category == DONE and flow.completed is None:
+            flow.completed = at
+            sprints = self._sprints_at(flow.sprints, at)
+            cycle = at - (flow.started or at)
+            flow.completion = {"sprints": sprints, "cycle": cycle}
+            rollups.complete(flow.project, sprints, cycle)
+        elif category != DONE and flow.completed is not None:
+            # Reopened: the completion no longer counts
+            if flow.completion:
+                rollups.complete(flow.project, flow.completion["sprints"], flow.completion["cycle"], sign=-1)
+            flow.completed = flow.completion = None
+
+    def _sprints_at(self, sprints, at):
+        """The sprints among `sprints` that were running at `at` (or the latest one joined)"""
+        running = []
+        for sprint in sprints:
+            start, closes = self._sprints.get(sprint, (None, None))
+            if start is not None and start <= at and (closes is None or at <= closes):
+                running.append(sprint)
+        return running or sprints[-1:]
+
+    def _remember_sprints(self, sprints):
+        rows = []
+        for sprint in sprints:
+            if sprint["id"] is None:
+                continue
+            start, end, complete = epoch(sprint["start"]), epoch(sprint["end"]), epoch(sprint["complete"])
+            closes = complete or (None if sprint["state"] in ("active", "future") else end)
+            if self._sprints.get(sprint["id"]) != (start, closes):
+                self._sprints[sprint["id"]] = (start, closes)
+                rows.append((sprint["id"], sprint["name"], sprint["state"], start, end, closes))
+        if rows:
+            with self._lock:
+                self._db.executemany("""
+                    INSERT INTO sprints (id, name, state, start, end, closes) VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        name = excluded.name, state = excluded.state, start = excluded.start,
+                        end = excluded.end, closes = excluded.closes
+                """, rows)
+                self._db.commit()
+
+    async def _fetch_missing_sprints(self, raws):
+        """Look up sprints that only appear in changelogs (ones the issue has since left)"""
+        missing = {
+            sprint
+            for raw in raws
+            for history in (raw.get("changelog") or {}).get("histories") or []
+            for item in history.get("items") or []
+            if is_sprint_item(item)
+            for sprint in sprint_ids(item.get("from")) + sprint_ids(item.get("to"))
+            if sprint not in self._sprints
+        }
+        for sprint in sorted(missing):
+            try:
+                raw = await jira_clients.run(lambda jira: jira.sprint(sprint).raw)
+            except Exception:
+                # Deleted sprint or no Jira Software; keep it without dates so it is not asked for again
+                raw = {"id": sprint, "name": str(sprint), "state": ""}
+            self.stats["sprint_fetches"] += 1
+            self._remember_sprints(parse_sprints([raw]))
+            self._sprints.setdefault(sprint, (None, None))
+
+    def _write(self, flows, rollups, removed=()):
+        with self._lock:
+            if removed:
+                marks = ",".join("?" * len(removed))
+                self._db.execute(f"DELETE FROM scope_events WHERE issue IN ({marks})", removed)
+                self._db.execute(f"DELETE FROM issues WHERE key IN ({marks})", removed)
+            self._db.executemany("""
+                INSERT OR REPLACE INTO issues (key, project, created, last_history, times, states, status,
+                    status_since, started, completed, sprints, completion)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [flow.row() for flow in flows])
+            self._db.executemany("""
+                INSERT INTO status_rollups (project, status, seconds, visits) VALUES (?, ?, ?, ?)
+                ON CONFLICT (project, status) DO UPDATE SET
+                    seconds = seconds + excluded.seconds, visits = visits + excluded.visits
+            """, [(p, s, seconds, visits) for (p, s), (seconds, visits) in rollups.status.items()])
+            self._db.executemany("""
+                INSERT INTO sprint_rollups (sprint, project, completed, cycle_seconds) VALUES (?, ?, ?, ?)
+                ON CONFLICT (sprint, project) DO UPDATE SET
+                    completed = completed + excluded.completed, cycle_seconds = cycle_seconds + excluded.cycle_seconds
+            """, [(s, p, done, cycle) for (s, p), (done, cycle) in rollups.sprints.items()])
+            self._db.executemany("""
+                INSERT INTO cycle_histogram (sprint, project, bucket, issues) VALUES (?, ?, ?, ?)
+                ON CONFLICT (sprint, project, bucket) DO UPDATE SET issues = issues + excluded.issues
+            """, [(s, p, b, n) for (s, p, b), n in rollups.histogram.items()])
+            self._db.executemany(
+                "INSERT INTO scope_events (project, sprint, issue, at, delta) VALUES (?, ?, ?, ?, ?)", rollups.scope
+            )
+            self._db.commit()
+        self.stats["scope_events"] += len(rollups.scope)
+
+    # -- Freshness ----------------------------------------------------------
+
+    def _state(self, project_key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_sync, syncs, last_reconcile FROM sync_state WHERE project = ?", (project_key,)
+            ).fetchone()
+        return None if row is None else {"last_sync": row[0], "syncs": row[1], "last_reconcile": row[2]}
+
+    def has_project(self, project_key):
+        return self._state(project_key.upper()) is not None
+
+    def is_fresh(self, project_key):
+        state = self._state(project_key.upper())
+        return state is not None and time.time() - state["last_sync"] <= self.max_age
+
+    async def ensure(self, project_key, full=False):
+        """Sync a project unless it is fresh; concurrent callers share one sync"""
+        project_key = project_key.upper()
+        if full or not self.is_fresh(project_key):
+            await flow_flights.do(
+                (project_key, full), lambda: self.sync(project_key, full=full)
+            )
+
+    # -- Queries ------------------------------------------------------------
+
+    def status_name(self, status_id):
+        return self._statuses.get(status_id, (str(status_id), ""))[0]
+
+    def sprint_metrics(self, project_key, sprints=20):
+        """Scope, completion and cycle time of the project's latest started sprints, newest first"""
+        project_key = project_key.upper()
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT s.id, s.name, s.state, s.start, s.end, s.closes FROM sprints s
+                WHERE s.start IS NOT NULL
+                  AND s.id IN (SELECT DISTINCT sprint FROM scope_events WHERE project = ?)
+                ORDER BY s.start DESC LIMIT ?
+            """, (project_key, sprints)).fetchall()
+            ids = [row[0] for row in rows]
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            # Scope change is read off the membership events against each sprint's window
+            scope = {row[0]: row[1:] for row in self._db.execute(f"""
+                SELECT e.sprint,
+                    SUM(CASE WHEN e.at <= s.start THEN e.delta ELSE 0 END),
+                    SUM(CASE WHEN e.at > s.start AND (s.closes IS NULL OR e.at <= s.closes) AND e.delta > 0 THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN e.at > s.start AND (s.closes IS NULL OR e.at <= s.closes) AND e.delta < 0 THEN 1 ELSE 0 END)
+                FROM scope_events e JOIN sprints s ON s.id = e.sprint
+                WHERE e.project = ? AND e.sprint IN ({marks})
+                GROUP BY e.sprint
+            """, [project_key, *ids])}
+            done = {row[0]: row[1:] for row in self._db.execute(
+                f"SELECT sprint, completed, cycle_seconds FROM sprint_rollups WHERE project = ? AND sprint IN ({marks})",
+                [project_key, *ids],
+            )}
+            histograms = {}
+            for sprint, bucket, issues in self._db.execute(
+                f"SELECT sprint, bucket, issues FROM cycle_histogram WHERE project = ? AND sprint IN ({marks})",
+                [project_key, *ids],
+            ):
+                histograms.setdefault(sprint, [0] * (len(CYCLE_BUCKETS) + 1))[bucket] = issues
+
+        metrics = []
+        for sprint, name, state, start, end, closes in rows:
+            committed, added, removed = scope.get(sprint, (0, 0, 0))
+            completed, cycle_seconds = done.get(sprint, (0, 0))
+            histogram = histograms.get(sprint, [0] * (len(CYCLE_BUCKETS) + 1))
+            planned = committed + added - removed
+            metrics.append({
+                "sprint": sprint,
+                "name": name,
+                "state": state,
+                "start": start,
+                "end": closes or end,
+                "committed": committed,
+                "added": added,
+                "removed": removed,
+                "completed": completed,
+                "completion_rate": round(completed / planned, 3) if planned > 0 else None,
+                "avg_cycle_hours": round(cycle_seconds / completed / 3600, 1) if completed else None,
+                "p50_cycle_hours": histogram_percentile(histogram, 0.5),
+                "p85_cycle_hours": histogram_percentile(histogram, 0.85),
+            })
+        return metrics
+
+    def time_in_status(self, project_key):
+        """Closed time per status, in hours, with the number of visits, most time first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, seconds, visits FROM status_rollups WHERE project = ? ORDER BY seconds DESC",
+                (project_key.upper(),),
+            ).fetchall()
+        return [
+            {"status": self.status_name(status), "hours": round(seconds / 3600, 1), "visits": visits,
+             "avg_hours": round(seconds / visits / 3600, 1) if visits else None}
+            for status, seconds, visits in rows
+        ]
+
+    def wip(self, project_key, limit=10, now=None):
+        """Started, unfinished issues, oldest first, with their age and time in the current status"""
+        now = now or time.time()
+        with self._lock:
+            count = self._db.execute(
+                "SELECT COUNT(*) FROM issues WHERE project = ? AND completed IS NULL AND started IS NOT NULL",
+                (project_key.upper(),),
+            ).fetchone()[0]
+            rows = self._db.execute("""
+                SELECT key, status, started, status_since FROM issues
+                WHERE project = ? AND completed IS NULL AND started IS NOT NULL
+                ORDER BY started ASC LIMIT ?
+            """, (project_key.upper(), limit)).fetchall()
+        return count, [
+            {"key": key, "status": self.status_name(status),
+             "age_days": round((now - started) / 86400, 1), "in_status_days": round((now - since) / 86400, 1)}
+            for key, status, started, since in rows
+        ]
+
+    def unmoved(self, keys, days, now=None):
+        """Of `keys`, those whose status has not changed for `days` days: {key: (status, days)}"""
+        now = now or time.time()
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT key, status, status_since FROM issues WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+            for key, status, since in rows:
+                idle = (now - since) / 86400
+                if idle >= days:
+                    found[key] = (self.status_name(status), round(idle, 1))
+        return found
+
+    def timeline(self, issue_key):
+        """[(epoch seconds, status name)] for one issue, or None if it was never synced"""
+        with self._lock:
+            row = self._db.execute("SELECT times, states FROM issues WHERE key = ?", (issue_key.upper(),)).fetchone()
+        if row is None:
+            return None
+        times, states = array("I"), array("I")
+        times.frombytes(row[0])
+        states.frombytes(row[1])
+        return [(t, self.status_name(s)) for t, s in zip(times, states)]
+
+    def summary(self):
+        with self._lock:
+            projects = [row[0] for row in self._db.execute("SELECT project FROM sync_state ORDER BY project")]
+            issues = self._db.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+        return {**self.stats, "path": str(self.path), "projects": projects, "issues": issues}
+
+
+def stale_days():
+    """Days without a status change after which a sprint issue counts as not moving"""
+    return env_int("JIRAIQ_FLOW_STALE_DAYS", 5)
+
+
+_flow_store = None
+_flow_store_loaded = False
+_flow_store_lock = threading.Lock()
+
+
+def get_flow_store():
+    """Return the process-wide flow store, or None when it is disabled"""
+    global _flow_store, _flow_store_loaded
+    with _flow_store_lock:
+        if not _flow_store_loaded:
+            _flow_store = FlowStore.from_env()
+            _flow_store_loaded = True
+        return _flow_store
+
+
+def main(argv):
+    """Command line entry point for syncing and reporting flow metrics"""
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="Fetch new changelog entries")
+    sync.add_argument("projects", nargs="+")
+    sync.add_argument("--full", action="store_true", help="Rebuild the projects from scratch")
+    report = commands.add_parser("report", help="Print the precomputed metrics")
+    report.add_argument("project")
+    report.add_argument("--sprints", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = get_flow_store()
+    if store is None:
+        print("Flow metrics are disabled (JIRAIQ_FLOW_PATH=off)")
+        return 1
+
+    if args.command == "sync":
+        for project_key in args.projects:
+            result = asyncio.run(store.sync(project_key, full=args.full))
+            print(json.dumps(result))
+    else:
+        wip_count, oldest = store.wip(args.project)
+        print(json.dumps({
+            "sprints": store.sprint_metrics(args.project, args.sprints),
+            "time_in_status": store.time_in_status(args.project),
+            "wip": {"count": wip_count, "oldest": oldest},
+        }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
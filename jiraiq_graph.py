@@ -0,0 +1,535 @@
+"""
+JiraIQ dependency graph
+"Is blocked by" issue links across projects, held as compact adjacency arrays
+"""
+
+import asyncio
+import heapq
+import math
+import os
+import threading
+import time
+from array import array
+from collections import namedtuple
+from contextlib import aclosing
+
+from jiraiq_clients import env_float, get_executor
+from jiraiq_search import stream_issues, GRAPH_FIELDS
+from jiraiq_singleflight import graph_flights
+
+
+# Link types whose inward side reads "is blocked by"; override with JIRAIQ_BLOCKING_LINK_TYPES
+DEFAULT_BLOCKING_LINK_TYPES = "Blocks"
+
+# Statuses treated as resolved when Jira sent no status category
+DONE_STATUSES = {"done", "closed", "resolved"}
+
+# Minutes of overlap added to every delta query to absorb clock skew
+SYNC_OVERLAP_MINUTES = 5
+
+# What the graph keeps per issue; `blocked_by` and `blocks` hold issue keys
+GraphNode = namedtuple("GraphNode", ["summary", "status", "resolved", "blocked_by", "blocks"])
+
+
+def blocking_link_types():
+    value = os.getenv("JIRAIQ_BLOCKING_LINK_TYPES", DEFAULT_BLOCKING_LINK_TYPES)
+    return {t.strip().lower() for t in value.split(",") if t.strip()}
+
+
+def is_resolved(status):
+    """True for a status in Jira's done category"""
+    if not status:
+        return False
+    category = (status.get("statusCategory") or {}).get("key")
+    if category:
+        return category == "done"
+    return (status.get("name") or "").lower() in DONE_STATUSES
+
+
+def graph_node(raw, link_types):
+    """(key, node, linked) from an issue's JSON
+
+    `linked` maps the other side of each blocking link to a status-only
+    node when Jira embedded its status, so issues in projects that were
+    not loaded still count as resolved or not.
+    """
+    fields = raw.get("fields") or {}
+    status = fields.get("status")
+    blocked_by, blocks, linked = [], [], {}
+    for link in fields.get("issuelinks") or ():
+        if (link.get("type") or {}).get("name", "").lower() not in link_types:
+            continue
+        other = link.get("inwardIssue") or link.get("outwardIssue")
+        if not other or not other.get("key"):
+            continue
+        (blocked_by if "inwardIssue" in link else blocks).append(other["key"])
+        other_status = (other.get("fields") or {}).get("status")
+        if other_status:
+            linked[other["key"]] = GraphNode(
+                (other.get("fields") or {}).get("summary") or "", other_status.get("name"),
+                is_resolved(other_status), (), (),
+            )
+    node = GraphNode(
+        fields.get("summary") or "",
+        (status or {}).get("name") or "Unknown",
+        is_resolved(status),
+        tuple(blocked_by),
+        tuple(blocks),
+    )
+    return raw["key"], node, linked
+
+
+def csr(n, pairs):
+    """Compressed sparse rows for edges (u, v) over nodes 0..n-1
+
+    The successors of u are targets[offsets[u]:offsets[u + 1]].
+    """
+    offsets = array("i", bytes(4 * (n + 1)))
+    for u, _ in pairs:
+        offsets[u + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    targets = array("i", bytes(4 * len(pairs)))
+    fill = offsets[:-1]
+    for u, v in pairs:
+        targets[fill[u]] = v
+        fill[u] += 1
+    return offsets, targets
+
+
+def strongly_connected(n, offsets, targets):
+    """Tarjan's algorithm without recursion
+
+    Returns each node's component and the component count. Components are
+    numbered in reverse topological order: an edge between components
+    always points from a higher number to a lower one.
+    """
+    index = array("i", [-1]) * n
+    low = array("i", [0]) * n
+    component = array("i", [-1]) * n
+    on_stack = bytearray(n)
+    stack = []
+    counter = components = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [[root, offsets[root]]]
+        while work:
+            frame = work[-1]
+            v, i = frame
+            if i < offsets[v + 1]:
+                frame[1] = i + 1
+                w = targets[i]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = 1
+                    work.append([w, offsets[w]])
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+
+            work.pop()
+            if work and low[v] < low[work[-1][0]]:
+                low[work[-1][0]] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = 0
+                    component[w] = components
+                    if w == v:
+                        break
+                components += 1
+    return component, components
+
+
+def weak_components(n, offsets, targets):
+    """Label the weakly connected components of a CSR graph (union-find, path halving)"""
+    parent = array("i", range(n))
+
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    for u in range(n):
+        for i in range(offsets[u], offsets[u + 1]):
+            a, b = find(u), find(targets[i])
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    return array("i", (find(u) for u in range(n)))
+
+
+class DependencyGraph:
+    """Compiled, read-only view of the blocking links between issues
+
+    Issues are numbered 0..n-1. Only links between two unresolved issues
+    can hold work up, so those form the CSR arrays (blocker -> blocked,
+    plus the reverse). Compiling runs the blocked propagation once:
+    cycles are condensed with Tarjan's SCCs, and one pass over the
+    condensation, sinks first, gives every issue its blast radius (how
+    many issues it holds up, directly or not) and its longest downstream
+    chain. Downstream sets are int bitsets numbered within each weakly
+    connected cluster of linked issues, so their size follows the cluster
+    rather than the whole graph, and each is dropped once every blocker
+    of its issue has used it. Per-issue upstream questions walk the
+    reverse arrays, which only visits that issue's own blockers.
+    """
+
+    def __init__(self, keys, nodes, external):
+        started = time.perf_counter()
+        n = len(keys)
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.nodes = nodes
+        self.external = external
+        loaded = n - len(external)
+        unresolved = bytearray(not node.resolved for node in nodes)
+
+        # Each link is taken from the blocked issue when it is loaded, since its
+        # own link list is current; otherwise from the blocker's side
+        links = set()
+        for v, node in enumerate(nodes):
+            for key in node.blocked_by:
+                u = self.index.get(key)
+                if u is not None:
+                    links.add((u, v))
+            for key in node.blocks:
+                w = self.index.get(key)
+                if w is not None and w >= loaded:
+                    links.add((v, w))
+        self.links = len(links)
+        active = [(u, v) for u, v in links if unresolved[u] and unresolved[v] and u != v]
+        self.active_links = len(active)
+        self.offsets, self.targets = csr(n, active)
+        self.roffsets, self.rtargets = csr(n, [(v, u) for u, v in active])
+
+        component, count = strongly_connected(n, self.offsets, self.targets)
+        self.component = component
+        members = [[] for _ in range(count)]
+        for u in range(n):
+            members[component[u]].append(u)
+        self.members = members
+
+        # Number the issues of each cluster from 0, component by component, so a
+        # component's own bits are one contiguous run
+        cluster = weak_components(n, self.offsets, self.targets)
+        next_bit = {}
+        first_bit = array("i", [0]) * count
+        for c in range(count):
+            root = cluster[members[c][0]]
+            first_bit[c] = next_bit.get(root, 0)
+            next_bit[root] = first_bit[c] + len(members[c])
+
+        # How many links from other components still need each component's bits
+        pending = array("i", [0]) * count
+        for u, v in active:
+            if component[u] != component[v]:
+                pending[component[v]] += 1
+        held = bytearray(p > 0 for p in pending)
+
+        # Sinks first (Tarjan numbers components in reverse topological order)
+        down = {}
+        radius = array("i", [0]) * count
+        chain = array("i", [0]) * count
+        following = array("i", [-1]) * count
+        for c in range(count):
+            bits, best, best_next = 0, 0, -1
+            for u in members[c]:
+                for i in range(self.offsets[u], self.offsets[u + 1]):
+                    d = component[self.targets[i]]
+                    if d == c:
+                        continue
+                    bits |= down[d] | (((1 << len(members[d])) - 1) << first_bit[d])
+                    pending[d] -= 1
+                    if not pending[d]:
+                        del down[d]
+                    if chain[d] > best:
+                        best, best_next = chain[d], d
+            if pending[c]:
+                down[c] = bits
+            radius[c] = bits.bit_count() + len(members[c]) - 1
+            chain[c] = len(members[c]) + best
+            following[c] = best_next
+
+        self.radius = radius
+        self.chain = chain
+        self.following = following
+        # Unresolved blockers that nothing else holds up: where unblocking has to start
+        self.roots = bytearray(not held[c] and radius[c] > 0 for c in range(count))
+        self.compile_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _upstream(self, u):
+        """Every issue holding u up, found by walking the reverse links"""
+        seen = {u}
+        frontier = [u]
+        while frontier:
+            v = frontier.pop()
+            for i in range(self.roffsets[v], self.roffsets[v + 1]):
+                w = self.rtargets[i]
+                if w not in seen:
+                    seen.add(w)
+                    frontier.append(w)
+        seen.discard(u)
+        return seen
+
+    def _downstream(self, u):
+        seen = {u}
+        frontier = [u]
+        while frontier:
+            v = frontier.pop()
+            for i in range(self.offsets[v], self.offsets[v + 1]):
+                w = self.targets[i]
+                if w not in seen:
+                    seen.add(w)
+                    frontier.append(w)
+        seen.discard(u)
+        return seen
+
+    def blast_radius(self, key):
+        """How many unresolved issues this issue holds up, directly or through others"""
+        u = self.index.get(key)
+        return 0 if u is None else self.radius[self.component[u]]
+
+    def blocked(self, key):
+        """(direct, transitive): the unresolved issues this one holds up"""
+        u = self.index.get(key)
+        if u is None:
+            return [], []
+        direct = sorted(self.keys[self.targets[i]] for i in range(self.offsets[u], self.offsets[u + 1]))
+        return direct, sorted(self.keys[w] for w in self._downstream(u))
+
+    def blockers(self, key):
+        """(direct, transitive, roots): the unresolved issues holding this one up"""
+        u = self.index.get(key)
+        if u is None:
+            return [], [], []
+        direct = sorted(self.keys[self.rtargets[i]] for i in range(self.roffsets[u], self.roffsets[u + 1]))
+        upstream = self._upstream(u)
+        transitive = sorted(self.keys[w] for w in upstream)
+        roots = sorted(self.keys[w] for w in upstream if self.roots[self.component[w]])
+        return direct, transitive, roots
+
+    def top_blockers(self, limit=10, projects=None):
+        """Unresolved issues with the largest blast radius, as (key, radius, direct, chain)"""
+        candidates = []
+        for u, key in enumerate(self.keys):
+            if self.offsets[u + 1] == self.offsets[u]:
+                continue
+            if projects and key.split("-")[0] not in projects:
+                continue
+            c = self.component[u]
+            candidates.append((self.radius[c], key, u, c))
+        return [
+            (key, radius, self.offsets[u + 1] - self.offsets[u], self.chain[c])
+            for radius, key, u, c in heapq.nsmallest(limit, candidates, key=lambda item: (-item[0], item[1]))
+        ]
+
+    def critical_path(self, projects=None):
+        """The longest chain of unresolved issues blocking one another
+
+        Each step is a list of issue keys: one issue, or every issue of a
+        dependency cycle on the path.
+        """
+        best = -1
+        for c in range(len(self.members)):
+            if not self.radius[c]:
+                continue
+            if projects and not any(self.keys[u].split("-")[0] in projects for u in self.members[c]):
+                continue
+            if best == -1 or self.chain[c] > self.chain[best]:
+                best = c
+        path = []
+        while best != -1:
+            path.append(sorted(self.keys[u] for u in self.members[best]))
+            best = self.following[best]
+        return path
+
+    def cycles(self, projects=None):
+        """Groups of unresolved issues that block each other"""
+        return [
+            sorted(self.keys[u] for u in group)
+            for group in self.members
+            if len(group) > 1 and (not projects or any(self.keys[u].split("-")[0] in projects for u in group))
+        ]
+
+    def blocked_count(self, projects=None):
+        return sum(
+            1 for u, key in enumerate(self.keys)
+            if self.roffsets[u + 1] > self.roffsets[u] and (not projects or key.split("-")[0] in projects)
+        )
+
+    def root_blockers(self, projects=None):
+        """Unresolved blockers that nothing else holds up"""
+        return [
+            key for u, key in enumerate(self.keys)
+            if self.roots[self.component[u]] and (not projects or key.split("-")[0] in projects)
+        ]
+
+    def blockage(self, keys):
+        """Which of `keys` are held up through links, and the root blockers behind them
+
+        Returns (blocked, roots): blocked maps each held-up key to its root
+        blockers, and roots counts how many of `keys` each root holds up.
+        """
+        blocked, roots = {}, {}
+        for key in keys:
+            u = self.index.get(key)
+            if u is None or self.roffsets[u + 1] == self.roffsets[u]:
+                continue
+            found = sorted(self.keys[w] for w in self._upstream(u) if self.roots[self.component[w]])
+            blocked[key] = found
+            for root in found:
+                roots[root] = roots.get(root, 0) + 1
+        return blocked, roots
+
+
+class DependencyGraphStore:
+    """Link graph of every project loaded so far, refreshed incrementally
+
+    The first load of a project fetches the status and links of all its
+    issues in one paged search (no per-link calls). Once the project is
+    older than JIRAIQ_GRAPH_MAX_AGE, only issues updated since the last
+    refresh are fetched; a full refetch every
+    JIRAIQ_GRAPH_RECONCILE_INTERVAL drops deleted issues. Webhooks update
+    single issues in between. Any change marks the compiled graph stale,
+    and the next query recompiles it.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self._external = {}
+        self._projects = {}
+        self._graph = None
+        self._lock = threading.Lock()
+        self.stats = {"syncs": 0, "full_syncs": 0, "issues_fetched": 0, "updates": 0, "compiles": 0}
+
+    @property
+    def max_age(self):
+        return env_float("JIRAIQ_GRAPH_MAX_AGE", 300.0)
+
+    @property
+    def reconcile_interval(self):
+        return env_float("JIRAIQ_GRAPH_RECONCILE_INTERVAL", 21600.0)
+
+    def has_project(self, project_key):
+        return project_key.upper() in self._projects
+
+    def is_fresh(self, project_key):
+        state = self._projects.get(project_key.upper())
+        return state is not None and time.time() - state["last_sync"] <= self.max_age
+
+    async def ensure(self, project_keys):
+        """Refresh the projects that are missing or stale and return the compiled graph"""
+        stale = [p.upper() for p in project_keys if not self.is_fresh(p)]
+        for project_key in stale:
+            # Concurrent calls needing the same project share one refresh
+            await graph_flights.do(project_key, lambda p=project_key: self.sync(p))
+        # Compiling a large graph takes a while; keep it off the event loop
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), self.compiled)
+
+    async def sync(self, project_key, full=False):
+        """Fetch a project's links (all of them, or those changed since the last sync)"""
+        state = self._projects.get(project_key)
+        started = time.time()
+        full = full or state is None or started - state["last_full"] > self.reconcile_interval
+
+        jql = f'project = {project_key}'
+        if not full:
+            minutes = math.ceil((started - state["last_sync"]) / 60) + SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+
+        types = blocking_link_types()
+        fetched, linked = {}, {}
+        async with aclosing(stream_issues(jql, GRAPH_FIELDS, convert=lambda raw: graph_node(raw, types))) as issues:
+            async for key, node, others in issues:
+                fetched[key] = node
+                linked.update(others)
+
+        with self._lock:
+            if full:
+                prefix = f"{project_key}-"
+                for key in [k for k in self._nodes if k.startswith(prefix) and k not in fetched]:
+                    del self._nodes[key]
+            self._nodes.update(fetched)
+            self._external.update(linked)
+            self._projects[project_key] = {
+                "last_sync": started,
+                "last_full": started if full else state["last_full"],
+            }
+            self._graph = None
+            self.stats["syncs"] += 1
+            self.stats["full_syncs"] += int(full)
+            self.stats["issues_fetched"] += len(fetched)
+        return {"project": project_key, "mode": "full" if full else "delta", "fetched": len(fetched)}
+
+    def update_issue(self, raw):
+        """Apply one issue pushed by a webhook, if its project is loaded"""
+        key, node, others = graph_node(raw, blocking_link_types())
+        if key.split("-")[0] not in self._projects:
+            return False
+        with self._lock:
+            self._nodes[key] = node
+            self._external.update(others)
+            self._graph = None
+            self.stats["updates"] += 1
+        return True
+
+    def remove_issue(self, issue_key):
+        with self._lock:
+            if self._nodes.pop(issue_key, None) is not None:
+                self._graph = None
+                self.stats["updates"] += 1
+
+    def compiled(self):
+        """The compiled graph, rebuilt only after something changed"""
+        with self._lock:
+            if self._graph is None:
+                keys = list(self._nodes)
+                external = [k for k in self._external if k not in self._nodes]
+                # Linked issues seen only from the other side, with no embedded status,
+                # are kept as unresolved so a link to them is never silently dropped
+                unknown = {
+                    k for node in self._nodes.values() for k in node.blocked_by + node.blocks
+                    if k not in self._nodes and k not in self._external
+                }
+                external += sorted(unknown)
+                nodes = list(self._nodes.values()) + [
+                    self._external.get(k) or GraphNode("", "Unknown", False, (), ()) for k in external
+                ]
+                self._graph = DependencyGraph(keys + external, nodes, external)
+                self.stats["compiles"] += 1
+            return self._graph
+
+    def summary(self):
+        graph = self._graph
+        return {
+            **self.stats,
+            "projects": sorted(self._projects),
+            "issues": len(self._nodes),
+            "compiled": graph is not None,
+            "last_compile_ms": graph.compile_ms if graph is not None else None,
+        }
+
+
+_dependency_graph = None
+_dependency_graph_lock = threading.Lock()
+
+
+def get_dependency_graph():
+    """Return the process-wide dependency graph store, creating it on first use"""
+    global _dependency_graph
+    with _dependency_graph_lock:
+        if _dependency_graph is None:
+            _dependency_graph = DependencyGraphStore()
+        return _dependency_graph
@@ -0,0 +1,100 @@
+"""
+JiraIQ HTTP transport
+Serves the MCP tools to many clients from one long-lived process (or a few workers)
+"""
+
+import contextlib
+import os
+import sys
+
+from mcp.server.sse import SseServerTransport
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+
+from jiraiq_prefetch import get_prefetcher
+from jiraiq_webhooks import webhook_route, webhooks_enabled
+
+
+class StreamableHTTPEndpoint:
+    """ASGI endpoint that hands /mcp requests to the session manager"""
+
+    def __init__(self, session_manager):
+        self.session_manager = session_manager
+
+    async def __call__(self, scope, receive, send):
+        await self.session_manager.handle_request(scope, receive, send)
+
+
+def create_http_app(server=None, stateless=None, host=None):
+    """Build the Starlette app serving the MCP server over HTTP
+
+    Streamable HTTP is served at /mcp and the older SSE transport at /sse
+    (with client messages posted to /messages/). In stateless mode, used
+    when several worker processes share a port, no session state is kept
+    between requests, so SSE is not offered because it needs every request
+    of a session to reach the same process. With JIRAIQ_WEBHOOKS=1, Jira
+    webhooks are accepted at /webhooks/jira, unsigned ones only when `host`
+    is a loopback address. The prefetcher, when
+    configured, runs for the lifetime of the app.
+    """
+    if server is None:
+        from jiraiq_server import app as server
+    if stateless is None:
+        stateless = os.getenv("JIRAIQ_HTTP_STATELESS", "0") == "1"
+    if host is None:
+        host = os.getenv("JIRAIQ_HTTP_HOST", "127.0.0.1")
+
+    session_manager = StreamableHTTPSessionManager(app=server, stateless=stateless)
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+        return Response()
+
+    async def health(request):
+        return JSONResponse({"status": "ok", "pid": os.getpid(), "stateless": stateless})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_):
+        prefetcher = get_prefetcher()
+        prefetcher.start()
+        try:
+            async with session_manager.run():
+                yield
+        finally:
+            await prefetcher.stop()
+
+    routes = [
+        Route("/healthz", health),
+        Route("/mcp", StreamableHTTPEndpoint(session_manager)),
+    ]
+    if webhooks_enabled():
+        routes.append(webhook_route(host))
+    if not stateless:
+        routes += [
+            Route("/sse", handle_sse, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def serve(server, host, port, workers=1):
+    """Run the HTTP transport with uvicorn, optionally across several worker processes"""
+    import uvicorn
+
+    if workers <= 1:
+        uvicorn.run(create_http_app(server, host=host), host=host, port=port)
+        return
+    if webhooks_enabled():
+        # A webhook reaches one worker, and only that worker's in-memory graph,
+        # prefetch and similarity state would see the change
+        sys.exit("jiraiq: JIRAIQ_WEBHOOKS=1 needs a single HTTP worker; run with --workers 1")
+
+    # Each worker imports the server afresh; requests of one client may reach any
+    # worker, so sessions are stateless and the SQLite cache and mirror are shared
+    os.environ["JIRAIQ_HTTP_STATELESS"] = "1"
+    os.environ["JIRAIQ_HTTP_HOST"] = host
+    uvicorn.run("jiraiq_http:create_http_app", factory=True, host=host, port=port, workers=workers)
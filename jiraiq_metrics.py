@@ -0,0 +1,262 @@
+"""
+JiraIQ metrics
+Per-tool timing spans, counters and latency histograms, with optional profiling
+"""
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+COUNTERS = (
+    "calls", "errors", "jira_requests", "jira_bytes", "llm_calls",
+    "llm_input_tokens", "llm_output_tokens", "cache_hits", "cache_misses", "coalesced",
+    "retries", "triage_cheap", "triage_skipped",
+)
+
+PROFILE_MODES = ("cpu", "memory")
+
+# Name of the tool call the current task (or executor thread) is working for
+_current_tool = contextvars.ContextVar("jiraiq_current_tool", default="none")
+
+
+class Histogram:
+    """Latency histogram with lifetime buckets and a rolling sample window
+
+    The buckets and sum cover every observation since the last reset (what
+    Prometheus expects); percentiles are computed over the most recent
+    `window` samples so they follow the current behaviour of the server.
+    """
+
+    def __init__(self, window):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, pct):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(int(pct / 100 * len(ordered)), len(ordered) - 1)]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "p99_ms": round(self.percentile(99) * 1000, 1),
+            "max_ms": round(max(self.recent, default=0.0) * 1000, 1),
+        }
+
+
+class Metrics:
+    """Counters and stage histograms keyed by tool name"""
+
+    def __init__(self, window=None):
+        self._window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def window(self):
+        return self._window or int(os.getenv("JIRAIQ_METRICS_WINDOW") or 1000)
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = time.time()
+
+    def count(self, counter, amount=1, tool=None):
+        tool = tool or _current_tool.get()
+        with self._lock:
+            counters = self.counters.get(tool)
+            if counters is None:
+                counters = self.counters[tool] = dict.fromkeys(COUNTERS, 0)
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def observe(self, stage, seconds, tool=None):
+        tool = tool or _current_tool.get()
+        with self._lock:
+            histogram = self.histograms.get((tool, stage))
+            if histogram is None:
+                histogram = self.histograms[(tool, stage)] = Histogram(self.window)
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Counters and stage latency summaries per tool, as plain dicts"""
+        with self._lock:
+            tools = {tool: {"counters": dict(counters), "stages": {}} for tool, counters in self.counters.items()}
+            for (tool, stage), histogram in sorted(self.histograms.items()):
+                tools.setdefault(tool, {"counters": dict.fromkeys(COUNTERS, 0), "stages": {}})
+                tools[tool]["stages"][stage] = histogram.summary()
+            return {"since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)), "tools": tools}
+
+    def prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for counter in COUNTERS:
+                lines.append(f"# TYPE jiraiq_{counter}_total counter")
+                for tool, counters in sorted(self.counters.items()):
+                    lines.append(f'jiraiq_{counter}_total{{tool="{tool}"}} {counters.get(counter, 0)}')
+
+            lines.append("# TYPE jiraiq_stage_seconds histogram")
+            for (tool, stage), histogram in sorted(self.histograms.items()):
+                labels = f'tool="{tool}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS, histogram.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'jiraiq_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"jiraiq_stage_seconds_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"jiraiq_stage_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, fmt="prometheus"):
+        """Write the metrics to a file atomically (e.g. for a node_exporter textfile collector)"""
+        text = self.prometheus() if fmt == "prometheus" else json.dumps(self.snapshot(), indent=2)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
+
+
+def count(counter, amount=1):
+    """Add to a counter of the tool call currently being handled"""
+    metrics.count(counter, amount)
+
+
+@contextmanager
+def span(stage):
+    """Time a stage of the current tool call"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(stage, time.perf_counter() - started)
+
+
+async def timed_iter(stage, iterator):
+    """Re-yield an async iterator, timing only the waits for its items"""
+    waited = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = await anext(iterator)
+            except StopAsyncIteration:
+                waited += time.perf_counter() - started
+                break
+            waited += time.perf_counter() - started
+            yield item
+    finally:
+        metrics.observe(stage, waited)
+        await iterator.aclose()
+
+
+@contextmanager
+def tool_call(name):
+    """Attribute everything inside the block to tool `name` and time it"""
+    token = _current_tool.set(name)
+    metrics.count("calls")
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe("total", time.perf_counter() - started)
+        _current_tool.reset(token)
+        dump_path = os.getenv("JIRAIQ_STATS_FILE")
+        if dump_path:
+            metrics.dump(dump_path, "json" if dump_path.endswith(".json") else "prometheus")
+
+
+# ---------------------------------------------------------------------------
+# Per-call profiling
+# ---------------------------------------------------------------------------
+
+_profile_lock = threading.Lock()
+
+
+class ProfileCapture:
+    """Result holder for `capture_profile`; `report` is set when the block exits"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.report = None
+
+
+@contextmanager
+def capture_profile(mode, limit=20):
+    """Profile the block with cProfile ("cpu") or tracemalloc ("memory")
+
+    Only one call is profiled at a time. cProfile sees the event loop
+    thread, so time spent waiting on Jira and Claude shows up as the await
+    rather than inside the SDKs; tracemalloc sees every thread.
+    """
+    capture = ProfileCapture(mode)
+    if mode not in PROFILE_MODES:
+        yield capture
+        return
+
+    if not _profile_lock.acquire(blocking=False):
+        capture.report = "⚠️ Profiling skipped: another call is already being profiled"
+        yield capture
+        return
+
+    try:
+        if mode == "cpu":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield capture
+            finally:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+                capture.report = "🔬 CPU profile (cumulative time):\n" + out.getvalue().strip()
+        else:
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            try:
+                yield capture
+            finally:
+                after = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if not was_tracing:
+                    tracemalloc.stop()
+                top = after.compare_to(before, "lineno")[:limit]
+                capture.report = (
+                    f"🔬 Memory profile: peak {peak / 1024:,.1f} KiB traced during the call\n"
+                    + "\n".join(str(stat) for stat in top)
+                )
+    finally:
+        _profile_lock.release()
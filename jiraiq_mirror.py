@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+JiraIQ issue mirror
+Local SQLite copy of Jira projects kept current with `updated >=` delta syncs
+
+Usage:
+    python jiraiq_mirror.py sync ENG [--full]
+    python jiraiq_mirror.py status
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+from jiraiq_cache import DEFAULT_CACHE_DIR
+from jiraiq_classifier import get_classifier, BLOCKER
+from jiraiq_clients import env_float, get_executor
+from jiraiq_search import stream_issues
+from jiraiq_snapshot import snapshot_issue
+
+
+# Fields the JiraIQ tools read from an issue
+MIRROR_FIELDS = [
+    "summary", "issuetype", "status", "priority", "assignee", "labels",
+    "description", "comment", "created", "updated",
+]
+
+# Jira Cloud's default sprint field; override with JIRAIQ_SPRINT_FIELD
+DEFAULT_SPRINT_FIELD = "customfield_10020"
+
+# Minutes of overlap added to every delta query to absorb clock skew
+SYNC_OVERLAP_MINUTES = 5
+
+
+
+def sprint_field():
+    return os.getenv("JIRAIQ_SPRINT_FIELD", DEFAULT_SPRINT_FIELD)
+
+
+def parse_sprints(value):
+    """Normalize a sprint field value into a list of {id, name, state, start, end, complete} dicts
+
+    Jira Cloud returns sprint objects; older Jira Server versions return
+    strings like "com.atlassian.greenhopper...Sprint@1f[id=1,state=ACTIVE,name=Sprint 1,...]".
+    Dates are left as Jira's strings, or None for sprints that have not started.
+    """
+    sprints = []
+    for sprint in value or []:
+        if isinstance(sprint, dict):
+            sprints.append({
+                "id": sprint.get("id"),
+                "name": sprint.get("name"),
+                "state": (sprint.get("state") or "").lower(),
+                "start": sprint.get("startDate"),
+                "end": sprint.get("endDate"),
+                "complete": sprint.get("completeDate"),
+            })
+        elif isinstance(sprint, str):
+            attrs = dict(re.findall(r"(\w+)=([^,\]]*)", sprint.partition("[")[2]))
+            dates = {k: None if attrs.get(k) in (None, "", "<null>") else attrs[k]
+                     for k in ("startDate", "endDate", "completeDate")}
+            sprints.append({
+                "id": int(attrs["id"]) if attrs.get("id", "").isdigit() else None,
+                "name": attrs.get("name"),
+                "state": (attrs.get("state") or "").lower(),
+                "start": dates["startDate"],
+                "end": dates["endDate"],
+                "complete": dates["completeDate"],
+            })
+    return sprints
+
+
+class IssueMirror:
+    """SQLite store of issues for the projects that have been synced
+
+    Issues are keyed by Jira's numeric id, so an issue moved between
+    projects keeps its row and simply gets its new key. The first sync of
+    a project pulls every issue; later syncs only ask for issues whose
+    `updated` falls after the previous sync. Deleted issues and issues
+    moved out of the project never appear in a delta query, so a full key
+    reconciliation runs every JIRAIQ_MIRROR_RECONCILE_INTERVAL seconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS issues (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                project TEXT NOT NULL,
+                status TEXT,
+                updated TEXT,
+                raw TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS issues_project ON issues (project);
+            CREATE INDEX IF NOT EXISTS issues_key ON issues (key);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                project TEXT PRIMARY KEY,
+                last_sync REAL NOT NULL,
+                last_reconcile REAL NOT NULL,
+                syncs INTEGER NOT NULL DEFAULT 0,
+                issues_fetched INTEGER NOT NULL DEFAULT 0,
+                issues_removed INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Build the mirror configured by JIRAIQ_MIRROR_PATH, or None if disabled"""
+        path = os.getenv("JIRAIQ_MIRROR_PATH", str(DEFAULT_CACHE_DIR / "mirror.sqlite3"))
+        if path.lower() in ("", "off", "none"):
+            return None
+        return cls(path)
+
+    @property
+    def max_age(self):
+        return env_float("JIRAIQ_MIRROR_MAX_AGE", 300.0)
+
+    @property
+    def reconcile_interval(self):
+        return env_float("JIRAIQ_MIRROR_RECONCILE_INTERVAL", 21600.0)
+
+    # -- Sync ---------------------------------------------------------------
+
+    async def sync(self, project_key, full=False):
+        """Bring one project up to date; returns a summary of what changed
+
+        Each search page is its own Jira call, so a retried page does not
+        restart the crawl, and batches are written off the event loop as
+        pages arrive.
+        """
+        project_key = project_key.upper()
+        state = self._state(project_key)
+        started = time.time()
+        fields = MIRROR_FIELDS + [sprint_field()]
+
+        jql = f'project = {project_key}'
+        if state and not full:
+            # Relative dates avoid depending on the Jira user's timezone
+            minutes = math.ceil((started - state["last_sync"]) / 60) + SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+        jql += ' ORDER BY updated ASC'
+
+        loop = asyncio.get_running_loop()
+        fetched = 0
+        batch = []
+        async with aclosing(stream_issues(jql, fields, convert=lambda raw: raw)) as issues:
+            async for raw in issues:
+                batch.append(raw)
+                if len(batch) >= 500:
+                    fetched += await loop.run_in_executor(get_executor(), self._upsert, batch)
+                    batch = []
+        fetched += await loop.run_in_executor(get_executor(), self._upsert, batch)
+
+        removed = 0
+        last_reconcile = state["last_reconcile"] if state else started
+        if state and (full or started - state["last_reconcile"] > self.reconcile_interval):
+            removed = await self._reconcile(project_key)
+            last_reconcile = started
+
+        with self._lock:
+            self._db.execute("""
+                INSERT INTO sync_state (project, last_sync, last_reconcile, syncs, issues_fetched, issues_removed)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (project) DO UPDATE SET
+                    last_sync = excluded.last_sync,
+                    last_reconcile = excluded.last_reconcile,
+                    syncs = syncs + 1,
+                    issues_fetched = issues_fetched + excluded.issues_fetched,
+                    issues_removed = issues_removed + excluded.issues_removed
+            """, (project_key, started, last_reconcile, fetched, removed))
+            self._db.commit()
+
+        return {
+            "project": project_key,
+            "mode": "delta" if state and not full else "full",
+            "fetched": fetched,
+            "removed": removed,
+            "seconds": round(time.time() - started, 2),
+        }
+
+    def _upsert(self, raws):
+        rows = []
+        for raw in raws:
+            status = (raw["fields"].get("status") or {}).get("name")
+            rows.append((
+                raw["id"], raw["key"], raw["key"].split("-")[0], status,
+                raw["fields"].get("updated"), json.dumps(raw),
+            ))
+
+        with self._lock:
+            self._db.executemany("""
+                INSERT INTO issues (id, key, project, status, updated, raw)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    key = excluded.key,
+                    project = excluded.project,
+                    status = excluded.status,
+                    updated = excluded.updated,
+                    raw = excluded.raw
+            """, rows)
+            self._db.commit()
+        return len(rows)
+
+    async def _reconcile(self, project_key):
+        """Drop mirrored issues that were deleted or moved out of the project"""
+        live_ids = set()
+        async with aclosing(stream_issues(f'project = {project_key}', ["key"], convert=lambda raw: raw["id"])) as ids:
+            async for issue_id in ids:
+                live_ids.add(issue_id)
+
+        with self._lock:
+            stored = [row[0] for row in self._db.execute(
+                "SELECT id FROM issues WHERE project = ?", (project_key,)
+            )]
+            gone = [(issue_id,) for issue_id in stored if issue_id not in live_ids]
+            self._db.executemany("DELETE FROM issues WHERE id = ?", gone)
+            self._db.commit()
+        return len(gone)
+
+    def update_issue(self, raw):
+        """Store one issue as pushed by a webhook or fetched on its own, keeping only the mirrored fields"""
+        fields = raw.get("fields") or {}
+        kept = MIRROR_FIELDS + [sprint_field()]
+        self._upsert([{"id": raw["id"], "key": raw["key"], "fields": {f: fields.get(f) for f in kept}}])
+
+    def remove_issue(self, issue_key):
+        """Forget a single issue (e.g. after it was deleted in Jira)"""
+        with self._lock:
+            self._db.execute("DELETE FROM issues WHERE key = ?", (issue_key.upper(),))
+            self._db.commit()
+
+    # -- Freshness ----------------------------------------------------------
+
+    def _state(self, project_key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_sync, last_reconcile, syncs, issues_fetched, issues_removed "
+                "FROM sync_state WHERE project = ?",
+                (project_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("last_sync", "last_reconcile", "syncs", "issues_fetched", "issues_removed"), row))
+
+    def has_project(self, project_key):
+        return self._state(project_key.upper()) is not None
+
+    def is_fresh(self, project_key):
+        state = self._state(project_key.upper())
+        return state is not None and time.time() - state["last_sync"] <= self.max_age
+
+    def status(self):
+        """Per-project sync state and issue counts"""
+        with self._lock:
+            counts = dict(self._db.execute(
+                "SELECT project, COUNT(*) FROM issues GROUP BY project"
+            ).fetchall())
+            states = self._db.execute(
+                "SELECT project, last_sync, last_reconcile, syncs, issues_fetched, issues_removed "
+                "FROM sync_state ORDER BY project"
+            ).fetchall()
+
+        now = time.time()
+        projects = []
+        for project, last_sync, last_reconcile, syncs, fetched, removed in states:
+            age = now - last_sync
+            projects.append({
+                "project": project,
+                "issues": counts.get(project, 0),
+                "last_sync_age_seconds": round(age),
+                "last_reconcile_age_seconds": round(now - last_reconcile),
+                "fresh": age <= self.max_age,
+                "syncs": syncs,
+                "issues_fetched": fetched,
+                "issues_removed": removed,
+            })
+        return {"path": str(self.path), "max_age_seconds": self.max_age, "projects": projects}
+
+    # -- Queries ------------------------------------------------------------
+
+    def _load(self, project_key):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT raw FROM issues WHERE project = ? AND LOWER(status) != 'done' "
+                "ORDER BY updated DESC",
+                (project_key.upper(),),
+            ).fetchall()
+        # Parse lazily so callers that stop early never decode the rest
+        for row in rows:
+            yield json.loads(row[0])
+
+    def blocked_issues(self, project_key, limit):
+        """Local equivalent of find_blocked's JQL search (limit None for every match)"""
+        classifier = get_classifier()
+        found = 0
+        for raw in self._load(project_key):
+            issue = snapshot_issue(raw)
+            if (
+                'blocked' in [l.lower() for l in issue.labels]
+                or issue.status.lower() == 'blocked'
+                or BLOCKER in classifier.labels(raw["fields"].get("description"))
+                or classifier.has(BLOCKER, issue.comments)
+            ):
+                yield issue
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+    def sprint_issues(self, project_key, sprint_name=None):
+        """Local equivalent of analyze_sprint's JQL search"""
+        field = sprint_field()
+        for raw in self._load(project_key):
+            sprints = parse_sprints(raw["fields"].get(field))
+            if sprint_name:
+                if any(s["name"] == sprint_name for s in sprints):
+                    yield snapshot_issue(raw)
+            elif any(s["state"] == "active" for s in sprints):
+                yield snapshot_issue(raw)
+
+
+_issue_mirror = None
+_issue_mirror_loaded = False
+_issue_mirror_lock = threading.Lock()
+
+
+def get_issue_mirror():
+    """Return the process-wide issue mirror, or None when it is disabled"""
+    global _issue_mirror, _issue_mirror_loaded
+    with _issue_mirror_lock:
+        if not _issue_mirror_loaded:
+            _issue_mirror = IssueMirror.from_env()
+            _issue_mirror_loaded = True
+        return _issue_mirror
+
+
+def main(argv):
+    """Command line entry point for syncing and inspecting the mirror"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    mirror = get_issue_mirror()
+    if mirror is None:
+        print("Mirror is disabled (JIRAIQ_MIRROR_PATH=off)")
+        return 1
+
+    if len(argv) >= 2 and argv[0] == "sync":
+        full = "--full" in argv
+        for project_key in [a for a in argv[1:] if not a.startswith("--")]:
+            result = asyncio.run(mirror.sync(project_key, full=full))
+            print(json.dumps(result))
+        return 0
+
+    if argv and argv[0] == "status":
+        print(json.dumps(mirror.status(), indent=2))
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
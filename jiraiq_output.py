@@ -0,0 +1,284 @@
+"""
+JiraIQ structured output
+Compact JSON and tab-separated renderings of tool results, paged with opaque cursors
+"""
+
+import base64
+import binascii
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from jiraiq_cache import DEFAULT_CACHE_DIR
+from jiraiq_clients import env_int, env_float
+
+
+MARKDOWN, JSON, TABLE = "markdown", "json", "table"
+OUTPUT_FORMATS = (MARKDOWN, JSON, TABLE)
+
+# Schema properties shared by every tool that supports structured output
+STRUCTURED_OUTPUT_PROPERTIES = {
+    "format": {
+        "type": "string",
+        "enum": list(OUTPUT_FORMATS),
+        "description": "markdown (default) for a readable report; json or table for compact rows with stable column names, paged with next_cursor"
+    },
+    "page_size": {
+        "type": "integer",
+        "description": "json/table only: rows per response (default: 50)"
+    },
+    "cursor": {
+        "type": "string",
+        "description": "json/table only: next_cursor from a previous response, to fetch the following page of the same result"
+    },
+}
+
+
+class OutputError(ValueError):
+    """An output option the caller got wrong; reported back as the tool's answer"""
+
+
+class CursorError(OutputError):
+    """A cursor that is malformed, belongs to another tool, or whose result has expired"""
+
+
+def output_format(arguments):
+    """The requested output format, defaulting to JIRAIQ_OUTPUT_FORMAT"""
+    fmt = (arguments.get("format") or os.getenv("JIRAIQ_OUTPUT_FORMAT") or MARKDOWN).lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise OutputError(f"Unknown format {fmt!r}: expected one of {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+
+def page_size(arguments):
+    value = arguments.get("page_size") or env_int("JIRAIQ_PAGE_SIZE", 50)
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        raise OutputError(f"page_size must be a whole number, not {value!r}") from None
+
+
+def table_cell(value):
+    """One value as tab-separated text; tabs and line breaks become spaces"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list, tuple)):
+        value = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+    return str(value).replace("\t", " ").replace("\r", " ").replace("\n", " ")
+
+
+class ResultTable:
+    """A tool result as fixed columns plus rows, and summary fields in `meta`
+
+    Rows are plain lists in column order, so field names appear once per
+    response rather than once per issue. Rendering is a single pass: JSON
+    goes through one `json.dumps` call, and the table form joins its lines
+    once.
+    """
+
+    def __init__(self, tool, columns, **meta):
+        self.tool = tool
+        self.columns = list(columns)
+        self.meta = meta
+        self.rows = []
+
+    def append(self, *values):
+        self.rows.append(list(values))
+
+    def to_json(self):
+        return json.dumps(
+            [self.tool, self.columns, self.meta, self.rows],
+            separators=(",", ":"), ensure_ascii=False, default=str,
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        tool, columns, meta, rows = json.loads(text)
+        table = cls(tool, columns, **meta)
+        table.rows = rows
+        return table
+
+    def render(self, fmt, start=0, size=None, cursor=None):
+        rows = self.rows[start:start + size] if size else self.rows[start:]
+        if fmt == JSON:
+            return json.dumps({
+                "tool": self.tool,
+                **self.meta,
+                "total_rows": len(self.rows),
+                "offset": start,
+                "columns": self.columns,
+                "rows": rows,
+                "next_cursor": cursor,
+            }, separators=(",", ":"), ensure_ascii=False, default=str)
+
+        header = [f"tool={self.tool}"] + [f"{k}={table_cell(v)}" for k, v in self.meta.items()]
+        header += [f"total_rows={len(self.rows)}", f"offset={start}", f"next_cursor={cursor or ''}"]
+        lines = ["# " + " ".join(header), "\t".join(self.columns)]
+        lines += ["\t".join(map(table_cell, row)) for row in rows]
+        return "\n".join(lines)
+
+
+class ResultPages:
+    """Recent structured results, kept so later pages are served without redoing the work
+
+    The first call of a tool computes the whole result; the cursor it
+    returns names the stored result and the next offset. Results are held
+    in memory and, when `path` is set, in the SQLite file of the analysis
+    cache, so a cursor works on whichever HTTP worker the next request
+    reaches. Results live for JIRAIQ_CURSOR_TTL seconds and at most
+    JIRAIQ_CURSOR_RESULTS are kept, least recently used first out.
+    """
+
+    def __init__(self, path=None, ttl=900.0, max_results=64):
+        self.path = path
+        self.ttl = ttl
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"results": 0, "pages": 0, "disk_hits": 0, "expired": 0, "evictions": 0}
+
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS result_pages (
+                    id TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS result_pages_accessed ON result_pages (accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls):
+        """Share the analysis cache's SQLite file unless JIRAIQ_CACHE_PATH turns it off"""
+        path = os.getenv("JIRAIQ_CACHE_PATH", str(DEFAULT_CACHE_DIR / "analysis.sqlite3"))
+        if path.lower() in ("", "off", "none", "memory"):
+            path = None
+        return cls(
+            path=path,
+            ttl=env_float("JIRAIQ_CURSOR_TTL", 900.0),
+            max_results=env_int("JIRAIQ_CURSOR_RESULTS", 64),
+        )
+
+    def first_page(self, table, fmt, size):
+        """Render the first page, storing the result only when there is more to page through"""
+        self.stats["pages"] += 1
+        if len(table.rows) <= size:
+            return table.render(fmt, 0, size)
+
+        result_id = secrets.token_urlsafe(9)
+        now = time.time()
+        with self._lock:
+            self._remember(result_id, now, table)
+            self.stats["results"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT INTO result_pages (id, result, created, accessed) VALUES (?, ?, ?, ?)",
+                    (result_id, table.to_json(), now, now),
+                )
+                self._db.execute("DELETE FROM result_pages WHERE created < ?", (now - self.ttl,))
+                self._db.execute(
+                    "DELETE FROM result_pages WHERE id IN ("
+                    "SELECT id FROM result_pages ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_results,),
+                )
+                self._db.commit()
+        return table.render(fmt, 0, size, encode_cursor(result_id, table.tool, size, fmt, size))
+
+    def page(self, tool, cursor):
+        """Render the page a cursor points at"""
+        result_id, cursor_tool, offset, fmt, size = decode_cursor(cursor)
+        if cursor_tool != tool:
+            raise CursorError(f"This cursor belongs to {cursor_tool}, not {tool}")
+
+        table = self._lookup(result_id)
+        if table is None:
+            raise CursorError("This cursor has expired; call the tool again without a cursor")
+
+        following = offset + size
+        self.stats["pages"] += 1
+        cursor = encode_cursor(result_id, tool, following, fmt, size) if following < len(table.rows) else None
+        return table.render(fmt, offset, size, cursor)
+
+    def summary(self):
+        return {**self.stats, "held": len(self._results), "path": str(self.path) if self.path else None}
+
+    def _lookup(self, result_id):
+        """The stored result, from memory or else from SQLite (another worker's result)"""
+        now = time.time()
+        with self._lock:
+            entry = self._results.get(result_id)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._results.move_to_end(result_id)
+                    return entry[1]
+                del self._results[result_id]
+                self.stats["expired"] += 1
+
+            if self._db is None:
+                return None
+            row = self._db.execute(
+                "SELECT result, created FROM result_pages WHERE id = ?", (result_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM result_pages WHERE id = ?", (result_id,))
+                self._db.commit()
+                self.stats["expired"] += 1
+                return None
+            self._db.execute("UPDATE result_pages SET accessed = ? WHERE id = ?", (now, result_id))
+            self._db.commit()
+            table = ResultTable.from_json(row[0])
+            self._remember(result_id, row[1], table)
+            self.stats["disk_hits"] += 1
+            return table
+
+    def _remember(self, result_id, created, table):
+        self._results[result_id] = (created, table)
+        self._results.move_to_end(result_id)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+            self.stats["evictions"] += 1
+
+
+def encode_cursor(result_id, tool, offset, fmt, size):
+    payload = json.dumps([result_id, tool, offset, fmt, size], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(result id, tool, offset, format, page size) from a cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        result_id, tool, offset, fmt, size = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        raise CursorError("Invalid cursor") from None
+    if not isinstance(result_id, str) or not isinstance(offset, int) or not isinstance(size, int):
+        raise CursorError("Invalid cursor")
+    if offset < 0 or size < 1 or fmt not in OUTPUT_FORMATS:
+        raise CursorError("Invalid cursor")
+    return result_id, tool, offset, fmt, size
+
+
+_result_pages = None
+_result_pages_lock = threading.Lock()
+
+
+def get_result_pages():
+    """Return the process-wide store of paged results, creating it on first use"""
+    global _result_pages
+    with _result_pages_lock:
+        if _result_pages is None:
+            _result_pages = ResultPages.from_env()
+        return _result_pages
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+JiraIQ prefetch
+Keeps the open sprints of configured projects warm: issues, triage scores,
+dependency links and, within a budget, Claude analyses
+
+Usage:
+    python jiraiq_prefetch.py ENG OPS [--analyses 20]
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+from jiraiq_cache import DEFAULT_CACHE_DIR, get_analysis_cache, make_cache_key
+from jiraiq_clients import jira_clients, anthropic_clients, env_float, env_int
+from jiraiq_flow import get_flow_store
+from jiraiq_graph import get_dependency_graph, is_resolved
+from jiraiq_metrics import count
+from jiraiq_ratelimit import estimate_tokens, priority, PREFETCH
+from jiraiq_search import TRIAGE_FIELDS
+from jiraiq_snapshot import snapshot_issue
+from jiraiq_triage import TriageScorer, reference_now, cheap_model, FULL, CHEAP, SKIP
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def prefetch_projects():
+    """Projects listed in JIRAIQ_PREFETCH_PROJECTS; prefetch is off when it is unset"""
+    value = os.getenv("JIRAIQ_PREFETCH_PROJECTS", "")
+    return list(dict.fromkeys(p.strip().upper() for p in value.split(",") if p.strip()))
+
+
+class PrefetchLease:
+    """An exclusive lock on a file, so one process per host runs the prefetcher
+
+    HTTP workers each import the server and would otherwise all prefetch
+    the same sprints. The lock goes with the process that holds it, so
+    another worker takes over if that one exits. Where file locks are not
+    available, only a single-worker server prefetches.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Take the lease if no other process holds it; True when this process holds it"""
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            return os.getenv("JIRAIQ_HTTP_STATELESS", "0") != "1"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class WarmSprint:
+    """The open, unfinished sprint issues of one project as of the last prefetch"""
+
+    __slots__ = ("issues", "triage", "fetched")
+
+    def __init__(self, issues, triage, fetched):
+        self.issues = issues      # key -> snapshot, in search order
+        self.triage = triage      # key -> (score, reasons, path)
+        self.fetched = fetched
+
+
+class Prefetcher:
+    """Background scheduler that warms the active sprints of a few projects
+
+    Every `interval` seconds each project's open sprint issues are fetched
+    with the fields every tool reads (from the mirror when it holds the
+    project), scored by the local triage, and its dependency graph, flow
+    metrics and similarity index are brought up to date. Then, highest score first, the
+    issues that triage would send to Claude are analyzed into the analysis
+    cache, up to `analyses` calls and `token_budget` estimated tokens per
+    cycle. Only the process holding the `lease` runs cycles; the others
+    try again every `interval`.
+
+    All of this runs at PREFETCH priority, below bulk scans, and no new
+    analysis starts while the Jira or Anthropic governor has callers
+    waiting, so interactive calls never queue behind warm-up work. While a
+    project's prefetch is younger than `max_age`, analyze_sprint and
+    analyze_jira_issue read its issues from here instead of searching Jira.
+    Webhook refreshes update or drop the held issues; without webhooks a
+    single issue is only served while its prefetch is younger than
+    `issue_max_age`, since someone asking about one issue has usually just
+    changed it.
+    """
+
+    def __init__(self, projects, interval=600.0, max_age=900.0, issue_max_age=60.0, analyses=20, token_budget=100000, concurrency=2, lease=None):
+        self.projects = list(projects)
+        self.interval = interval
+        self.max_age = max(max_age, interval)
+        self.issue_max_age = min(issue_max_age, self.max_age)
+        self.analyses = analyses
+        self.token_budget = token_budget
+        self.concurrency = max(concurrency, 1)
+        self.lease = lease
+        self._sprints = {}
+        self._task = None
+        self._analyses = set()
+        self._lock = threading.Lock()
+        self.stats = {
+            "cycles": 0,
+            "projects_warmed": 0,
+            "issues_fetched": 0,
+            "analyses": 0,
+            "already_cached": 0,
+            "over_budget": 0,
+            "yielded": 0,
+            "lease_waits": 0,
+            "sprint_hits": 0,
+            "issue_hits": 0,
+            "updates": 0,
+            "errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            prefetch_projects(),
+            interval=env_float("JIRAIQ_PREFETCH_INTERVAL", 600.0),
+            max_age=env_float("JIRAIQ_PREFETCH_MAX_AGE", 900.0),
+            issue_max_age=env_float("JIRAIQ_PREFETCH_ISSUE_MAX_AGE", 60.0),
+            analyses=env_int("JIRAIQ_PREFETCH_ANALYSES", 20),
+            token_budget=env_int("JIRAIQ_PREFETCH_TOKEN_BUDGET", 100000),
+            concurrency=env_int("JIRAIQ_PREFETCH_CONCURRENCY", 2),
+            lease=PrefetchLease(os.getenv("JIRAIQ_PREFETCH_LOCK") or DEFAULT_CACHE_DIR / "prefetch.lock"),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.projects) and os.getenv("JIRAIQ_PREFETCH", "1") != "0"
+
+    # -- Scheduling ---------------------------------------------------------
+
+    def start(self):
+        """Start the background loop on the running event loop (once, and only when enabled)"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return self._task
+
+    async def stop(self):
+        """Cancel the loop and any analyses it started, wait for them, then give up the lease"""
+        tasks = list(self._analyses)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.lease is not None:
+            self.lease.release()
+
+    async def _run(self):
+        while True:
+            if self.lease is not None and not self.lease.acquire():
+                self.stats["lease_waits"] += 1
+                await asyncio.sleep(self.interval)
+                continue
+            try:
+                await self.cycle()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"jiraiq: prefetch cycle failed: {e}", file=sys.stderr)
+            await asyncio.sleep(self.interval)
+
+    async def cycle(self):
+        """Warm every project once, then spend the analysis budget across all of them"""
+        candidates = []
+        with priority(PREFETCH):
+            for project_key in self.projects:
+                try:
+                    candidates += await self.warm_project(project_key)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    count("errors")
+                    print(f"jiraiq: prefetch of {project_key} failed: {e}", file=sys.stderr)
+            await self._analyze(candidates)
+        self.stats["cycles"] += 1
+
+    async def warm_project(self, project_key):
+        """Fetch, triage and link one project's open sprint; returns its analysis candidates"""
+        from jiraiq_server import search_project
+        from jiraiq_similar import existing_similarity_index
+
+        jql = f'project = {project_key} AND sprint in openSprints() AND status != Done'
+        # Links, flow metrics and the similarity index catch up alongside the sprint search
+        background = [asyncio.ensure_future(get_dependency_graph().ensure([project_key]))]
+        flow = get_flow_store()
+        if flow is not None and flow.has_project(project_key):
+            background.append(asyncio.ensure_future(flow.ensure(project_key)))
+        index = existing_similarity_index()
+        if index is not None and index.has_project(project_key):
+            background.append(asyncio.ensure_future(index.ensure([project_key])))
+
+        scorer = TriageScorer.from_env()
+        now = reference_now()
+        issues, triage = {}, {}
+        try:
+            async with aclosing(search_project(
+                project_key, jql, TRIAGE_FIELDS, None,
+                lambda mirror: mirror.sprint_issues(project_key)
+            )) as found:
+                async for issue in found:
+                    issues[issue.key] = issue
+                    score, reasons = scorer.score(issue, now)
+                    triage[issue.key] = (score, reasons, scorer.route(score))
+        finally:
+            await asyncio.gather(*background, return_exceptions=True)
+
+        with self._lock:
+            self._sprints[project_key] = WarmSprint(issues, triage, time.time())
+        self.stats["projects_warmed"] += 1
+        self.stats["issues_fetched"] += len(issues)
+        return [(score, key, path) for key, (score, _, path) in triage.items() if path != SKIP]
+
+    async def _analyze(self, candidates):
+        from jiraiq_server import analysis_inputs, build_analysis_prompt, get_analysis, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE
+
+        models = {FULL: ANALYSIS_MODEL, CHEAP: cheap_model()}
+        cache = get_analysis_cache()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started, tokens = 0, 0
+        tasks = []
+
+        async def analyze(key, inputs, model):
+            try:
+                await get_analysis(key, inputs, model=model)
+                self.stats["analyses"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+            finally:
+                semaphore.release()
+
+        for score, key, path in sorted(candidates, key=lambda c: (-c[0], c[1])):
+            warm = self._sprints.get(key.split("-")[0])
+            issue = warm.issues.get(key) if warm is not None else None
+            if issue is None:
+                continue
+            inputs, _ = analysis_inputs(issue, issue.comments)
+            model = models[path]
+            if cache.get(make_cache_key(inputs, model, ANALYSIS_TEMPERATURE)) is not None:
+                self.stats["already_cached"] += 1
+                continue
+
+            cost = estimate_tokens(build_analysis_prompt(inputs))
+            if started >= self.analyses or (self.token_budget and tokens + cost > self.token_budget):
+                self.stats["over_budget"] += 1
+                continue
+
+            await semaphore.acquire()
+            try:
+                await self._wait_until_idle()
+            except BaseException:
+                semaphore.release()
+                raise
+            started += 1
+            tokens += cost
+            task = asyncio.ensure_future(analyze(key, inputs, model))
+            self._analyses.add(task)
+            task.add_done_callback(self._analyses.discard)
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+
+    async def _wait_until_idle(self):
+        """Hold back while interactive or bulk callers are waiting on Jira or Anthropic"""
+        while jira_clients.governor.busy() or anthropic_clients.governor.busy():
+            self.stats["yielded"] += 1
+            await asyncio.sleep(1.0)
+
+    # -- Warm state ---------------------------------------------------------
+
+    def _fresh(self, project_key, max_age=None):
+        warm = self._sprints.get(project_key)
+        if warm is None or time.time() - warm.fetched > (self.max_age if max_age is None else max_age):
+            return None
+        return warm
+
+    def sprint_issues(self, project_key):
+        """Snapshots of a project's open sprint issues if a fresh prefetch holds them, else None"""
+        warm = self._fresh(project_key.upper())
+        if warm is None:
+            return None
+        self.stats["sprint_hits"] += 1
+        return list(warm.issues.values())
+
+    def issue(self, issue_key):
+        """A fresh prefetched snapshot of one issue, or None"""
+        from jiraiq_webhooks import webhooks_enabled
+
+        max_age = None if webhooks_enabled() else self.issue_max_age
+        warm = self._fresh(issue_key.split("-")[0], max_age)
+        issue = warm.issues.get(issue_key) if warm is not None else None
+        if issue is not None:
+            self.stats["issue_hits"] += 1
+        return issue
+
+    def has_issue(self, issue_key):
+        warm = self._sprints.get(issue_key.split("-")[0])
+        return warm is not None and issue_key in warm.issues
+
+    def update_issue(self, raw):
+        """Replace a held issue with newer JSON (from a webhook); finished issues leave the sprint"""
+        key = raw["key"]
+        warm = self._sprints.get(key.split("-")[0])
+        if warm is None or key not in warm.issues:
+            return False
+        with self._lock:
+            if is_resolved((raw.get("fields") or {}).get("status")):
+                warm.issues.pop(key, None)
+                warm.triage.pop(key, None)
+            else:
+                warm.issues[key] = snapshot_issue(raw)
+        self.stats["updates"] += 1
+        return True
+
+    def remove_issue(self, issue_key):
+        warm = self._sprints.get(issue_key.split("-")[0])
+        if warm is not None and warm.issues.pop(issue_key, None) is not None:
+            warm.triage.pop(issue_key, None)
+            self.stats["updates"] += 1
+
+    def summary(self):
+        now = time.time()
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "lease_held": self.lease is not None and self.lease.held,
+            "projects": {
+                p: {"issues": len(w.issues), "age_seconds": round(now - w.fetched)}
+                for p, w in self._sprints.items()
+            },
+        }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Return the process-wide prefetcher, creating it on first use"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher.from_env()
+        return _prefetcher
+
+
+def main(argv):
+    """Run one prefetch cycle for the given projects and print what was warmed"""
+    import argparse
+    import json
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("projects", nargs="*", help="Project keys (default: JIRAIQ_PREFETCH_PROJECTS)")
+    parser.add_argument("--analyses", type=int, help="Claude analyses allowed this cycle")
+    args = parser.parse_args(argv)
+
+    prefetcher = Prefetcher.from_env()
+    if args.projects:
+        prefetcher.projects = [p.upper() for p in args.projects]
+    if args.analyses is not None:
+        prefetcher.analyses = args.analyses
+    if not prefetcher.projects:
+        print("No projects to prefetch (set JIRAIQ_PREFETCH_PROJECTS or pass project keys)")
+        return 1
+
+    asyncio.run(prefetcher.cycle())
+    print(json.dumps(prefetcher.summary(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,65 @@
+"""
+JiraIQ progress reporting
+Sends MCP progress notifications for the tool call being handled
+"""
+
+import time
+
+from jiraiq_clients import env_float
+
+
+class ProgressReporter:
+    """Progress notifications for one tool call
+
+    Does nothing unless the client attached a progress token to the
+    request. Updates are throttled to one every JIRAIQ_PROGRESS_INTERVAL
+    seconds; text passed to `report()` in between is buffered and sent
+    with the next notification, so no streamed text is dropped.
+    """
+
+    def __init__(self, session=None, token=None, request_id=None):
+        self.session = session
+        self.token = token
+        self.request_id = request_id
+        self.min_interval = env_float("JIRAIQ_PROGRESS_INTERVAL", 0.25)
+        self._last_sent = 0.0
+        self._pending = []
+        self.sent = 0
+
+    @property
+    def enabled(self):
+        return self.session is not None and self.token is not None
+
+    async def report(self, progress, total=None, message=None, force=False):
+        """Queue an update and send it unless the last one was too recent"""
+        if not self.enabled:
+            return
+        if message:
+            self._pending.append(message)
+
+        now = time.monotonic()
+        if not force and now - self._last_sent < self.min_interval:
+            return
+
+        text = "".join(self._pending) or None
+        self._pending = []
+        self._last_sent = now
+        self.sent += 1
+        await self.session.send_progress_notification(
+            self.token,
+            progress,
+            total=total,
+            message=text,
+            related_request_id=self.request_id,
+        )
+
+
+def current_progress_reporter(server):
+    """Build a reporter for the request the MCP server is currently handling"""
+    try:
+        ctx = server.request_context
+    except LookupError:
+        return ProgressReporter()
+
+    token = ctx.meta.progressToken if ctx.meta else None
+    return ProgressReporter(ctx.session, token, str(ctx.request_id))
@@ -0,0 +1,194 @@
+"""
+JiraIQ prompt building
+Fits an issue's comment thread into a token budget before it reaches Claude
+"""
+
+import re
+
+from jiraiq_classifier import get_classifier
+from jiraiq_clients import env_int
+from jiraiq_ratelimit import estimate_tokens
+
+
+# Jira wiki {quote} blocks and e-mail style "> " reply lines
+QUOTE_BLOCK = re.compile(r"\{quote\}.*?\{quote\}", re.S | re.I)
+QUOTE_LINE = re.compile(r"^\s*>.*$", re.M)
+
+# {code}, {noformat} and markdown fenced blocks
+CODE_BLOCK = re.compile(r"(\{(code|noformat)(?::[^}]*)?\}|```)(.*?)(\{\2\}|```)", re.S | re.I)
+
+# Lines that look like log output or stack trace frames
+LOG_LINE = re.compile(
+    r"^\s*(at\s+[\w$.<>]+\(|\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}|\[?(ERROR|WARN|WARNING|INFO|DEBUG|TRACE)\]?\b"
+    r"|Traceback|File \".*\", line \d+|Caused by:|\.\.\. \d+ more)"
+)
+
+MAX_BLOCK_LINES = 8
+MAX_COMMENT_CHARS = 2000
+DIGEST_SNIPPET_CHARS = 120
+
+compaction_stats = {"calls": 0, "compacted_calls": 0, "original_tokens": 0, "prompt_tokens": 0}
+
+
+def shorten_lines(lines, head=5, tail=2):
+    """Keep the first and last few lines of a bulky block"""
+    if len(lines) <= MAX_BLOCK_LINES:
+        return lines
+    return lines[:head] + [f"... [{len(lines) - head - tail} lines omitted] ..."] + lines[-tail:]
+
+
+def _shorten_code(match):
+    opening, _, content, closing = match.groups()
+    lines = content.strip("\n").splitlines()
+    return opening + "\n" + "\n".join(shorten_lines(lines)) + "\n" + closing
+
+
+def _shorten_logs(text):
+    lines = text.splitlines()
+    output, run = [], []
+    for line in lines + [""]:
+        if LOG_LINE.match(line):
+            run.append(line)
+            continue
+        output.extend(shorten_lines(run))
+        run = []
+        output.append(line)
+    return "\n".join(output[:-1])
+
+
+def clean_body(body):
+    """Strip quoted replies and trim code blocks, logs and very long comments"""
+    body = QUOTE_BLOCK.sub("[quoted text omitted]", body)
+    body = QUOTE_LINE.sub("[quoted text omitted]", body)
+    body = re.sub(r"(\[quoted text omitted\]\s*)+", "[quoted text omitted]\n", body)
+    body = CODE_BLOCK.sub(_shorten_code, body)
+    body = _shorten_logs(body)
+    body = re.sub(r"\n{3,}", "\n\n", body).strip()
+
+    if len(body) > MAX_COMMENT_CHARS:
+        body = body[:MAX_COMMENT_CHARS] + f" ... [{len(body) - MAX_COMMENT_CHARS} characters truncated]"
+    return body
+
+
+def _snippet(body):
+    text = " ".join(body.split())
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    if len(sentence) > DIGEST_SNIPPET_CHARS:
+        sentence = sentence[:DIGEST_SNIPPET_CHARS].rstrip() + "..."
+    return sentence
+
+
+def compact_comments(comments, budget=None, recent=None):
+    """Render comments as prompt text that fits within `budget` tokens
+
+    Threads that already fit are passed through untouched. Otherwise every
+    comment is cleaned (quoted replies dropped, code and log blocks
+    trimmed, repeats collapsed), the most recent comments and those
+    mentioning blockers, risks or technical terms are kept in full, and the
+    rest are folded into a one-line-per-comment digest. Returns the text
+    and a dict of estimated token savings.
+    """
+    budget = budget or env_int("JIRAIQ_PROMPT_COMMENT_TOKENS", 6000)
+    recent = recent if recent is not None else env_int("JIRAIQ_PROMPT_RECENT_COMMENTS", 5)
+
+    original = "\n\n".join(
+        f"{c.author} ({c.created}): {c.body}" for c in comments
+    ) if comments else "No comments yet."
+    original_tokens = estimate_tokens(original)
+
+    stats = {
+        "comments": len(comments),
+        "original_tokens": original_tokens,
+        "prompt_tokens": original_tokens,
+        "saved_tokens": 0,
+        "full": len(comments),
+        "digested": 0,
+        "omitted": 0,
+    }
+    compaction_stats["calls"] += 1
+    compaction_stats["original_tokens"] += original_tokens
+    if original_tokens <= budget:
+        compaction_stats["prompt_tokens"] += original_tokens
+        return original, stats
+
+    # Comments with blocker, risk or technical terms are kept in full even when old
+    comment_labels = get_classifier().classify(comments)
+    
+    # Clean every comment and collapse exact repeats
+    entries = []
+    seen = {}
+    for i, c in enumerate(comments):
+        author = c.author
+        body = clean_body(c.body or "")
+        normalized = " ".join(body.lower().split())
+        if normalized in seen:
+            body = f"[repeats the comment by {seen[normalized]}]"
+        else:
+            seen[normalized] = author
+        full = f"{author} ({c.created}): {body}"
+        entries.append({
+            "index": i,
+            "author": author,
+            "date": c.created[:10],
+            "body": body,
+            "full": full,
+            "tokens": estimate_tokens(full),
+            "relevant": bool(comment_labels[i]),
+        })
+
+    # Newest comments first, then relevant ones (newest first), then the rest
+    newest = entries[::-1]
+    ranked = newest[:recent]
+    ranked += [e for e in newest[recent:] if e["relevant"]]
+    ranked += [e for e in newest[recent:] if not e["relevant"]]
+
+    full_budget = budget * 3 // 4
+    used = 0
+    keep = set()
+    for entry in ranked:
+        if used + entry["tokens"] > full_budget:
+            continue
+        keep.add(entry["index"])
+        used += entry["tokens"]
+
+    # Fold everything else into a digest, newest lines first until the budget runs out
+    digest_budget = budget - used
+    digest = []
+    omitted = []
+    for entry in newest:
+        if entry["index"] in keep:
+            continue
+        line = f"- {entry['author']} ({entry['date']}): {_snippet(entry['body'])}"
+        line_tokens = estimate_tokens(line)
+        if line_tokens <= digest_budget:
+            digest.append((entry["index"], line))
+            digest_budget -= line_tokens
+        else:
+            omitted.append(entry)
+
+    parts = []
+    if omitted:
+        authors = sorted({e["author"] for e in omitted})
+        dates = sorted(e["date"] for e in omitted)
+        parts.append(
+            f"[{len(omitted)} older comment(s) from {dates[0]} to {dates[-1]} by "
+            f"{', '.join(authors[:5])}{' and others' if len(authors) > 5 else ''} omitted]"
+        )
+    if digest:
+        parts.append("Earlier comments (condensed):\n" + "\n".join(line for _, line in sorted(digest)))
+    if keep:
+        full_entries = [e["full"] for e in entries if e["index"] in keep]
+        parts.append("Recent and relevant comments:\n\n" + "\n\n".join(full_entries))
+
+    text = "\n\n".join(parts)
+    prompt_tokens = estimate_tokens(text)
+    stats.update({
+        "prompt_tokens": prompt_tokens,
+        "saved_tokens": max(original_tokens - prompt_tokens, 0),
+        "full": len(keep),
+        "digested": len(digest),
+        "omitted": len(omitted),
+    })
+    compaction_stats["compacted_calls"] += 1
+    compaction_stats["prompt_tokens"] += prompt_tokens
+    return text, stats
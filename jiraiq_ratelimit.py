@@ -0,0 +1,379 @@
+"""
+JiraIQ rate limiting
+Per-backend rate governors with priority admission, and the LLM token budget
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# Call priorities: lower values are admitted first
+INTERACTIVE = 0
+BULK = 1
+PREFETCH = 2
+
+# Priority of the tool call the current task (or executor thread) is working for
+call_priority = contextvars.ContextVar("jiraiq_call_priority", default=INTERACTIVE)
+
+# Responses that mean the backend is throttling or overloaded
+THROTTLE_STATUSES = {429, 503, 529}
+
+# Longest pause a single Retry-After or quota reset header can impose
+MAX_PAUSE = 300.0
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+class RateBudget:
+    """Sliding one-minute window of requests and tokens
+
+    `acquire()` waits until one more request reserving `tokens` tokens fits
+    in both the requests-per-minute and tokens-per-minute limits. The
+    returned reservation can be `settle()`d with the real token count once
+    the response reports its usage. A limit of 0 means unlimited.
+    """
+
+    def __init__(self, rpm=0, tpm=0, window=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._entries = deque()
+        self._tokens = 0
+        self._lock = None
+        self.stats = {"acquired": 0, "waits": 0, "seconds_waited": 0.0}
+
+    async def acquire(self, tokens):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Waiters queue on the lock so they are admitted in arrival order
+        async with self._lock:
+            waited = 0.0
+            while True:
+                delay = self._delay(tokens)
+                if delay <= 0:
+                    break
+                waited += delay
+                await asyncio.sleep(delay)
+
+            entry = [time.monotonic(), tokens]
+            self._entries.append(entry)
+            self._tokens += tokens
+            self.stats["acquired"] += 1
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["seconds_waited"] += waited
+            return entry
+
+    def settle(self, entry, tokens):
+        """Replace a reservation's estimate with the actual token usage"""
+        if entry in self._entries:
+            self._tokens += tokens - entry[1]
+        entry[1] = tokens
+
+    def _delay(self, tokens):
+        now = time.monotonic()
+        while self._entries and now - self._entries[0][0] >= self.window:
+            self._tokens -= self._entries.popleft()[1]
+
+        if not self._entries:
+            return 0.0
+
+        delays = [0.0]
+        if self.rpm and len(self._entries) >= self.rpm:
+            delays.append(self._entries[0][0] + self.window - now)
+        if self.tpm and self._tokens + tokens > self.tpm:
+            # Wait until enough of the oldest reservations have aged out
+            freed = 0
+            for started, reserved in self._entries:
+                freed += reserved
+                if self._tokens - freed + tokens <= self.tpm:
+                    delays.append(started + self.window - now)
+                    break
+            else:
+                delays.append(self._entries[-1][0] + self.window - now)
+        return max(delays)
+
+
+_llm_budget = None
+
+
+def get_llm_budget():
+    """Return the process-wide Anthropic budget (JIRAIQ_LLM_RPM / JIRAIQ_LLM_TPM)"""
+    global _llm_budget
+    if _llm_budget is None:
+        _llm_budget = RateBudget(
+            rpm=int(os.getenv("JIRAIQ_LLM_RPM") or 0),
+            tpm=int(os.getenv("JIRAIQ_LLM_TPM") or 0),
+        )
+    return _llm_budget
+
+
+# ---------------------------------------------------------------------------
+# Backend rate governor
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def priority(level):
+    """Run the block's backend calls at the given priority"""
+    token = call_priority.set(level)
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+
+def _seconds_until(value):
+    """Seconds until an RFC 3339 / ISO 8601 timestamp, or None if unparseable"""
+    try:
+        when = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return (when - datetime.now(timezone.utc)).total_seconds()
+
+
+def parse_retry_after(headers):
+    """Seconds a response asks us to wait (Retry-After in seconds or as a date), else 0"""
+    if headers is None:
+        return 0.0
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return 0.0
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def quota_reset_after(headers):
+    """Seconds until an exhausted rate-limit quota resets, or 0 if none is exhausted
+
+    Understands Anthropic's anthropic-ratelimit-<limit>-remaining/-reset
+    pairs and Jira Cloud's X-RateLimit-Remaining/X-RateLimit-Reset.
+    """
+    wait = 0.0
+    for name, value in headers.items():
+        name = name.lower()
+        if not name.endswith("-remaining") or value.strip() != "0":
+            continue
+        reset = headers.get(name[:-len("remaining")] + "reset")
+        seconds = _seconds_until(reset) if reset else None
+        if seconds:
+            wait = max(wait, seconds)
+    return wait
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted", "abandoned")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.abandoned = False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RateGovernor:
+    """Admission control for one backend: priority queue, token bucket and in-flight cap
+
+    `acquire()` waits until the call may start: no more than `concurrency`
+    calls in flight, a token available in the bucket (refilled at `rate`
+    requests per second; 0 means unlimited) and no pause in force. Waiters
+    are admitted lowest priority value first, then in arrival order, so
+    interactive calls overtake queued bulk scans. `release()` must follow
+    every successful acquire.
+
+    `observe()` adapts to each backend response: a throttling status halves
+    the rate (starting from the measured throughput when unlimited), a
+    Retry-After or exhausted quota header pauses admission until it
+    expires, and every other response recovers the rate by about RECOVERY
+    requests per second per second.
+    """
+
+    RECOVERY = 0.2
+    MIN_RATE = 0.2
+
+    def __init__(self, name, rate=0.0, concurrency=8):
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        self.concurrency = concurrency
+        self._ceiling = rate
+        self._tokens = max(rate, 1.0)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._order = itertools.count()
+        self._in_flight = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "seconds_queued": 0.0,
+            "throttled_responses": 0,
+            "rate_decreases": 0,
+            "pauses": 0,
+            "deadline_exceeded": 0,
+        }
+
+    async def acquire(self, priority=INTERACTIVE, deadline=None):
+        """Wait for permission to start one call, or raise TimeoutError at `deadline` (monotonic)"""
+        waiter = _Waiter(asyncio.get_running_loop())
+        with self._lock:
+            heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+
+        started = time.monotonic()
+        try:
+            while True:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["deadline_exceeded"] += 1
+                        raise TimeoutError(f"{self.name}: timed out waiting for a request slot")
+                    delay = remaining if delay is None else min(delay, remaining)
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if waiter.granted:
+                    self._in_flight -= 1
+                waiter.abandoned = True
+            self._dispatch()
+            raise
+
+        waited = time.monotonic() - started
+        self.stats["admitted"] += 1
+        if waited > 0.001:
+            self.stats["queued"] += 1
+            self.stats["seconds_queued"] += waited
+
+    def release(self):
+        """Free the in-flight slot taken by acquire()"""
+        with self._lock:
+            self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admit queued waiters while allowed; return seconds until the next token, if that is the limit"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate:
+                self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+
+            while self._waiters:
+                _, _, waiter = self._waiters[0]
+                if waiter.abandoned:
+                    heapq.heappop(self._waiters)
+                    continue
+                if self._in_flight >= self.concurrency:
+                    return None
+                if now < self._paused_until:
+                    return self._paused_until - now
+                if self.rate and self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+
+                heapq.heappop(self._waiters)
+                if self.rate:
+                    self._tokens -= 1
+                self._in_flight += 1
+                self._recent.append(now)
+                while now - self._recent[0] > 10.0:
+                    self._recent.popleft()
+                waiter.granted = True
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    pass  # the waiter's loop is gone; its acquire() will never return
+            return None
+
+    def observe(self, status, headers):
+        """Adapt the rate and pauses to one backend response (thread-safe)"""
+        wait = max(parse_retry_after(headers), quota_reset_after(headers))
+        near_limit = str(headers.get("x-ratelimit-nearlimit", "")).lower() == "true"
+
+        with self._lock:
+            now = time.monotonic()
+            if status in THROTTLE_STATUSES:
+                self.stats["throttled_responses"] += 1
+                self._decrease(now, 0.5)
+            elif near_limit:
+                self._decrease(now, 0.8)
+            elif self.rate and status < 400:
+                self.rate += self.RECOVERY / self.rate
+                if self.rate >= self._ceiling:
+                    # Back to the configured rate (or to unlimited when none is configured)
+                    self.rate = self.max_rate
+
+            if wait:
+                self.stats["pauses"] += 1
+                self._paused_until = max(self._paused_until, now + min(wait, MAX_PAUSE))
+
+    def _decrease(self, now, factor):
+        # Responses to calls already in flight report the same overload; react once per second
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+
+        while self._recent and now - self._recent[0] > 10.0:
+            self._recent.popleft()
+        current = self.rate or max(len(self._recent) / 10.0, self.MIN_RATE * 2)
+        if not self.max_rate:
+            self._ceiling = current * 2
+        self.rate = max(current * factor, self.MIN_RATE)
+        self._tokens = min(self._tokens, 1.0)
+        self.stats["rate_decreases"] += 1
+
+    def busy(self):
+        """True while calls are queued or every in-flight slot is taken"""
+        with self._lock:
+            waiting = any(not w.abandoned for _, _, w in self._waiters)
+            return waiting or self._in_flight >= self.concurrency
+
+    def summary(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "seconds_queued": round(self.stats["seconds_queued"], 3),
+                "rate_per_second": round(self.rate, 2) if self.rate else "unlimited",
+                "in_flight": self._in_flight,
+                "waiting": sum(1 for _, _, w in self._waiters if not w.abandoned),
+                "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 2),
+            }
@@ -0,0 +1,167 @@
+"""
+JiraIQ search
+Paged, field-projected Jira searches that stream issues instead of building lists
+"""
+
+import asyncio
+from collections import deque, namedtuple
+
+from jiraiq_clients import env_int, jira_clients
+from jiraiq_snapshot import snapshot_issue
+
+
+# Fields each tool reads, so searches never ask Jira for `*all`
+ANALYZE_FIELDS = ["summary", "issuetype", "status", "priority", "assignee", "comment"]
+BLOCKED_FIELDS = ["summary", "status", "priority", "assignee", "labels", "comment"]
+PORTFOLIO_FIELDS = ["summary", "status", "priority", "assignee", "created"]
+SPRINT_FIELDS = ["summary", "status", "labels", "comment"]
+TRIAGE_FIELDS = ANALYZE_FIELDS + ["labels", "created", "updated"]
+GRAPH_FIELDS = ["summary", "status", "issuelinks"]
+SIMILAR_FIELDS = ["summary", "description", "status", "comment"]
+
+# One page of search results (raw issue JSON, or snapshots once converted);
+# `next_token` is set on Jira Cloud, `total` on Server/DC
+Page = namedtuple("Page", ["issues", "next_token", "total"])
+
+
+def page_size_for(limit=None):
+    page_size = env_int("JIRAIQ_SEARCH_PAGE_SIZE", 100)
+    return min(page_size, limit) if limit else page_size
+
+
+def uses_token_paging(jira):
+    """Jira Cloud pages with nextPageToken; Server/DC still supports startAt"""
+    return getattr(jira, "_is_cloud", False) and hasattr(jira, "enhanced_search_issues")
+
+
+def fetch_page(jira, jql, fields, start_at=0, page_token=None, page_size=100, expand=None):
+    """Fetch a single page of raw issue JSON with only the requested fields"""
+    if uses_token_paging(jira):
+        result = jira.enhanced_search_issues(
+            jql, nextPageToken=page_token, maxResults=page_size,
+            fields=list(fields), expand=expand, json_result=True,
+        )
+        next_token = None if result.get("isLast", True) else result.get("nextPageToken")
+        total = None
+    else:
+        result = jira.search_issues(
+            jql, startAt=start_at, maxResults=page_size,
+            fields=list(fields), expand=expand, json_result=True,
+        )
+        next_token = None
+        total = result.get("total", 0)
+
+    return Page(result.get("issues", []), next_token, total)
+
+
+def fetch_snapshots(jira, jql, fields, start_at=0, page_token=None, page_size=100, expand=None, convert=snapshot_issue):
+    """Fetch a page and convert it to issue snapshots (or `convert`'s form) before the JSON is released"""
+    page = fetch_page(jira, jql, fields, start_at, page_token, page_size, expand)
+    return page._replace(issues=[convert(raw) for raw in page.issues])
+
+
+def iter_issues(jira, jql, fields, limit=None, expand=None):
+    """Yield the raw JSON of every issue matching jql, one page at a time (blocking)"""
+    page_size = page_size_for(limit)
+    start_at, page_token, count = 0, None, 0
+
+    while True:
+        page = fetch_page(jira, jql, fields, start_at, page_token, page_size, expand)
+        for issue in page.issues:
+            yield issue
+            count += 1
+            if limit and count >= limit:
+                return
+
+        start_at += len(page.issues)
+        page_token = page.next_token
+        if not page.issues:
+            return
+        if page.total is None and page_token is None:
+            return
+        if page.total is not None and start_at >= page.total:
+            return
+
+
+async def stream_issues(jql, fields, limit=None, expand=None, convert=snapshot_issue):
+    """Yield snapshots of the issues matching jql without blocking the event loop
+
+    On Jira Server/DC the first page reports the total, so the remaining
+    pages are fetched concurrently (up to JIRAIQ_SEARCH_PARALLEL_PAGES at a
+    time) and yielded in order, stepping by the rows Jira actually returned
+    per page; a page that comes back short has its gap fetched before the
+    next one is yielded. Jira Cloud's token paging is inherently
+    sequential. Either way no page beyond `limit` is requested, and pages
+    still in flight are cancelled when the consumer stops early. Pass
+    `convert` to yield some other compact form of each issue's JSON.
+    """
+    page_size = page_size_for(limit)
+    first = await jira_clients.run(
+        lambda jira: fetch_snapshots(jira, jql, fields, 0, None, page_size, expand, convert)
+    )
+
+    count = 0
+    for issue in first.issues:
+        yield issue
+        count += 1
+        if limit and count >= limit:
+            return
+
+    if first.total is None:
+        page_token = first.next_token
+        while page_token and first.issues:
+            page = await jira_clients.run(
+                lambda jira: fetch_snapshots(jira, jql, fields, 0, page_token, page_size, expand, convert)
+            )
+            for issue in page.issues:
+                yield issue
+                count += 1
+                if limit and count >= limit:
+                    return
+            if not page.issues:
+                return
+            page_token = page.next_token
+        return
+
+    # Jira may return fewer rows than asked (a server-side maxResults cap, or a large
+    # expand), so later pages step by what the first page actually held
+    end = min(first.total, limit) if limit else first.total
+    step = len(first.issues)
+    if not step:
+        return
+    starts = iter(range(step, end, step))
+    parallel = env_int("JIRAIQ_SEARCH_PARALLEL_PAGES", 4)
+
+    def fetch(start_at):
+        return start_at, asyncio.ensure_future(jira_clients.run(
+            lambda jira: fetch_snapshots(jira, jql, fields, start_at, None, page_size, expand, convert)
+        ))
+
+    pending = deque(fetch(start_at) for _, start_at in zip(range(parallel), starts))
+    try:
+        while pending:
+            start_at, task = pending.popleft()
+            page = await task
+            following = next(starts, None)
+            if following is not None:
+                pending.append(fetch(following))
+
+            # A page that came back short leaves a gap before the next one; fill it in order
+            slot_end = min(start_at + step, end)
+            while True:
+                for issue in page.issues:
+                    yield issue
+                    count += 1
+                    if limit and count >= limit:
+                        return
+                start_at += len(page.issues)
+                if not page.issues or start_at >= slot_end:
+                    break
+                page = await jira_clients.run(
+                    lambda jira: fetch_snapshots(jira, jql, fields, start_at, None, slot_end - start_at, expand, convert)
+                )
+                # The next page already covers everything past this slot
+                page = page._replace(issues=page.issues[:slot_end - start_at])
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -6,13 +6,37 @@ Provides Jira analysis tools for Claude
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.types import Tool, TextContent, InitializedNotification
 import os
-from jira import JIRA
-from anthropic import Anthropic
 from dotenv import load_dotenv
+import argparse
+import asyncio
+import heapq
+import itertools
 import json
-from datetime import datetime
+import time
+from collections import Counter
+from contextlib import aclosing
+from datetime import datetime, timezone
+
+from jiraiq_clients import jira_clients, anthropic_clients, connection_stats, env_int, start_warm_up
+from jiraiq_cache import get_analysis_cache, make_cache_key
+from jiraiq_batch import BulkReportJob, start_job, advance, wait as wait_for_job, format_job
+from jiraiq_mirror import get_issue_mirror
+from jiraiq_graph import get_dependency_graph
+from jiraiq_flow import get_flow_store, stale_days
+from jiraiq_prefetch import get_prefetcher
+from jiraiq_output import ResultTable, OutputError, get_result_pages, output_format, page_size, STRUCTURED_OUTPUT_PROPERTIES, MARKDOWN
+from jiraiq_search import stream_issues, ANALYZE_FIELDS, BLOCKED_FIELDS, PORTFOLIO_FIELDS, SPRINT_FIELDS, TRIAGE_FIELDS, SIMILAR_FIELDS
+from jiraiq_snapshot import snapshot_issue
+from jiraiq_ratelimit import get_llm_budget, estimate_tokens, priority, INTERACTIVE, BULK
+from jiraiq_prompt import compact_comments, compaction_stats
+from jiraiq_progress import current_progress_reporter
+from jiraiq_classifier import get_classifier, BLOCKER, TECH
+from jiraiq_metrics import metrics, count, span, timed_iter, tool_call, capture_profile
+from jiraiq_singleflight import tool_flights, issue_flights, analysis_flights, coalescing_stats
+from jiraiq_triage import TriageScorer, parse_jira_time, reference_now, cheap_model, FULL, CHEAP, SKIP
+from jiraiq_webhooks import get_webhook_processor, load_payloads, replay, replay_path, serve_webhooks, webhooks_enabled
 
 # Load environment variables
 load_dotenv()
@@ -20,21 +44,57 @@ load_dotenv()
 # Initialize MCP server
 app = Server("jiraiq")
 
-# Initialize Jira client
+# Analysis model settings
+ANALYSIS_MODEL = "claude-sonnet-4-5-20250929"
+ANALYSIS_MAX_TOKENS = 2000
+ANALYSIS_TEMPERATURE = 0.3
+
+# Tools that scan many issues; their Jira and Claude calls queue behind interactive ones
+BULK_TOOLS = {
+    "find_blocked_issues", "analyze_sprint", "analyze_dependencies", "sprint_flow_metrics",
+    "sync_jira_mirror", "submit_bulk_reports",
+}
+
+# JQL condition shared by the single-project and portfolio blocker searches
+BLOCKED_CLAUSE = 'status != Done AND (labels = blocked OR description ~ "blocked" OR comment ~ "blocked" OR status = Blocked)'
+
+# Tools that can answer with compact JSON or table rows, paged with cursors
+STRUCTURED_TOOLS = {"find_blocked_issues", "analyze_sprint", "sprint_flow_metrics", "find_similar_issues"}
+
+# Read-only tools whose identical concurrent calls share one result, with
+# the argument defaults used to normalize their coalescing keys
+COALESCED_TOOLS = {
+    "analyze_jira_issue": {"template": "executive", "related": None},
+    "find_blocked_issues": {"limit": 10, "projects": None, "filter_id": None, "duplicates": True},
+    "analyze_sprint": {
+        "sprint_name": None, "deep": False, "max_issues": None, "concurrency": None, "triage": True, "dependencies": None,
+        "flow": True,
+    },
+    "analyze_dependencies": {"projects": None, "issue_key": None, "limit": 10},
+    "sprint_flow_metrics": {"sprints": 20, "issue_key": None, "full": False},
+    "find_similar_issues": {"issue_key": None, "text": None, "projects": None, "limit": 10, "include_resolved": False},
+}
+
+# Related issues listed under an analyze_jira_issue report
+RELATED_LIMIT = 5
+
+# Shared Jira client
 def get_jira_client():
-    """Initialize Jira client with credentials from environment"""
-    return JIRA(
-        server=os.getenv('JIRA_URL'),
-        basic_auth=(os.getenv('JIRA_EMAIL'), os.getenv('JIRA_TOKEN'))
-    )
+    """Return the process-wide pooled Jira client"""
+    return jira_clients.get()
 
-# Initialize Anthropic client
+# Shared Anthropic client
 def get_anthropic_client():
-    """Initialize Anthropic client"""
-    api_key = os.getenv('ANTHROPIC_API_KEY')
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY not found in environment")
-    return Anthropic(api_key=api_key)
+    """Return the process-wide pooled Anthropic client"""
+    return anthropic_clients.get()
+
+
+async def on_initialized(notification: InitializedNotification):
+    """Warm up the Jira and Anthropic SDKs in the background once the handshake is done"""
+    start_warm_up()
+
+
+app.notification_handlers[InitializedNotification] = on_initialized
 
 
 @app.list_tools()
@@ -56,6 +116,15 @@ async def list_tools() -> list[Tool]:
                         "enum": ["executive", "technical", "pm", "all"],
                         "description": "Report template: executive (for leadership), technical (for engineers), pm (for product managers), or all (generates all three)",
                         "default": "executive"
+                    },
+                    "related": {
+                        "type": "boolean",
+                        "description": "List similar open issues from the local similarity index (default: when the issue's project is indexed; true also indexes it)"
+                    },
+                    "profile": {
+                        "type": "string",
+                        "enum": ["cpu", "memory"],
+                        "description": "Attach a cProfile (cpu) or tracemalloc (memory) report for this call"
                     }
                 },
                 "required": ["issue_key"]
@@ -63,7 +132,7 @@ async def list_tools() -> list[Tool]:
         ),
         Tool(
             name="find_blocked_issues",
-            description="Find all blocked or at-risk issues in a Jira project",
+            description="Find all blocked or at-risk issues in a Jira project, or across a portfolio of projects (a list of keys or a saved JQL filter) with per-project rollups",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -71,13 +140,32 @@ async def list_tools() -> list[Tool]:
                         "type": "string",
                         "description": "Jira project key (e.g., ENG, PROJ)"
                     },
+                    "projects": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Portfolio mode: scan these project keys together instead of project_key"
+                    },
+                    "filter_id": {
+                        "type": "string",
+                        "description": "Portfolio mode: scan the issues of this saved Jira filter (narrowed to `projects` if both are given)"
+                    },
                     "limit": {
                         "type": "integer",
-                        "description": "Maximum number of issues to return (default: 10)",
+                        "description": "Maximum number of issues to return (default: 10); in portfolio mode, the oldest blockers listed per project",
                         "default": 10
+                    },
+                    "duplicates": {
+                        "type": "boolean",
+                        "description": "Group blocked issues that look like duplicates of each other (default: true)",
+                        "default": True
+                    },
+                    **STRUCTURED_OUTPUT_PROPERTIES,
+                    "profile": {
+                        "type": "string",
+                        "enum": ["cpu", "memory"],
+                        "description": "Attach a cProfile (cpu) or tracemalloc (memory) report for this call"
                     }
-                },
-                "required": ["project_key"]
+                }
             }
         ),
         Tool(
@@ -93,274 +181,1851 @@ async def list_tools() -> list[Tool]:
                     "sprint_name": {
                         "type": "string",
                         "description": "Sprint name (optional, defaults to active sprint)"
+                    },
+                    "deep": {
+                        "type": "boolean",
+                        "description": "Run the full Claude issue analysis on every open issue concurrently and add a rolled-up sprint summary (default: false)",
+                        "default": False
+                    },
+                    "max_issues": {
+                        "type": "integer",
+                        "description": "Deep mode only: maximum number of issues to analyze (default: all)"
+                    },
+                    "concurrency": {
+                        "type": "integer",
+                        "description": "Deep mode only: maximum number of issues analyzed at the same time (default: 8)"
+                    },
+                    "triage": {
+                        "type": "boolean",
+                        "description": "Deep mode only: score issues locally first and send only risky ones to Claude, mid-risk ones to a cheaper model (default: true)",
+                        "default": True
+                    },
+                    "dependencies": {
+                        "type": "boolean",
+                        "description": "Also report sprint issues held up through \"is blocked by\" links, and the root blockers behind them; true loads the project's link graph if needed (default: only when it is already loaded)"
+                    },
+                    "flow": {
+                        "type": "boolean",
+                        "description": "For projects with flow metrics (see sprint_flow_metrics), also report issues whose status has not moved and the sprint's scope change (default: true)",
+                        "default": True
+                    },
+                    **STRUCTURED_OUTPUT_PROPERTIES,
+                    "profile": {
+                        "type": "string",
+                        "enum": ["cpu", "memory"],
+                        "description": "Attach a cProfile (cpu) or tracemalloc (memory) report for this call"
                     }
                 },
                 "required": ["project_key"]
             }
+        ),
+        Tool(
+            name="analyze_dependencies",
+            description="Build the \"is blocked by\" link graph of one or more projects and report the open blockers with the largest blast radius, the critical path, dependency cycles, and (for one issue) everything holding it up",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_key": {
+                        "type": "string",
+                        "description": "Jira project key (e.g., ENG, PROJ)"
+                    },
+                    "projects": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Several project keys whose links are analyzed together"
+                    },
+                    "issue_key": {
+                        "type": "string",
+                        "description": "Also list the direct, transitive and root blockers of this issue and what it holds up"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of top blockers to list (default: 10)",
+                        "default": 10
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="sprint_flow_metrics",
+            description="Report flow metrics built from issue changelogs: per-sprint committed, added and removed scope, completion and cycle time for the last sprints, time spent in each status, and the oldest work in progress. Changelogs are synced incrementally and the report is answered from stored rollups",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_key": {
+                        "type": "string",
+                        "description": "Jira project key (e.g., ENG, PROJ)"
+                    },
+                    "sprints": {
+                        "type": "integer",
+                        "description": "Number of most recent sprints to report (default: 20)",
+                        "default": 20
+                    },
+                    "issue_key": {
+                        "type": "string",
+                        "description": "Also show the status timeline of this issue"
+                    },
+                    "full": {
+                        "type": "boolean",
+                        "description": "Rebuild the project's metrics from every changelog instead of only new entries (default: false)",
+                        "default": False
+                    },
+                    **STRUCTURED_OUTPUT_PROPERTIES
+                },
+                "required": ["project_key"]
+            }
+        ),
+        Tool(
+            name="find_similar_issues",
+            description="Find issues whose summary, description and comments resemble a given issue or free text, ranked by similarity. Answered from a local vector index that is synced incrementally, without Jira text searches",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "issue_key": {
+                        "type": "string",
+                        "description": "Find issues like this one (e.g., ENG-123)"
+                    },
+                    "text": {
+                        "type": "string",
+                        "description": "Find issues matching this description instead of an issue"
+                    },
+                    "projects": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Project keys to search (default: the issue's project, or every indexed project for text)"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of matches to return (default: 10)",
+                        "default": 10
+                    },
+                    "include_resolved": {
+                        "type": "boolean",
+                        "description": "Also match resolved issues (default: false)",
+                        "default": False
+                    },
+                    **STRUCTURED_OUTPUT_PROPERTIES
+                }
+            }
+        ),
+        Tool(
+            name="sync_jira_mirror",
+            description="Sync a Jira project into the local issue mirror. The first sync copies every issue; later syncs only fetch issues updated since the last one. Synced projects are answered from the mirror by find_blocked_issues and analyze_sprint",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_key": {
+                        "type": "string",
+                        "description": "Jira project key (e.g., ENG, PROJ)"
+                    },
+                    "full": {
+                        "type": "boolean",
+                        "description": "Re-fetch every issue and drop deleted or moved issues (default: false)",
+                        "default": False
+                    }
+                },
+                "required": ["project_key"]
+            }
+        ),
+        Tool(
+            name="submit_bulk_reports",
+            description="Generate executive, technical and PM reports for every open issue in a sprint or project through the Anthropic Message Batches API (cheaper, not interactive). Reports are written to disk and the analyses cached; check progress with bulk_report_status",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "project_key": {
+                        "type": "string",
+                        "description": "Jira project key (e.g., ENG, PROJ)"
+                    },
+                    "sprint_name": {
+                        "type": "string",
+                        "description": "Sprint name (optional, defaults to open sprints)"
+                    },
+                    "whole_project": {
+                        "type": "boolean",
+                        "description": "Cover every open issue in the project instead of a sprint (default: false)",
+                        "default": False
+                    },
+                    "max_issues": {
+                        "type": "integer",
+                        "description": "Maximum number of issues to include (default: all)"
+                    },
+                    "wait": {
+                        "type": "boolean",
+                        "description": "Wait for the batch to finish before returning (default: false)",
+                        "default": False
+                    }
+                },
+                "required": ["project_key"]
+            }
+        ),
+        Tool(
+            name="bulk_report_status",
+            description="Check a bulk report job (collecting its results and writing the reports once the batch has ended), or list all jobs",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "job_id": {
+                        "type": "string",
+                        "description": "Job id returned by submit_bulk_reports (omit to list every job)"
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="replay_jira_webhooks",
+            description="Apply recorded Jira webhook payloads (issue created/updated/deleted and comment events) to the issue mirror and analysis cache, as the live webhook listener would; for testing",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "path": {
+                        "type": "string",
+                        "description": "JSON Lines file (or JSON array) of recorded payloads, relative to JIRAIQ_WEBHOOK_REPLAY_DIR"
+                    },
+                    "payloads": {
+                        "type": "array",
+                        "items": {"type": "object"},
+                        "description": "Payloads given inline instead of a file"
+                    },
+                    "debounce": {
+                        "type": "boolean",
+                        "description": "Coalesce events for the same issue as the listener does (default: true)",
+                        "default": True
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="jira_mirror_status",
+            description="Show which projects are in the local issue mirror, how many issues each holds and how fresh they are",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
+        Tool(
+            name="jiraiq_cache_stats",
+            description="Show hit/miss statistics and size of the LLM analysis cache",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "clear": {
+                        "type": "boolean",
+                        "description": "Empty the cache after reporting its statistics",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="jiraiq_connection_stats",
+            description="Show client and HTTP connection reuse counters for the Jira and Anthropic backends",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
+        Tool(
+            name="jiraiq_stats",
+            description="Show per-tool timings (p50/p95/p99 per stage), Jira requests and bytes, Claude tokens, cache hits and errors, plus cache, connection and rate budget counters",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["json", "prometheus"],
+                        "description": "json (default) or Prometheus text exposition format",
+                        "default": "json"
+                    },
+                    "reset": {
+                        "type": "boolean",
+                        "description": "Zero the per-tool counters and histograms after reporting them",
+                        "default": False
+                    }
+                }
+            }
         )
     ]
 
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """Handle JiraIQ tool calls"""
+@app.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Handle JiraIQ tool calls"""
+    
+    # Every call is timed and counted; "profile" additionally attaches a profile report
+    arguments = arguments or {}
+    profile = arguments.get("profile")
+    # The request may still hold the caller's dict, so the handlers get a copy without "profile"
+    arguments = {k: v for k, v in arguments.items() if k != "profile"}
+    key = None if profile else coalesce_key(name, arguments)
+    level = BULK if name in BULK_TOOLS else INTERACTIVE
+    with tool_call(name), priority(level), capture_profile(profile) as profiled:
+        if key is None:
+            result = await dispatch_tool(name, arguments)
+        else:
+            # Identical calls already in flight share that call's result
+            result = list(await tool_flights.do(key, lambda: dispatch_tool(name, arguments)))
+    
+    if profiled.report:
+        result.append(TextContent(type="text", text=profiled.report))
+    return result
+
+
+def coalesce_key(name, arguments):
+    """Key identical calls to a read-only tool alike, or None if the tool is not coalesced"""
+    
+    defaults = COALESCED_TOOLS.get(name)
+    if defaults is None:
+        return None
+    
+    normalized = {**defaults, **arguments}
+    for field in ("issue_key", "project_key"):
+        if isinstance(normalized.get(field), str):
+            normalized[field] = normalized[field].strip().upper()
+    if isinstance(normalized.get("projects"), list):
+        normalized["projects"] = sorted({str(p).strip().upper() for p in normalized["projects"]})
+    return name, json.dumps(normalized, sort_keys=True, default=str)
+
+
+async def dispatch_tool(name: str, arguments: dict) -> list[TextContent]:
+    """Route a tool call to its handler"""
+    
+    try:
+        # Later pages of a structured result come from the stored result, not a new search
+        if name in STRUCTURED_TOOLS and arguments.get("cursor"):
+            return [TextContent(
+                type="text",
+                text=get_result_pages().page(name, arguments["cursor"])
+            )]
+        if name == "analyze_jira_issue":
+            return await analyze_issue(arguments)
+        elif name == "find_blocked_issues":
+            return await find_blocked(arguments)
+        elif name == "analyze_sprint":
+            return await analyze_sprint_tool(arguments)
+        elif name == "analyze_dependencies":
+            return await analyze_dependencies_tool(arguments)
+        elif name == "sprint_flow_metrics":
+            return await sprint_flow_metrics_tool(arguments)
+        elif name == "find_similar_issues":
+            return await find_similar_tool(arguments)
+        elif name == "sync_jira_mirror":
+            return await sync_mirror_tool(arguments)
+        elif name == "submit_bulk_reports":
+            return await submit_bulk_reports_tool(arguments)
+        elif name == "bulk_report_status":
+            return await bulk_report_status_tool(arguments)
+        elif name == "replay_jira_webhooks":
+            return await replay_webhooks_tool(arguments)
+        elif name == "jira_mirror_status":
+            mirror = get_issue_mirror()
+            status = mirror.status() if mirror else {"enabled": False}
+            return [TextContent(
+                type="text",
+                text=json.dumps(status, indent=2)
+            )]
+        elif name == "jiraiq_cache_stats":
+            cache = get_analysis_cache()
+            summary = cache.summary()
+            if arguments.get("clear"):
+                cache.clear()
+            return [TextContent(
+                type="text",
+                text=json.dumps(summary, indent=2)
+            )]
+        elif name == "jiraiq_connection_stats":
+            return [TextContent(
+                type="text",
+                text=json.dumps(connection_stats(), indent=2)
+            )]
+        elif name == "jiraiq_stats":
+            return stats_tool(arguments)
+        else:
+            return [TextContent(
+                type="text",
+                text=f"Unknown tool: {name}"
+            )]
+    except OutputError as e:
+        return [TextContent(
+            type="text",
+            text=str(e)
+        )]
+    except Exception as e:
+        count("errors")
+        return [TextContent(
+            type="text",
+            text=f"Error executing {name}: {str(e)}\n\nPlease check your Jira credentials and issue key."
+        )]
+
+
+def stats_tool(arguments: dict) -> list[TextContent]:
+    """Report per-tool metrics alongside the cache, connection and budget counters"""
+    from jiraiq_similar import existing_similarity_index
+    
+    if arguments.get("format") == "prometheus":
+        text = metrics.prometheus()
+    else:
+        text = json.dumps({
+            **metrics.snapshot(),
+            "cache": get_analysis_cache().summary(),
+            "connections": connection_stats(),
+            "llm_budget": get_llm_budget().stats,
+            "prompt_compaction": compaction_stats,
+            "classifier": get_classifier().stats,
+            "coalescing": coalescing_stats(),
+            "webhooks": get_webhook_processor().summary(),
+            "dependency_graph": get_dependency_graph().summary(),
+            "flow": flow.summary() if (flow := get_flow_store()) else {"enabled": False},
+            "result_pages": get_result_pages().summary(),
+            "similar": index.summary() if (index := existing_similarity_index()) else {"enabled": False},
+            "prefetch": get_prefetcher().summary(),
+        }, indent=2)
+    
+    if arguments.get("reset"):
+        metrics.reset()
+    return [TextContent(type="text", text=text)]
+
+
+def analysis_inputs(issue, comments):
+    """Collect the issue fields that go into the analysis prompt
+    
+    Returns the inputs and the comment compaction stats.
+    """
+    
+    comment_text, compaction = compact_comments(comments)
+    
+    priority = issue.priority or 'Not set'
+    
+    return {
+        "summary": issue.summary,
+        "type": issue.issuetype,
+        "status": issue.status,
+        "priority": priority,
+        "comments": comment_text,
+    }, compaction
+
+
+def build_analysis_prompt(inputs):
+    """Build the blocker/risk/sentiment analysis prompt"""
+    
+    return f"""Analyze this Jira issue for blockers, risks, and team sentiment:
+
+Issue: {inputs['summary']}
+Type: {inputs['type']}
+Status: {inputs['status']}
+Priority: {inputs['priority']}
+
+Comments:
+{inputs['comments']}
+
+Provide:
+1. Team Sentiment: Assess if the team mood is positive, neutral, or negative based on comment tone
+2. Active Blockers: Identify any blockers mentioned (YES/NO and what they are)
+3. Biggest Risk: What could go wrong or delay this issue
+4. Actionable Recommendation: One specific next step to unblock or move forward
+
+Be concise and quote specific comments when relevant."""
+
+
+async def ask_claude(prompt, on_text=None, model=ANALYSIS_MODEL):
+    """Send one prompt to Claude within the shared requests/tokens-per-minute budget
+    
+    With `on_text`, the response is streamed and the coroutine is awaited
+    with each text delta as it arrives.
+    """
+    
+    budget = get_llm_budget()
+    reservation = await budget.acquire(estimate_tokens(prompt) + ANALYSIS_MAX_TOKENS)
+    
+    request = dict(
+        model=model,
+        max_tokens=ANALYSIS_MAX_TOKENS,
+        temperature=ANALYSIS_TEMPERATURE,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    
+    with span("llm"):
+        if on_text is None:
+            response = await anthropic_clients.run(lambda anthropic: anthropic.messages.create(**request))
+        else:
+            response = await stream_claude(request, on_text)
+    
+    count("llm_calls")
+    count("llm_input_tokens", response.usage.input_tokens)
+    count("llm_output_tokens", response.usage.output_tokens)
+    budget.settle(reservation, response.usage.input_tokens + response.usage.output_tokens)
+    return response.content[0].text
+
+
+class StreamInterrupted(Exception):
+    """A streamed response failed after part of it reached the client"""
+
+
+async def stream_claude(request, on_text):
+    """Stream a Claude response, handing text deltas to on_text on the event loop
+    
+    Failures before the first delta are retried like any other call. Once
+    text has been forwarded, a retry would send it again, so the error is
+    raised as StreamInterrupted, which is never retried.
+    """
+    
+    loop = asyncio.get_running_loop()
+    deltas = asyncio.Queue()
+    
+    def stream(anthropic):
+        emitted = False
+        try:
+            with anthropic.messages.stream(**request) as response:
+                for text in response.text_stream:
+                    emitted = True
+                    loop.call_soon_threadsafe(deltas.put_nowait, text)
+                return response.get_final_message()
+        except Exception as e:
+            if emitted:
+                raise StreamInterrupted(f"Claude's response stream broke off: {e}") from e
+            raise
+    
+    task = asyncio.ensure_future(anthropic_clients.run(stream))
+    task.add_done_callback(lambda _: deltas.put_nowait(None))
+    
+    while (text := await deltas.get()) is not None:
+        await on_text(text)
+    
+    return task.result()
+
+
+def streaming_enabled(progress):
+    """Stream Claude output when the client asked for progress notifications"""
+    return progress.enabled and os.getenv("JIRAIQ_STREAMING", "1") != "0"
+
+
+async def get_analysis(issue_key, inputs, on_text=None, model=ANALYSIS_MODEL):
+    """Return the LLM analysis for an issue, using the analysis cache"""
+    
+    cache = get_analysis_cache()
+    cache_key = make_cache_key(inputs, model, ANALYSIS_TEMPERATURE)
+    
+    with span("cache"):
+        analysis = cache.get(cache_key)
+    if analysis is not None:
+        count("cache_hits")
+        return analysis
+    
+    # Concurrent requests for the same analysis (e.g. different templates) share one Claude call
+    async def analyze():
+        analysis = await ask_claude(build_analysis_prompt(inputs), on_text=on_text, model=model)
+        cache.put(cache_key, analysis, issue_key=issue_key)
+        return analysis
+    
+    count("cache_misses")
+    return await analysis_flights.do(cache_key, analyze)
+
+
+async def analyze_issue(arguments: dict) -> list[TextContent]:
+    """Analyze a single Jira issue"""
+    
+    issue_key = arguments["issue_key"].upper()
+    template = arguments.get("template", "executive")
+    
+    # Fetch issue (issues in a freshly prefetched sprint are already at hand)
+    try:
+        issue = get_prefetcher().issue(issue_key)
+        if issue is not None:
+            count("prefetch_hits")
+        else:
+            with span("jira_fetch"):
+                issue = await issue_flights.do(issue_key, lambda: jira_clients.run(
+                    lambda jira: snapshot_issue(jira.issue(issue_key, fields=",".join(ANALYZE_FIELDS)).raw)
+                ))
+    except Exception as e:
+        count("errors")
+        return [TextContent(
+            type="text",
+            text=f"Could not fetch issue {issue_key}. Error: {str(e)}\n\nPlease verify the issue key exists and you have access."
+        )]
+    
+    # Get comments
+    comments = issue.comments
+    
+    # Look up similar issues while Claude analyzes this one; only an explicit request builds an index
+    related = arguments.get("related")
+    index = None
+    if related is not False:
+        from jiraiq_similar import get_similarity_index, existing_similarity_index
+        index = get_similarity_index() if related else existing_similarity_index()
+    related_task = None
+    if index is not None and (related or (related is None and index.has_project(issue_key.split("-")[0]))):
+        related_task = asyncio.ensure_future(related_issues(index, issue))
+    
+    # Stream the analysis text to the client as progress while Claude writes it
+    progress = current_progress_reporter(app)
+    on_text = None
+    if streaming_enabled(progress):
+        streamed = []
+        
+        async def on_text(text):
+            streamed.append(text)
+            await progress.report(estimate_tokens("".join(streamed)), ANALYSIS_MAX_TOKENS, text)
+    
+    # Get AI analysis (served from the cache when the issue is unchanged)
+    with span("prompt"):
+        inputs, compaction = analysis_inputs(issue, comments)
+    try:
+        analysis = await get_analysis(issue_key, inputs, on_text=on_text)
+    except BaseException:
+        if related_task is not None:
+            related_task.cancel()
+        raise
+    await progress.report(ANALYSIS_MAX_TOKENS, ANALYSIS_MAX_TOKENS, force=True)
+    
+    # Format based on template
+    with span("render"):
+        output = render_issue_report(issue, comments, analysis, template)
+    
+    if related_task is not None:
+        try:
+            with span("similar"):
+                matches = await related_task
+            output += f"\n\n{format_related(matches)}"
+        except Exception:
+            count("errors")
+    
+    if compaction["saved_tokens"]:
+        output += f"\n\n{format_compaction(compaction)}"
+    
+    return [TextContent(type="text", text=output)]
+
+
+async def related_issues(index, issue):
+    """Open issues that read like this one, from any indexed project"""
+    from jiraiq_similar import snapshot_document
+    
+    await index.ensure([issue.key.split("-")[0]])
+    query = index.vector(issue.key)
+    if query is None:
+        query = index.embed([snapshot_document(issue).text])[0]
+    return index.search(query, RELATED_LIMIT, exclude={issue.key})[0]
+
+
+def format_related(matches):
+    """Section listing similar issues under an issue report"""
+    
+    if not matches:
+        return "🔗 RELATED ISSUES: none found in the similarity index"
+    output = "🔗 RELATED ISSUES:\n"
+    for match in matches:
+        output += f"• {match.key} ({match.score:.0%} similar) [{match.status}]: {match.summary}\n"
+    return output.rstrip("\n")
+
+
+def render_issue_report(issue, comments, analysis, template):
+    """Render an issue analysis with the requested template"""
+    
+    if template == "executive":
+        output = format_executive(issue, analysis)
+    elif template == "technical":
+        output = format_technical(issue, comments, analysis)
+    elif template == "pm":
+        output = format_pm(issue, comments, analysis)
+    else:  # all
+        output = f"""EXECUTIVE SUMMARY:
+{'='*80}
+{format_executive(issue, analysis)}
+
+{'='*80}
+
+TECHNICAL ANALYSIS:
+{'='*80}
+{format_technical(issue, comments, analysis)}
+
+{'='*80}
+
+PM REPORT:
+{'='*80}
+{format_pm(issue, comments, analysis)}"""
+    
+    return output
+
+
+def format_compaction(compaction):
+    """One-line note on how much the comment thread was compacted"""
+    
+    saved = compaction["saved_tokens"] / compaction["original_tokens"]
+    return (
+        f"📉 Prompt compacted: ~{compaction['original_tokens']:,} → ~{compaction['prompt_tokens']:,} "
+        f"input tokens ({saved:.0%} saved; {compaction['full']} comments in full, "
+        f"{compaction['digested']} condensed, {compaction['omitted']} omitted)"
+    )
+
+
+async def search_project(project_key, jql, fields, limit, mirror_query, warm=False):
+    """Stream a project search from the local mirror if synced, else from Jira
+    
+    With `warm`, the search is for the project's open sprint, which a fresh
+    prefetch answers before either.
+    """
+    
+    prefetched = get_prefetcher().sprint_issues(project_key) if warm else None
+    if prefetched is not None:
+        count("prefetch_hits")
+        for issue in itertools.islice(prefetched, limit):
+            yield issue
+        return
+    
+    mirror = get_issue_mirror()
+    if mirror is None or not mirror.has_project(project_key):
+        async with aclosing(timed_iter("search", stream_issues(jql, fields, limit=limit))) as issues:
+            async for issue in issues:
+                yield issue
+        return
+    
+    # Catch up with a cheap delta sync once the mirror is older than its freshness bound
+    if not mirror.is_fresh(project_key):
+        with span("mirror_sync"):
+            await mirror.sync(project_key)
+    
+    for issue in itertools.islice(mirror_query(mirror), limit):
+        yield issue
+
+
+async def find_blocked(arguments: dict) -> list[TextContent]:
+    """Find blocked issues in a project"""
+    
+    if arguments.get("projects") or arguments.get("filter_id"):
+        return await find_portfolio_blockers(arguments)
+    if not arguments.get("project_key"):
+        return [TextContent(
+            type="text",
+            text="Please provide a project_key, a list of projects or a filter_id."
+        )]
+    
+    project_key = arguments["project_key"].upper()
+    limit = arguments.get("limit", 10)
+    fmt = output_format(arguments)
+    
+    # Search for potentially blocked issues
+    jql = f'project = {project_key} AND {BLOCKED_CLAUSE}'
+    
+    # An index that already holds the project catches up while the search runs; without
+    # one, the issues found are embedded on the spot and nothing is written to disk
+    duplicates = arguments.get("duplicates", True)
+    index, index_task = None, None
+    if duplicates:
+        from jiraiq_similar import existing_similarity_index, similar_path
+        duplicates = similar_path() is not None
+        index = existing_similarity_index()
+    if index is not None and index.has_project(project_key):
+        index_task = asyncio.ensure_future(index.ensure([project_key]))
+    else:
+        index = None
+    
+    # Format each issue as it arrives
+    entries = []
+    found = []
+    table = ResultTable(
+        "find_blocked_issues", ["key", "summary", "status", "priority", "assignee", "blocker_comment", "duplicate_group"],
+        project=project_key,
+    )
+    try:
+        async with aclosing(search_project(
+            project_key, jql, BLOCKED_FIELDS, limit,
+            lambda mirror: mirror.blocked_issues(project_key, limit)
+        )) as issues:
+            async for issue in issues:
+                found.append(issue)
+                if fmt == MARKDOWN:
+                    entries.append(format_blocked_entry(len(entries) + 1, issue))
+                else:
+                    mention = next(iter(blocker_comments(issue)), None)
+                    table.append(
+                        issue.key, issue.summary, issue.status, issue.priority, issue.assignee,
+                        f"{mention.author}: {mention.body[:120]}" if mention else None,
+                    )
+    except Exception as e:
+        count("errors")
+        if index_task is not None:
+            index_task.cancel()
+        return [TextContent(
+            type="text",
+            text=f"Could not search project {project_key}. Error: {str(e)}"
+        )]
+    
+    # Blocked issues that read alike are likely one problem reported more than once
+    groups = []
+    if duplicates and len(found) > 1:
+        from jiraiq_similar import duplicate_groups, duplicate_threshold, transient_vectors
+        try:
+            if index_task is not None:
+                with span("similar"):
+                    await index_task
+            vectors = index.vectors_for(found) if index is not None else transient_vectors(found)
+            groups = [[found[i] for i in group] for group in duplicate_groups(vectors, duplicate_threshold())]
+        except Exception:
+            count("errors")
+    
+    if fmt != MARKDOWN:
+        group_of = {issue.key: n for n, group in enumerate(groups, 1) for issue in group}
+        for row in table.rows:
+            row.append(group_of.get(row[0]))
+        return [TextContent(
+            type="text",
+            text=get_result_pages().first_page(table, fmt, page_size(arguments))
+        )]
+    
+    if not entries:
+        return [TextContent(
+            type="text",
+            text=f"✅ No blocked issues found in {project_key}. All clear!"
+        )]
+    
+    output = f"🚨 Found {len(entries)} potentially blocked issue(s) in {project_key}:\n\n"
+    output += "".join(entries)
+    if groups:
+        output += format_duplicates(groups)
+    output += f"\n💡 Tip: Use 'analyze_jira_issue' with each issue key to get detailed analysis and recommendations."
+    
+    return [TextContent(type="text", text=output)]
+
+
+def format_blocked_entry(i, issue):
+    """Format one find_blocked result"""
+    
+    priority = issue.priority or 'N/A'
+    assignee = issue.assignee or 'Unassigned'
+    
+    output = f"{i}. **{issue.key}**: {issue.summary}\n"
+    output += f"   Status: {issue.status} | Priority: {priority} | Owner: {assignee}\n"
+    
+    # Check for blocker indicators in recent comments
+    blocker_mentions = [f"   💬 {c.author}: \"{c.body[:80]}...\"" for c in blocker_comments(issue)]
+    
+    if blocker_mentions:
+        output += "\n".join(blocker_mentions) + "\n"
+    
+    return output + "\n"
+
+
+def format_duplicates(groups):
+    """Section listing blocked issues that look like duplicates of each other"""
+    
+    output = f"🔁 POSSIBLE DUPLICATES ({len(groups)} group(s)):\n"
+    for group in groups:
+        output += f"• {', '.join(issue.key for issue in group)}: {group[0].summary}\n"
+    return output
+
+
+def blocker_comments(issue):
+    """The issue's last three comments that read as blockers"""
+    
+    comments = issue.comments[-3:]
+    return [c for c, labels in zip(comments, get_classifier().classify(comments)) if BLOCKER in labels]
+
+
+async def find_portfolio_blockers(arguments: dict) -> list[TextContent]:
+    """Find blocked issues across many projects with one rollup per project"""
+    
+    projects = list(dict.fromkeys(str(p).strip().upper() for p in arguments.get("projects") or [] if str(p).strip()))
+    filter_id = str(arguments.get("filter_id") or "").strip()
+    limit = arguments.get("limit", 10)
+    fmt = output_format(arguments)
+    if filter_id and not filter_id.isdigit():
+        return [TextContent(
+            type="text",
+            text=f"Invalid filter_id {filter_id!r}: expected the numeric id of a saved Jira filter."
+        )]
+    
+    # Synced projects are answered from the mirror; the rest share a few batched searches
+    mirror = get_issue_mirror()
+    local = [] if filter_id or mirror is None else [p for p in projects if mirror.has_project(p)]
+    remote = [p for p in projects if p not in local]
+    batch_size = max(env_int("JIRAIQ_PORTFOLIO_BATCH_SIZE", 10), 1)
+    batches = []
+    for i in range(0, len(remote), batch_size):
+        batch = remote[i:i + batch_size]
+        keys = ", ".join(f'"{p}"' for p in batch)
+        batches.append((f"filter = {filter_id} AND project in ({keys})" if filter_id else f"project in ({keys})", batch))
+    if filter_id and not projects:
+        batches.append((f"filter = {filter_id}", []))
+    
+    now = reference_now()
+    rollups = {p: new_rollup() for p in projects}
+    sections = {}
+    failures = []
+    failed = set()
+    progress = current_progress_reporter(app)
+    total = len(projects) or None
+    
+    async def finish(project_key):
+        sections[project_key] = format_portfolio_section(project_key, rollups[project_key])
+        await progress.report(len(sections), total, sections[project_key], force=True)
+    
+    async def scan(issues, label, keys):
+        # Results arrive ordered by project, so a project is complete once the next one starts
+        current = None
+        try:
+            async with aclosing(issues) as stream:
+                async for issue in stream:
+                    project_key = issue.key.rsplit("-", 1)[0]
+                    if project_key != current:
+                        if current is not None:
+                            await finish(current)
+                        current = project_key
+                    add_to_rollup(rollups.setdefault(project_key, new_rollup()), issue, now, limit)
+        except Exception as e:
+            count("errors")
+            failures.append(f"⚠️ Could not search {label}: {str(e)}")
+            failed.update(keys)
+            return
+        if current is not None:
+            await finish(current)
+    
+    scans = [
+        scan(timed_iter("search", stream_issues(
+            f"{scope} AND {BLOCKED_CLAUSE} ORDER BY project ASC, created ASC", PORTFOLIO_FIELDS
+        )), ", ".join(keys) or f"filter {filter_id}", keys)
+        for scope, keys in batches
+    ]
+    scans += [
+        scan(search_project(p, None, PORTFOLIO_FIELDS, None, lambda m, p=p: m.blocked_issues(p, None)), p, [p])
+        for p in local
+    ]
+    await asyncio.gather(*scans)
+    
+    # Projects without blockers never appear in the results but still get a line
+    for project_key in projects:
+        if project_key not in sections and project_key not in failed:
+            await finish(project_key)
+    
+    if fmt != MARKDOWN:
+        return [TextContent(
+            type="text",
+            text=get_result_pages().first_page(portfolio_table(rollups, sections, failures), fmt, page_size(arguments))
+        )]
+    return [TextContent(type="text", text=format_portfolio_report(rollups, sections, failures))]
+
+
+def new_rollup():
+    """Empty per-project blocker rollup"""
+    return {"blocked": 0, "oldest_age": None, "oldest_key": None, "owners": Counter(), "listed": []}
+
+
+def add_to_rollup(rollup, issue, now, limit):
+    """Fold one blocked issue into its project's rollup, keeping only the `limit` oldest"""
+    
+    age = issue_age_days(issue, now)
+    owner = issue.assignee or "Unassigned"
+    rollup["blocked"] += 1
+    rollup["owners"][owner] += 1
+    if age is not None and (rollup["oldest_age"] is None or age > rollup["oldest_age"]):
+        rollup["oldest_age"], rollup["oldest_key"] = age, issue.key
+    
+    entry = (age if age is not None else -1, rollup["blocked"], issue)
+    if len(rollup["listed"]) < limit:
+        heapq.heappush(rollup["listed"], entry)
+    elif limit > 0:
+        heapq.heappushpop(rollup["listed"], entry)
+
+
+def issue_age_days(issue, now):
+    """Whole days since the issue was created, or None if Jira did not say"""
+    
+    created = parse_jira_time(issue.created)
+    return (now - created).days if created else None
+
+
+def format_top_owners(rollup, n=3):
+    """Owners with the most blockers, e.g. 'Alice (4), Bob (2)'"""
+    return ", ".join(f"{owner} ({blocked})" for owner, blocked in rollup["owners"].most_common(n))
+
+
+def format_portfolio_section(project_key, rollup):
+    """Format one project's rollup and its oldest blocked issues"""
+    
+    if not rollup["blocked"]:
+        return f"📁 {project_key}: ✅ no blocked issues\n\n"
+    
+    output = f"📁 {project_key}: {rollup['blocked']} blocked"
+    if rollup["oldest_age"] is not None:
+        output += f", oldest {rollup['oldest_age']} days ({rollup['oldest_key']})"
+    output += f"\n   Top owners: {format_top_owners(rollup)}\n"
+    
+    for i, (age, _, issue) in enumerate(sorted(rollup["listed"], key=lambda e: (-e[0], e[1])), 1):
+        priority = issue.priority or 'N/A'
+        assignee = issue.assignee or 'Unassigned'
+        age_text = f"{age}d old" if age >= 0 else "age unknown"
+        output += f"{i}. **{issue.key}**: {issue.summary}\n"
+        output += f"   Status: {issue.status} | Priority: {priority} | Owner: {assignee} | {age_text}\n"
+    
+    return output + "\n"
+
+
+def portfolio_table(rollups, sections, failures):
+    """Portfolio result as rows of listed blockers, with the per-project rollups alongside"""
+    
+    order = sorted(sections, key=lambda p: (-rollups[p]["blocked"], p))
+    table = ResultTable(
+        "find_blocked_issues", ["project", "key", "summary", "status", "priority", "assignee", "age_days"],
+        blocked=sum(rollups[p]["blocked"] for p in order),
+        project_columns=["project", "blocked", "oldest_days", "oldest_key", "top_owners"],
+        projects=[
+            [p, rollups[p]["blocked"], rollups[p]["oldest_age"], rollups[p]["oldest_key"], format_top_owners(rollups[p])]
+            for p in order
+        ],
+        errors=failures,
+    )
+    for project_key in order:
+        for age, _, issue in sorted(rollups[project_key]["listed"], key=lambda e: (-e[0], e[1])):
+            table.append(
+                project_key, issue.key, issue.summary, issue.status, issue.priority, issue.assignee,
+                age if age >= 0 else None,
+            )
+    return table
+
+
+def format_portfolio_report(rollups, sections, failures):
+    """Portfolio summary table followed by every project's section, most blocked first"""
+    
+    order = sorted(sections, key=lambda p: (-rollups[p]["blocked"], p))
+    blocked = sum(rollups[p]["blocked"] for p in order)
+    
+    output = f"🚨 PORTFOLIO BLOCKERS: {blocked} blocked issue(s) across {len(order)} project(s)\n"
+    output += f"{'='*80}\n"
+    output += f"{'Project':<12}{'Blocked':>8}{'Oldest':>9}   Top owners\n"
+    for project_key in order:
+        rollup = rollups[project_key]
+        oldest = f"{rollup['oldest_age']}d" if rollup["oldest_age"] is not None else "-"
+        output += f"{project_key:<12}{rollup['blocked']:>8}{oldest:>9}   {format_top_owners(rollup) or '-'}\n"
+    output += f"{'='*80}\n\n"
+    
+    output += "".join(sections[p] for p in order)
+    if failures:
+        output += "\n".join(failures) + "\n\n"
+    output += "💡 Tip: Use 'analyze_jira_issue' with each issue key to get detailed analysis and recommendations."
+    
+    return output
+
+
+async def analyze_sprint_tool(arguments: dict) -> list[TextContent]:
+    """Analyze a sprint's health"""
+    
+    project_key = arguments["project_key"].upper()
+    sprint_name = arguments.get("sprint_name")
+    
+    # Build JQL for sprint
+    if sprint_name:
+        jql = f'project = {project_key} AND sprint = "{sprint_name}" AND status != Done'
+    else:
+        jql = f'project = {project_key} AND sprint in openSprints() AND status != Done'
+    
+    if arguments.get("deep"):
+        return await deep_analyze_sprint(project_key, sprint_name, jql, arguments)
+    fmt = output_format(arguments)
+    
+    # A loaded link graph catches up while the sprint search runs; only an explicit
+    # request crawls the links of a project for the first time
+    dependencies = arguments.get("dependencies")
+    graph_task = None
+    if dependencies or (dependencies is None and get_dependency_graph().has_project(project_key)):
+        graph_task = asyncio.ensure_future(get_dependency_graph().ensure([project_key]))
+    
+    # Projects with flow metrics catch up on their changelogs at the same time
+    flow = get_flow_store()
+    flow_task = None
+    if arguments.get("flow", True) and flow is not None and flow.has_project(project_key):
+        flow_task = asyncio.ensure_future(flow.ensure(project_key))
+    background = [task for task in (graph_task, flow_task) if task is not None]
+    
+    # Categorize issues as they stream in, keeping only the examples we report
+    keys = []
+    total = 0
+    counts = {"blocked": 0, "high_activity": 0, "stale": 0}
+    examples = {"blocked": [], "high_activity": [], "stale": []}
+    shown = {"blocked": 5, "high_activity": 3, "stale": 3}
+    # Structured output lists every issue, so it keeps a compact row for each
+    seen = [] if fmt != MARKDOWN else None
+    classifier = get_classifier()
+    
+    try:
+        async with aclosing(search_project(
+            project_key, jql, SPRINT_FIELDS, None,
+            lambda mirror: mirror.sprint_issues(project_key, sprint_name),
+            warm=not sprint_name,
+        )) as issues:
+            async for issue in issues:
+                total += 1
+                keys.append(issue.key)
+                comments = issue.comments
+                
+                # Check if blocked
+                is_blocked = (
+                    'blocked' in [l.lower() for l in issue.labels] or
+                    issue.status.lower() == 'blocked' or
+                    classifier.has(BLOCKER, comments[-3:])
+                )
+                
+                if is_blocked:
+                    category = "blocked"
+                elif len(comments) > 5:
+                    category = "high_activity"
+                elif len(comments) == 0:
+                    category = "stale"
+                else:
+                    category = None
+                
+                if seen is not None:
+                    seen.append((issue.key, issue.summary, issue.status, category, len(comments)))
+                if category is None:
+                    continue
+                counts[category] += 1
+                if len(examples[category]) < shown[category]:
+                    examples[category].append(issue)
+    except Exception as e:
+        count("errors")
+        for task in background:
+            task.cancel()
+        return [TextContent(
+            type="text",
+            text=f"Could not analyze sprint for {project_key}. Error: {str(e)}"
+        )]
+    
+    if not total:
+        for task in background:
+            task.cancel()
+        if seen is not None:
+            return [TextContent(
+                type="text",
+                text=sprint_table(project_key, sprint_name, counts, seen, None, None, None, None).render(fmt)
+            )]
+        return [TextContent(
+            type="text",
+            text=f"No open issues found in sprint for {project_key}"
+        )]
+    
+    # Sprint issues held up through "is blocked by" links, whatever their labels say
+    graph = linked = roots = None
+    if graph_task is not None:
+        try:
+            with span("graph_sync"):
+                graph = await graph_task
+            linked, roots = graph.blockage(keys)
+        except Exception:
+            count("errors")
+    
+    # Issues whose status has not changed lately, and the sprint's scope change
+    unmoved = sprint_flow = None
+    if flow_task is not None:
+        try:
+            with span("flow_sync"):
+                await flow_task
+            unmoved = flow.unmoved(keys, stale_days(), reference_now().timestamp())
+            sprint_flow = next((
+                m for m in flow.sprint_metrics(project_key)
+                if (m["name"] == sprint_name if sprint_name else m["state"] == "active")
+            ), None)
+        except Exception:
+            count("errors")
+    
+    if seen is not None:
+        table = sprint_table(project_key, sprint_name, counts, seen, linked, roots, unmoved, sprint_flow)
+        return [TextContent(
+            type="text",
+            text=get_result_pages().first_page(table, fmt, page_size(arguments))
+        )]
+    
+    blocked = examples["blocked"]
+    high_activity = examples["high_activity"]
+    stale = examples["stale"]
+    
+    # Generate summary
+    output = f"📊 SPRINT HEALTH REPORT: {project_key}\n"
+    output += f"{'='*80}\n\n"
+    output += f"Total Issues: {total}\n"
+    output += f"Blocked: {counts['blocked']} 🔴\n"
+    output += f"High Activity: {counts['high_activity']} 🟡\n"
+    output += f"Stale (no comments): {counts['stale']} 💤\n"
+    if linked is not None:
+        output += f"Held up through issue links: {len(linked)} 🔗\n"
+    if unmoved is not None:
+        output += f"Not moved in {stale_days()}+ days: {len(unmoved)} ⏳\n"
+    output += "\n"
+    
+    if blocked:
+        output += "🚨 BLOCKED ISSUES (Need Immediate Attention):\n"
+        output += "-" * 80 + "\n"
+        for issue in blocked:
+            output += f"• {issue.key}: {issue.summary}\n"
+            output += f"  Status: {issue.status}\n\n"
+    
+    if high_activity:
+        output += "\n🔥 HIGH ACTIVITY ISSUES (Active Discussion):\n"
+        output += "-" * 80 + "\n"
+        for issue in high_activity:
+            output += f"• {issue.key}: {issue.summary}\n"
+            output += f"  Comments: {len(issue.comments)}\n\n"
+    
+    if stale:
+        output += "\n💤 STALE ISSUES (No Comments Yet):\n"
+        output += "-" * 80 + "\n"
+        for issue in stale:
+            output += f"• {issue.key}: {issue.summary}\n"
+            output += f"  Status: {issue.status}\n\n"
+    
+    if linked:
+        output += format_sprint_dependencies(graph, linked, roots)
+    
+    if unmoved:
+        output += format_unmoved(unmoved)
+    if sprint_flow:
+        output += format_sprint_flow(sprint_flow)
+    
+    output += "\n💡 Recommendations:\n"
+    if blocked:
+        output += "• Escalate blocked issues immediately\n"
+    if roots:
+        root, held = max(roots.items(), key=lambda item: item[1])
+        output += f"• Clear root blockers first: {root} alone holds up {held} sprint issue(s)\n"
+    if high_activity:
+        output += "• Review high-activity issues - may need PM intervention\n"
+    if stale:
+        output += "• Check in on stale issues - ensure they're not forgotten\n"
+    if unmoved:
+        output += f"• Follow up on the {len(unmoved)} issue(s) whose status has not changed in {stale_days()}+ days\n"
+    if sprint_flow and sprint_flow["added"] > sprint_flow["committed"] // 4:
+        output += "• Scope grew mid-sprint - agree what comes out before more goes in\n"
+    
+    return [TextContent(type="text", text=output)]
+
+
+def sprint_table(project_key, sprint_name, counts, seen, linked, roots, unmoved, sprint_flow):
+    """Sprint result as one row per issue that needs attention, with the counts alongside"""
     
-    try:
-        if name == "analyze_jira_issue":
-            return await analyze_issue(arguments)
-        elif name == "find_blocked_issues":
-            return await find_blocked(arguments)
-        elif name == "analyze_sprint":
-            return await analyze_sprint_tool(arguments)
-        else:
-            return [TextContent(
-                type="text",
-                text=f"Unknown tool: {name}"
-            )]
-    except Exception as e:
-        return [TextContent(
-            type="text",
-            text=f"Error executing {name}: {str(e)}\n\nPlease check your Jira credentials and issue key."
-        )]
+    linked = linked or {}
+    unmoved = unmoved or {}
+    table = ResultTable(
+        "analyze_sprint",
+        ["key", "summary", "status", "category", "comments", "root_blockers", "days_unmoved"],
+        project=project_key,
+        sprint=sprint_name,
+        total=len(seen),
+        counts={**counts, "held_up_by_links": len(linked), "not_moved": len(unmoved)},
+        root_blockers=sorted(([k, held] for k, held in (roots or {}).items()), key=lambda r: (-r[1], r[0]))[:10],
+        flow={k: v for k, v in sprint_flow.items() if k not in ("start", "end")} if sprint_flow else None,
+    )
+    for key, summary, status, category, comments in seen:
+        if category or key in linked or key in unmoved:
+            table.append(
+                key, summary, status, category, comments, linked.get(key),
+                unmoved[key][1] if key in unmoved else None,
+            )
+    return table
 
 
-async def analyze_issue(arguments: dict) -> list[TextContent]:
-    """Analyze a single Jira issue"""
+def format_unmoved(unmoved, shown=5):
+    """Section listing sprint issues whose status has not changed for a while, longest first"""
     
-    issue_key = arguments["issue_key"].upper()
-    template = arguments.get("template", "executive")
+    output = f"\n⏳ NOT MOVING ({stale_days()}+ days in the same status):\n"
+    output += "-" * 80 + "\n"
+    for key, (status, days) in sorted(unmoved.items(), key=lambda item: -item[1][1])[:shown]:
+        output += f"• {key}: {days:g} days in {status}\n"
+    if len(unmoved) > shown:
+        output += f"  ... and {len(unmoved) - shown} more\n"
+    return output
+
+
+def format_sprint_flow(m):
+    """Scope change and cycle time of one sprint"""
+    
+    output = f"\n🌊 FLOW: {m['name']}\n"
+    output += "-" * 80 + "\n"
+    output += f"Committed: {m['committed']} | Added mid-sprint: {m['added']} | Removed: {m['removed']} | Completed: {m['completed']}\n"
+    if m["avg_cycle_hours"] is not None:
+        output += f"Cycle time: {format_hours(m['avg_cycle_hours'])} average, 85% within {format_hours(m['p85_cycle_hours'])}\n"
+    return output
+
+
+def format_hours(hours):
+    """Hours as a short duration (e.g. 36h, 4.5d); None is an open-ended bucket"""
+    if hours is None:
+        return "30d+"
+    return f"{hours:g}h" if hours < 48 else f"{hours / 24:.1f}d".replace(".0d", "d")
+
+
+def format_sprint_dependencies(graph, linked, roots, shown=5):
+    """Section listing sprint issues held up through links and the root blockers behind them"""
+    
+    output = "\n🔗 HELD UP THROUGH ISSUE LINKS:\n"
+    output += "-" * 80 + "\n"
+    for key, found in itertools.islice(linked.items(), shown):
+        output += f"• {key}: root blocker(s) {', '.join(found[:3]) or 'in a dependency cycle'}"
+        output += f" (+{len(found) - 3} more)\n" if len(found) > 3 else "\n"
+    if len(linked) > shown:
+        output += f"  ... and {len(linked) - shown} more\n"
+    
+    output += "\n  Root blockers to clear first:\n"
+    for key, held in sorted(roots.items(), key=lambda item: (-item[1], item[0]))[:shown]:
+        node = graph.nodes[graph.index[key]]
+        output += f"  • {key} [{node.status}]: {node.summary or '(outside the loaded projects)'}"
+        output += f" — holds up {held} sprint issue(s)\n"
+    return output
+
+
+async def analyze_dependencies_tool(arguments: dict) -> list[TextContent]:
+    """Report blast radius, critical path and cycles from the issue-link graph"""
     
-    # Get Jira client
-    jira = get_jira_client()
+    projects = {str(p).strip().upper() for p in arguments.get("projects") or []}
+    if arguments.get("project_key"):
+        projects.add(arguments["project_key"].strip().upper())
+    issue_key = (arguments.get("issue_key") or "").strip().upper() or None
+    if issue_key and not projects:
+        projects.add(issue_key.split("-")[0])
+    if not projects:
+        return [TextContent(
+            type="text",
+            text="Please provide a project_key, a list of projects or an issue_key."
+        )]
+    projects = sorted(projects)
+    limit = arguments.get("limit", 10)
     
-    # Fetch issue
+    # One paged search per stale project; nothing is fetched per link
     try:
-        issue = jira.issue(issue_key)
+        with span("graph_sync"):
+            graph = await get_dependency_graph().ensure(projects)
     except Exception as e:
+        count("errors")
         return [TextContent(
             type="text",
-            text=f"Could not fetch issue {issue_key}. Error: {str(e)}\n\nPlease verify the issue key exists and you have access."
+            text=f"Could not load the issue links of {', '.join(projects)}. Error: {str(e)}"
         )]
     
-    # Get comments
-    comments = issue.fields.comment.comments
+    started = time.perf_counter()
+    scope = set(projects)
+    top = graph.top_blockers(limit, scope)
+    path = graph.critical_path(scope)
+    cycles = graph.cycles(scope)
+    held_up = graph.blocked_count(scope)
+    roots = graph.root_blockers(scope)
+    focus = graph.blockers(issue_key) + graph.blocked(issue_key) if issue_key else None
+    answered_ms = (time.perf_counter() - started) * 1000
+    
+    output = f"🔗 DEPENDENCY GRAPH: {', '.join(projects)}\n"
+    output += f"{'='*80}\n\n"
+    output += f"Issues: {len(graph) - len(graph.external):,}"
+    if graph.external:
+        output += f" (+{len(graph.external):,} linked from other projects)"
+    output += f" | Blocking links: {graph.links:,} ({graph.active_links:,} between open issues)\n"
+    output += f"Held up through links: {held_up} | Root blockers: {len(roots)} | Cycles: {len(cycles)}\n"
+    output += f"Compiled in {graph.compile_ms:.1f} ms, answered in {answered_ms:.1f} ms\n\n"
+    
+    if not top:
+        output += "✅ No open issue is held up by another open issue.\n"
+    else:
+        output += "🎯 TOP BLOCKERS (by blast radius):\n"
+        output += "-" * 80 + "\n"
+        for i, (key, radius, direct, chain) in enumerate(top, 1):
+            node = graph.nodes[graph.index[key]]
+            output += f"{i}. {key} [{node.status}]: {node.summary or '(outside the loaded projects)'}\n"
+            output += f"   Holds up {radius} open issue(s), {direct} directly | Longest chain from here: {chain}\n\n"
     
-    # Build analysis prompt
-    comment_text = "\n\n".join([
-        f"{c.author.displayName} ({c.created}): {c.body}"
-        for c in comments
-    ]) if comments else "No comments yet."
+    if len(path) > 1:
+        output += f"⛓️ CRITICAL PATH ({sum(len(step) for step in path)} issues):\n"
+        output += " → ".join(step[0] if len(step) == 1 else "{" + " ↔ ".join(step) + "}" for step in path)
+        output += "\n\n"
     
-    priority = issue.fields.priority.name if hasattr(issue.fields, 'priority') and issue.fields.priority else 'Not set'
+    if cycles:
+        output += "🔁 DEPENDENCY CYCLES (need a decision to break):\n"
+        for group in cycles[:limit]:
+            output += f"• {' ↔ '.join(group)}\n"
+        output += "\n"
+    
+    if issue_key:
+        output += format_issue_dependencies(issue_key, graph, *focus)
     
-    prompt = f"""Analyze this Jira issue for blockers, risks, and team sentiment:
+    return [TextContent(type="text", text=output)]
 
-Issue: {issue.fields.summary}
-Type: {issue.fields.issuetype.name}
-Status: {issue.fields.status.name}
-Priority: {priority}
 
-Comments:
-{comment_text}
+def format_issue_dependencies(issue_key, graph, direct, transitive, roots, holds_direct, holds_all, shown=10):
+    """What holds one issue up and what it holds up"""
+    
+    if issue_key not in graph.index:
+        return f"🔍 {issue_key}: no blocking links found in the loaded projects.\n"
+    
+    def keys(found):
+        return ", ".join(found[:shown]) + (f" (+{len(found) - shown} more)" if len(found) > shown else "")
+    
+    node = graph.nodes[graph.index[issue_key]]
+    output = f"🔍 {issue_key} [{node.status}]: {node.summary}\n"
+    if not transitive:
+        output += "   Not held up by any open issue\n"
+    else:
+        output += f"   Blocked directly by: {keys(direct)}\n"
+        output += f"   Held up by {len(transitive)} issue(s) in total: {keys(transitive)}\n"
+        output += f"   Root blockers: {keys(roots) or 'a dependency cycle'}\n"
+    if holds_all:
+        output += f"   Holds up {len(holds_all)} open issue(s), {len(holds_direct)} directly: {keys(holds_all)}\n"
+    return output
 
-Provide:
-1. Team Sentiment: Assess if the team mood is positive, neutral, or negative based on comment tone
-2. Active Blockers: Identify any blockers mentioned (YES/NO and what they are)
-3. Biggest Risk: What could go wrong or delay this issue
-4. Actionable Recommendation: One specific next step to unblock or move forward
 
-Be concise and quote specific comments when relevant."""
+async def sprint_flow_metrics_tool(arguments: dict) -> list[TextContent]:
+    """Report sprint scope change, cycle time, time in status and WIP age from changelog rollups"""
     
-    # Get AI analysis
-    anthropic = get_anthropic_client()
+    project_key = arguments["project_key"].strip().upper()
+    sprints = arguments.get("sprints", 20)
+    issue_key = (arguments.get("issue_key") or "").strip().upper() or None
     
-    response = anthropic.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=2000,
-        temperature=0.3,
-        messages=[{"role": "user", "content": prompt}]
-    )
+    flow = get_flow_store()
+    if flow is None:
+        return [TextContent(
+            type="text",
+            text="Flow metrics are disabled (JIRAIQ_FLOW_PATH=off)."
+        )]
     
-    analysis = response.content[0].text
+    # Only changelog entries added since the last sync are fetched and folded in
+    try:
+        with span("flow_sync"):
+            await flow.ensure(project_key, full=arguments.get("full", False))
+    except Exception as e:
+        count("errors")
+        return [TextContent(
+            type="text",
+            text=f"Could not sync the changelogs of {project_key}. Error: {str(e)}"
+        )]
     
-    # Format based on template
-    if template == "executive":
-        output = format_executive(issue, analysis)
-    elif template == "technical":
-        output = format_technical(issue, comments, analysis)
-    elif template == "pm":
-        output = format_pm(issue, comments, analysis)
-    else:  # all
-        output = f"""EXECUTIVE SUMMARY:
-{'='*80}
-{format_executive(issue, analysis)}
-
-{'='*80}
-
-TECHNICAL ANALYSIS:
-{'='*80}
-{format_technical(issue, comments, analysis)}
-
-{'='*80}
-
-PM REPORT:
-{'='*80}
-{format_pm(issue, comments, analysis)}"""
+    started = time.perf_counter()
+    metrics = flow.sprint_metrics(project_key, sprints)
+    in_status = flow.time_in_status(project_key)
+    wip_count, oldest = flow.wip(project_key, now=reference_now().timestamp())
+    timeline = flow.timeline(issue_key) if issue_key else None
+    answered_ms = (time.perf_counter() - started) * 1000
+    
+    fmt = output_format(arguments)
+    if fmt != MARKDOWN:
+        columns = [
+            "sprint", "name", "state", "start", "end", "committed", "added", "removed", "completed",
+            "completion_rate", "avg_cycle_hours", "p50_cycle_hours", "p85_cycle_hours",
+        ]
+        table = ResultTable(
+            "sprint_flow_metrics", columns,
+            project=project_key,
+            time_in_status=[[r["status"], r["avg_hours"], r["visits"]] for r in in_status],
+            wip=wip_count,
+            oldest_wip=[[r["key"], r["status"], r["age_days"]] for r in oldest[:5]],
+            timeline=timeline,
+        )
+        for m in metrics:
+            table.append(*(m[c] for c in columns))
+        return [TextContent(
+            type="text",
+            text=get_result_pages().first_page(table, fmt, page_size(arguments))
+        )]
+    
+    output = f"🌊 SPRINT FLOW METRICS: {project_key}\n"
+    output += f"{'='*80}\n\n"
+    output += f"Answered from stored rollups in {answered_ms:.1f} ms\n\n"
+    
+    if not metrics:
+        output += "No started sprints found in the project's changelogs.\n"
+    else:
+        output += f"📅 LAST {len(metrics)} SPRINT(S):\n"
+        output += "-" * 80 + "\n"
+        output += f"{'Sprint':<24} {'State':<7} {'Commit':>6} {'Added':>6} {'Removed':>7} {'Done':>5} {'Done %':>6} {'Cycle':>6} {'85%':>6}\n"
+        for m in metrics:
+            rate = f"{m['completion_rate']:.0%}" if m["completion_rate"] is not None else "-"
+            cycle = format_hours(m["avg_cycle_hours"]) if m["avg_cycle_hours"] is not None else "-"
+            p85 = format_hours(m["p85_cycle_hours"]) if m["completed"] else "-"
+            output += (f"{(m['name'] or str(m['sprint']))[:24]:<24} {m['state'][:7]:<7} {m['committed']:>6} {m['added']:>6} "
+                       f"{m['removed']:>7} {m['completed']:>5} {rate:>6} {cycle:>6} {p85:>6}\n")
+        
+        closed = [m for m in metrics if m["state"] == "closed"]
+        if closed:
+            output += f"\nPer closed sprint ({len(closed)}): {sum(m['completed'] for m in closed) / len(closed):.1f} completed, "
+            output += f"{sum(m['added'] for m in closed) / len(closed):.1f} added and "
+            output += f"{sum(m['removed'] for m in closed) / len(closed):.1f} removed mid-sprint\n"
+    
+    if in_status:
+        output += "\n⏱️ TIME IN STATUS (completed visits):\n"
+        output += "-" * 80 + "\n"
+        for row in in_status:
+            output += f"• {row['status']}: {format_hours(row['avg_hours'])} average over {row['visits']} visit(s)\n"
+    
+    output += f"\n🚧 WORK IN PROGRESS: {wip_count} issue(s) started and not done\n"
+    if oldest:
+        output += "-" * 80 + "\n"
+        for row in oldest[:5]:
+            output += f"• {row['key']}: started {row['age_days']:g} days ago, {row['in_status_days']:g} days in {row['status']}\n"
+    
+    if issue_key:
+        output += f"\n🔍 {issue_key} status timeline:\n"
+        if timeline is None:
+            output += "   Not found in the synced changelogs\n"
+        for when, status in timeline or []:
+            output += f"   {datetime.fromtimestamp(when, timezone.utc):%Y-%m-%d %H:%M} → {status}\n"
     
     return [TextContent(type="text", text=output)]
 
 
-async def find_blocked(arguments: dict) -> list[TextContent]:
-    """Find blocked issues in a project"""
+async def find_similar_tool(arguments: dict) -> list[TextContent]:
+    """Rank indexed issues by similarity to an issue or a piece of text"""
+    from jiraiq_similar import get_similarity_index, issue_document
     
-    project_key = arguments["project_key"].upper()
+    issue_key = (arguments.get("issue_key") or "").strip().upper() or None
+    text = (arguments.get("text") or "").strip()
     limit = arguments.get("limit", 10)
+    include_resolved = arguments.get("include_resolved", False)
+    fmt = output_format(arguments)
+    if not issue_key and not text:
+        return [TextContent(
+            type="text",
+            text="Please provide an issue_key or some text to match."
+        )]
     
-    jira = get_jira_client()
+    index = get_similarity_index()
+    if index is None:
+        return [TextContent(
+            type="text",
+            text="Similar issues are disabled (JIRAIQ_SIMILAR_PATH=off)."
+        )]
     
-    # Search for potentially blocked issues
-    jql = f'project = {project_key} AND status != Done AND (labels = blocked OR description ~ "blocked" OR comment ~ "blocked" OR status = Blocked)'
+    projects = list(dict.fromkeys(str(p).strip().upper() for p in arguments.get("projects") or [] if str(p).strip()))
+    if not projects:
+        projects = [issue_key.split("-")[0]] if issue_key else index.projects()
+    if not projects:
+        return [TextContent(
+            type="text",
+            text="No projects are indexed yet; pass the projects to search."
+        )]
     
+    # Only issues updated since the last sync are fetched and re-embedded
     try:
-        issues = jira.search_issues(jql, maxResults=limit)
+        with span("similar_sync"):
+            await index.ensure(projects)
+        query = index.vector(issue_key) if issue_key else None
+        if issue_key and query is None:
+            with span("jira_fetch"):
+                raw = await jira_clients.run(lambda jira: jira.issue(issue_key, fields=",".join(SIMILAR_FIELDS)).raw)
+            query = index.embed([issue_document(raw).text])[0]
     except Exception as e:
+        count("errors")
         return [TextContent(
             type="text",
-            text=f"Could not search project {project_key}. Error: {str(e)}"
+            text=f"Could not update the similarity index for {', '.join(projects)}. Error: {str(e)}"
         )]
+    if query is None:
+        query = index.embed([text])[0]
     
-    if not issues:
+    started = time.perf_counter()
+    matches = index.search(query, limit, projects, include_resolved, exclude={issue_key} if issue_key else ())[0]
+    answered_ms = (time.perf_counter() - started) * 1000
+    subject = issue_key or f'"{text[:60]}"'
+    
+    if fmt != MARKDOWN:
+        table = ResultTable(
+            "find_similar_issues", ["key", "summary", "status", "similarity"],
+            query=subject, projects=projects,
+        )
+        for match in matches:
+            table.append(match.key, match.summary, match.status, round(match.score, 3))
         return [TextContent(
             type="text",
-            text=f"✅ No blocked issues found in {project_key}. All clear!"
+            text=get_result_pages().first_page(table, fmt, page_size(arguments))
         )]
     
-    # Format results
-    output = f"🚨 Found {len(issues)} potentially blocked issue(s) in {project_key}:\n\n"
-    
-    for i, issue in enumerate(issues, 1):
-        priority = issue.fields.priority.name if hasattr(issue.fields, 'priority') and issue.fields.priority else 'N/A'
-        assignee = issue.fields.assignee.displayName if issue.fields.assignee else 'Unassigned'
-        
-        output += f"{i}. **{issue.key}**: {issue.fields.summary}\n"
-        output += f"   Status: {issue.fields.status.name} | Priority: {priority} | Owner: {assignee}\n"
-        
-        # Check for blocker indicators in recent comments
-        comments = issue.fields.comment.comments[-3:] if issue.fields.comment.comments else []
-        blocker_mentions = []
-        for c in comments:
-            if 'block' in c.body.lower():
-                blocker_mentions.append(f"   💬 {c.author.displayName}: \"{c.body[:80]}...\"")
-        
-        if blocker_mentions:
-            output += "\n".join(blocker_mentions) + "\n"
-        
-        output += "\n"
+    scope = "issues" if include_resolved else "open issues"
+    if not matches:
+        return [TextContent(
+            type="text",
+            text=f"No {scope} in {', '.join(projects)} resemble {subject}."
+        )]
     
-    output += f"\n💡 Tip: Use 'analyze_jira_issue' with each issue key to get detailed analysis and recommendations."
+    output = f"🔎 {len(matches)} {scope} similar to {subject} in {', '.join(projects)}:\n"
+    output += f"(searched {len(index):,} indexed issues in {answered_ms:.1f} ms)\n\n"
+    for i, match in enumerate(matches, 1):
+        output += f"{i}. **{match.key}** ({match.score:.0%} similar): {match.summary}\n"
+        output += f"   Status: {match.status}\n"
+    output += f"\n💡 Tip: Use 'analyze_jira_issue' on a match to compare it in depth."
     
     return [TextContent(type="text", text=output)]
 
 
-async def analyze_sprint_tool(arguments: dict) -> list[TextContent]:
-    """Analyze a sprint's health"""
-    
-    project_key = arguments["project_key"].upper()
-    sprint_name = arguments.get("sprint_name")
+async def deep_analyze_sprint(project_key, sprint_name, jql, arguments):
+    """Run the per-issue Claude analysis over every open issue in a sprint"""
     
-    jira = get_jira_client()
+    max_issues = arguments.get("max_issues")
+    concurrency = arguments.get("concurrency") or env_int("JIRAIQ_DEEP_CONCURRENCY", 8)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = datetime.now()
+    saved_tokens = [0]
+    progress = current_progress_reporter(app)
+    scorer = TriageScorer.from_env() if arguments.get("triage", True) and os.getenv("JIRAIQ_TRIAGE", "1") != "0" else None
+    now = reference_now()
+    models = {FULL: ANALYSIS_MODEL, CHEAP: cheap_model()}
     
-    # Build JQL for sprint
-    if sprint_name:
-        jql = f'project = {project_key} AND sprint = "{sprint_name}" AND status != Done'
-    else:
-        jql = f'project = {project_key} AND sprint in openSprints() AND status != Done'
+    async def analyze(issue, path):
+        async with semaphore:
+            try:
+                comments = issue.comments
+                inputs, compaction = analysis_inputs(issue, comments)
+                saved_tokens[0] += compaction["saved_tokens"]
+                analysis = await get_analysis(issue.key, inputs, model=models[path])
+                return issue, analysis, None
+            except Exception as e:
+                return issue, None, e
     
+    # Score each issue as the search yields it and start the analyses that pass triage
+    tasks = []
+    triaged = []
     try:
-        issues = jira.search_issues(jql, maxResults=50)
+        async with aclosing(search_project(
+            project_key, jql, TRIAGE_FIELDS, max_issues,
+            lambda mirror: mirror.sprint_issues(project_key, sprint_name),
+            warm=not sprint_name,
+        )) as issues:
+            async for issue in issues:
+                score, reasons = scorer.score(issue, now) if scorer else (None, [])
+                path = scorer.route(score) if scorer else FULL
+                triaged.append((issue, score, reasons, path))
+                if path == SKIP:
+                    count("triage_skipped")
+                    continue
+                if path == CHEAP:
+                    count("triage_cheap")
+                tasks.append(asyncio.ensure_future(analyze(issue, path)))
     except Exception as e:
+        for task in tasks:
+            task.cancel()
+        count("errors")
         return [TextContent(
             type="text",
             text=f"Could not analyze sprint for {project_key}. Error: {str(e)}"
         )]
     
-    if not issues:
+    if not triaged:
         return [TextContent(
             type="text",
             text=f"No open issues found in sprint for {project_key}"
         )]
     
-    # Categorize issues
-    blocked = []
-    high_activity = []
-    stale = []
-    
-    for issue in issues:
-        comments = issue.fields.comment.comments
+    # Report each issue in the order its analysis completes
+    paths = {issue.key: path for issue, _, _, path in triaged}
+    results = []
+    completed = []
+    failed = 0
+    for next_done in asyncio.as_completed(tasks):
+        issue, analysis, error = await next_done
+        if error is not None:
+            failed += 1
+            text = f"**{issue.key}**: {issue.summary}\n\n⚠️ Analysis failed: {str(error)}"
+        else:
+            completed.append((issue, analysis))
+            text = format_issue_analysis(issue, analysis)
+            if paths[issue.key] == CHEAP:
+                text += f"\n\n_Mid-risk issue: analyzed with {models[CHEAP]}_"
+        results.append(TextContent(type="text", text=text))
         
-        # Check if blocked
-        is_blocked = (
-            hasattr(issue.fields, 'labels') and 'blocked' in [l.lower() for l in issue.fields.labels] or
-            issue.fields.status.name.lower() == 'blocked' or
-            any('block' in c.body.lower() for c in comments[-3:])
+        # Hand each finished issue to the client straight away
+        await progress.report(len(results), len(tasks), f"{text}\n\n", force=True)
+    
+    elapsed = (datetime.now() - started).total_seconds()
+    header = f"🧠 DEEP SPRINT ANALYSIS: {project_key}\n"
+    header += f"{'='*80}\n"
+    header += f"Analyzed {len(completed)} of {len(triaged)} open issue(s) in {elapsed:.1f}s"
+    header += f" ({failed} failed)" if failed else ""
+    if saved_tokens[0]:
+        header += f"\n📉 Prompt compaction saved ~{saved_tokens[0]:,} input tokens"
+    if scorer:
+        header += "\n\n" + format_triage(triaged, scorer)
+    
+    if completed:
+        try:
+            rollup = await summarize_sprint(project_key, completed)
+        except Exception as e:
+            rollup = f"⚠️ Could not build the sprint summary: {str(e)}"
+        results.append(TextContent(
+            type="text",
+            text=f"📊 SPRINT SUMMARY: {project_key}\n{'='*80}\n{rollup}"
+        ))
+    
+    return [TextContent(type="text", text=header)] + results
+
+
+def format_triage(triaged, scorer):
+    """Rank the sprint's issues by local risk score and show the path each one took"""
+    
+    labels = {FULL: "🔴 full analysis", CHEAP: "🟡 cheap model", SKIP: "🟢 skipped"}
+    tally = {path: sum(1 for *_, p in triaged if p == path) for path in labels}
+    
+    output = (
+        f"🩺 Triage: {tally[FULL]} full analysis (score ≥ {scorer.full_threshold}), "
+        f"{tally[CHEAP]} cheap model (≥ {scorer.cheap_threshold}), {tally[SKIP]} skipped\n"
+    )
+    for issue, score, reasons, path in sorted(triaged, key=lambda t: (-t[1], t[0].key)):
+        output += f"  {score:.2f}  {issue.key:<12} {labels[path]:<18} {', '.join(reasons) or 'no risk signals'}\n"
+    return output.rstrip("\n")
+
+
+async def summarize_sprint(project_key, completed):
+    """Roll the per-issue analyses of a sprint up into one summary"""
+    
+    digest = "\n\n".join(
+        f"{issue.key} ({issue.status}): {issue.summary}\n{analysis}"
+        for issue, analysis in sorted(completed, key=lambda item: item[0].key)
+    )
+    
+    cache = get_analysis_cache()
+    cache_key = make_cache_key({"sprint_rollup": digest}, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE)
+    summary = cache.get(cache_key)
+    if summary is not None:
+        return summary
+    
+    prompt = f"""Below are analyses of every open issue in the current sprint for project {project_key}.
+
+{digest}
+
+Summarize the sprint as a whole:
+1. Overall Health: On track, at risk, or off track, and why
+2. Top Blockers: The most important blockers across issues, with issue keys
+3. Team Sentiment: The overall mood and any issues where it is notably negative
+4. Recommendations: The three most valuable next steps for the team
+
+Be concise and reference issue keys."""
+    
+    summary = await ask_claude(prompt)
+    cache.put(cache_key, summary)
+    return summary
+
+
+def format_issue_analysis(issue, analysis):
+    """Format one issue's analysis for a multi-issue report"""
+    
+    priority = issue.priority or 'Not set'
+    assignee = issue.assignee or 'Unassigned'
+    
+    return f"""**{issue.key}**: {issue.summary}
+Status: {issue.status} | Priority: {priority} | Owner: {assignee}
+
+{analysis}"""
+
+
+async def sync_mirror_tool(arguments: dict) -> list[TextContent]:
+    """Sync a project into the local issue mirror"""
+    
+    project_key = arguments["project_key"].upper()
+    full = arguments.get("full", False)
+    
+    mirror = get_issue_mirror()
+    if mirror is None:
+        return [TextContent(
+            type="text",
+            text="The issue mirror is disabled (JIRAIQ_MIRROR_PATH=off)."
+        )]
+    
+    try:
+        result = await mirror.sync(project_key, full=full)
+    except Exception as e:
+        return [TextContent(
+            type="text",
+            text=f"Could not sync project {project_key}. Error: {str(e)}"
+        )]
+    
+    return [TextContent(
+        type="text",
+        text=f"🔄 Synced {project_key} ({result['mode']}): {result['fetched']} issue(s) fetched, "
+             f"{result['removed']} removed in {result['seconds']}s"
+    )]
+
+
+async def submit_bulk_reports_tool(arguments: dict) -> list[TextContent]:
+    """Start (or resume) a Message Batches bulk report for a sprint or project"""
+    
+    project_key = arguments["project_key"].upper()
+    
+    try:
+        job = await start_job(
+            project_key,
+            sprint_name=arguments.get("sprint_name"),
+            whole_project=arguments.get("whole_project", False),
+            max_issues=arguments.get("max_issues"),
         )
-        
-        if is_blocked:
-            blocked.append(issue)
-        elif len(comments) > 5:
-            high_activity.append(issue)
-        elif len(comments) == 0:
-            stale.append(issue)
+        if arguments.get("wait"):
+            await wait_for_job(job)
+    except Exception as e:
+        count("errors")
+        return [TextContent(
+            type="text",
+            text=f"Could not start bulk reports for {project_key}. Error: {str(e)}"
+        )]
     
-    # Generate summary
-    output = f"📊 SPRINT HEALTH REPORT: {project_key}\n"
-    output += f"{'='*80}\n\n"
-    output += f"Total Issues: {len(issues)}\n"
-    output += f"Blocked: {len(blocked)} 🔴\n"
-    output += f"High Activity: {len(high_activity)} 🟡\n"
-    output += f"Stale (no comments): {len(stale)} 💤\n\n"
+    output = format_job(job)
+    if not job.finished:
+        output += f"\n💡 Tip: Use 'bulk_report_status' with job_id {job.id} to collect the reports once the batch ends."
+    return [TextContent(type="text", text=output)]
+
+
+async def bulk_report_status_tool(arguments: dict) -> list[TextContent]:
+    """Poll a bulk report job, or list every job"""
     
-    if blocked:
-        output += "🚨 BLOCKED ISSUES (Need Immediate Attention):\n"
-        output += "-" * 80 + "\n"
-        for issue in blocked[:5]:
-            output += f"• {issue.key}: {issue.fields.summary}\n"
-            output += f"  Status: {issue.fields.status.name}\n\n"
+    job_id = arguments.get("job_id")
+    if not job_id:
+        jobs = BulkReportJob.all()
+        text = "\n".join(format_job(job) for job in jobs) if jobs else "No bulk report jobs yet."
+        return [TextContent(type="text", text=text)]
     
-    if high_activity:
-        output += "\n🔥 HIGH ACTIVITY ISSUES (Active Discussion):\n"
-        output += "-" * 80 + "\n"
-        for issue in high_activity[:3]:
-            output += f"• {issue.key}: {issue.fields.summary}\n"
-            output += f"  Comments: {len(issue.fields.comment.comments)}\n\n"
+    try:
+        job = await advance(BulkReportJob.load(job_id))
+    except Exception as e:
+        count("errors")
+        return [TextContent(
+            type="text",
+            text=f"Could not check bulk report {job_id}. Error: {str(e)}"
+        )]
     
-    if stale:
-        output += "\n💤 STALE ISSUES (No Comments Yet):\n"
-        output += "-" * 80 + "\n"
-        for issue in stale[:3]:
-            output += f"• {issue.key}: {issue.fields.summary}\n"
-            output += f"  Status: {issue.fields.status.name}\n\n"
+    return [TextContent(type="text", text=format_job(job))]
+
+
+async def replay_webhooks_tool(arguments: dict) -> list[TextContent]:
+    """Feed recorded webhook payloads through the webhook processor"""
     
-    output += "\n💡 Recommendations:\n"
-    if blocked:
-        output += "• Escalate blocked issues immediately\n"
-    if high_activity:
-        output += "• Review high-activity issues - may need PM intervention\n"
-    if stale:
-        output += "• Check in on stale issues - ensure they're not forgotten\n"
+    payloads = arguments.get("payloads")
+    if payloads is None:
+        if not arguments.get("path"):
+            return [TextContent(
+                type="text",
+                text="Provide either path (a recorded payload file) or payloads."
+            )]
+        try:
+            payloads = load_payloads(replay_path(arguments["path"]))
+        except (OSError, ValueError) as e:
+            return [TextContent(
+                type="text",
+                text=f"Could not read webhook payloads from {arguments['path']}. Error: {str(e)}"
+            )]
     
+    result = await replay(payloads, debounce=arguments.get("debounce", True))
+    
+    output = f"🔔 Replayed {result['received']} webhook payload(s)"
+    if result["coalesced"]:
+        output += f" ({result['coalesced']} coalesced into earlier events for the same issue)"
+    output += "\n"
+    output += f"   Refreshed: {result['refreshed']} | Deleted: {result['deleted']} | "
+    output += f"Skipped (nothing held locally): {result['skipped']} | Ignored: {result['ignored']}\n"
+    output += f"   Jira fetches: {result['jira_fetches']} | Mirror updates: {result['mirror_updates']} | "
+    output += f"Graph updates: {result['graph_updates']} | "
+    output += f"Prefetch updates: {result['prefetch_updates']} | "
+    output += f"Index updates: {result['similar_updates']} | "
+    output += f"Analyses invalidated: {result['invalidated']} | Re-analyzed: {result['reanalyzed']}\n"
+    if result["errors"]:
+        output += f"   ⚠️ {result['errors']} refresh(es) failed\n"
     return [TextContent(type="text", text=output)]
 
 
 def format_executive(issue, analysis):
     """Format for executive audience"""
     
-    priority = issue.fields.priority.name if hasattr(issue.fields, 'priority') and issue.fields.priority else 'Not set'
-    assignee = issue.fields.assignee.displayName if issue.fields.assignee else 'Unassigned'
+    priority = issue.priority or 'Not set'
+    assignee = issue.assignee or 'Unassigned'
     
-    return f"""**{issue.key}**: {issue.fields.summary}
+    return f"""**{issue.key}**: {issue.summary}
 
-Priority: {priority} | Status: {issue.fields.status.name} | Owner: {assignee}
+Priority: {priority} | Status: {issue.status} | Owner: {assignee}
 
 {analysis}
 
@@ -373,16 +2038,18 @@ Priority: {priority} | Status: {issue.fields.status.name} | Owner: {assignee}
 def format_technical(issue, comments, analysis):
     """Format for engineering audience"""
     
-    priority = issue.fields.priority.name if hasattr(issue.fields, 'priority') and issue.fields.priority else 'Not set'
-    assignee = issue.fields.assignee.displayName if issue.fields.assignee else 'Unassigned'
+    priority = issue.priority or 'Not set'
+    assignee = issue.assignee or 'Unassigned'
     
     # Find technical comments
-    tech_keywords = ['code', 'api', 'database', 'error', 'config', 'patch', 'stack', 'query']
-    tech_comments = [c for c in comments if any(kw in c.body.lower() for kw in tech_keywords)]
+    tech_comments = [
+        c for c, labels in zip(comments, get_classifier().classify(comments))
+        if TECH in labels
+    ]
     
-    output = f"""**{issue.key}**: {issue.fields.summary}
+    output = f"""**{issue.key}**: {issue.summary}
 
-Status: {issue.fields.status.name} | Priority: {priority} | Assignee: {assignee}
+Status: {issue.status} | Priority: {priority} | Assignee: {assignee}
 
 {analysis}
 
@@ -392,7 +2059,7 @@ Status: {issue.fields.status.name} | Priority: {priority} | Assignee: {assignee}
     if tech_comments:
         for i, c in enumerate(tech_comments[:3], 1):
             excerpt = c.body[:200] + "..." if len(c.body) > 200 else c.body
-            output += f"\n{i}. {c.author.displayName} ({c.created[:10]}):\n   {excerpt}\n"
+            output += f"\n{i}. {c.author} ({c.created[:10]}):\n   {excerpt}\n"
     else:
         output += "No technical details in comments.\n"
     
@@ -410,15 +2077,15 @@ Status: {issue.fields.status.name} | Priority: {priority} | Assignee: {assignee}
 def format_pm(issue, comments, analysis):
     """Format for PM audience"""
     
-    priority = issue.fields.priority.name if hasattr(issue.fields, 'priority') and issue.fields.priority else 'Not set'
-    assignee = issue.fields.assignee.displayName if issue.fields.assignee else 'Unassigned'
+    priority = issue.priority or 'Not set'
+    assignee = issue.assignee or 'Unassigned'
     comment_count = len(comments)
     
     engagement = "🔥 High activity" if comment_count > 5 else "📊 Moderate activity" if comment_count > 2 else "💤 Low activity"
     
-    return f"""**{issue.key}**: {issue.fields.summary}
+    return f"""**{issue.key}**: {issue.summary}
 
-Status: {issue.fields.status.name} | Priority: {priority} | Owner: {assignee}
+Status: {issue.status} | Priority: {priority} | Owner: {assignee}
 Discussion: {comment_count} comments | {engagement}
 
 {analysis}
@@ -436,16 +2103,42 @@ Discussion: {comment_count} comments | {engagement}
 ☐ Escalate blockers?"""
 
 
-async def main():
-    """Run the MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+async def run_stdio():
+    """Run the MCP server for a single client over stdio"""
+    # Jira webhooks need a port of their own when MCP itself is not served over HTTP
+    listener = asyncio.ensure_future(serve_webhooks()) if webhooks_enabled() else None
+    # Warm the watched sprints ahead of the first tool call
+    get_prefetcher().start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        await get_prefetcher().stop()
+        if listener is not None:
+            listener.cancel()
+
+
+def main():
+    """Run the MCP server over stdio (default) or as a shared HTTP server"""
+    parser = argparse.ArgumentParser(description="JiraIQ MCP server")
+    parser.add_argument("--transport", choices=["stdio", "http"], default=os.getenv("JIRAIQ_TRANSPORT", "stdio"),
+                        help="stdio for a single client (default) or http to serve many clients")
+    parser.add_argument("--host", default=os.getenv("JIRAIQ_HTTP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=env_int("JIRAIQ_HTTP_PORT", 8000))
+    parser.add_argument("--workers", type=int, default=env_int("JIRAIQ_HTTP_WORKERS", 1),
+                        help="HTTP worker processes sharing the on-disk cache and mirror")
+    args = parser.parse_args()
+    
+    if args.transport == "http":
+        from jiraiq_http import serve
+        serve(app, args.host, args.port, args.workers)
+    else:
+        asyncio.run(run_stdio())
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    main()
@@ -0,0 +1,791 @@
+#!/usr/bin/env python3
+"""
+JiraIQ similar issues
+Local vector index over issue summaries, descriptions and comments, for
+"which other issues look like this one" without `text ~` JQL
+
+Usage:
+    python jiraiq_similar.py sync ENG OPS [--full]
+    python jiraiq_similar.py query "login times out on the SSO page" [--projects ENG] [--limit 10]
+    python jiraiq_similar.py similar ENG-123 [--limit 10]
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, namedtuple
+from contextlib import aclosing, contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from jiraiq_cache import DEFAULT_CACHE_DIR
+from jiraiq_clients import env_float, env_int, get_executor
+from jiraiq_graph import is_resolved
+from jiraiq_search import stream_issues, SIMILAR_FIELDS
+from jiraiq_singleflight import similar_flights
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# Hashed TF-IDF dimensions; the same width as all-MiniLM-L6-v2 embeddings
+DEFAULT_DIM = 384
+
+# Issues embedded and written together during a sync
+SYNC_BATCH = 500
+
+# Most recent comments, and characters of text overall, that go into an issue's vector
+MAX_COMMENTS = 5
+MAX_TEXT = 4000
+
+# Minutes of overlap added to every delta query to absorb clock skew
+SYNC_OVERLAP_MINUTES = 5
+
+# Rows the vector file starts with; it doubles whenever it fills up
+MIN_CAPACITY = 1024
+
+# Features remembered with their bucket; past this, new words are hashed on every use
+MAX_CACHED_FEATURES = 500_000
+
+WORD = re.compile(r"[a-z0-9][a-z0-9_]+")
+
+STOPWORDS = frozenset("""
+    about after all also an and any are as at be been before but by can could did do does for from
+    had has have he her his how if in into is it its just me more my no not now of on or our out she
+    so some than that the their them then there these they this to too up us was we were what when
+    which who will with would you your
+""".split())
+
+# What the index reports per match
+Match = namedtuple("Match", ["key", "score", "summary", "status"])
+
+# What the index keeps per issue besides its vector
+SimilarDoc = namedtuple("SimilarDoc", ["key", "project", "summary", "status", "resolved", "text"])
+
+
+def plain_text(value):
+    """Text of a description or comment body, flattening Atlassian document format"""
+    if not value:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return value.get("text") or " ".join(plain_text(c) for c in value.get("content") or ())
+    if isinstance(value, list):
+        return " ".join(plain_text(v) for v in value)
+    return str(value)
+
+
+def issue_text(summary, description, comment_bodies):
+    """The text an issue is embedded from; the summary counts twice"""
+    parts = [summary, summary, description, *comment_bodies[-MAX_COMMENTS:]]
+    return "\n".join(p for p in parts if p)[:MAX_TEXT]
+
+
+def issue_document(raw):
+    """A SimilarDoc from an issue's JSON"""
+    fields = raw.get("fields") or {}
+    status = fields.get("status")
+    summary = fields.get("summary") or ""
+    comments = (fields.get("comment") or {}).get("comments") or ()
+    return SimilarDoc(
+        raw["key"],
+        raw["key"].rsplit("-", 1)[0],
+        summary,
+        (status or {}).get("name") or "Unknown",
+        is_resolved(status),
+        issue_text(summary, plain_text(fields.get("description")), [plain_text(c.get("body")) for c in comments]),
+    )
+
+
+def snapshot_document(issue):
+    """A SimilarDoc from an issue snapshot, which carries no description"""
+    return SimilarDoc(
+        issue.key,
+        issue.key.rsplit("-", 1)[0],
+        issue.summary,
+        issue.status,
+        False,
+        issue_text(issue.summary, "", [c.body for c in issue.comments]),
+    )
+
+
+def normalized(vectors):
+    """Scale each row to unit length in place (all-zero rows stay zero)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class HashedTfidf:
+    """Signed feature hashing of words and word pairs, weighted by inverse document frequency
+
+    Needs no model and no vocabulary: every feature lands in one of `dim`
+    buckets, with a sign that makes colliding features cancel rather than
+    add up. Document frequencies are counted per bucket as issues are
+    first indexed, so common words weigh less as the index grows; a row
+    keeps the weights it was written with until its issue changes.
+    """
+
+    def __init__(self, dim=DEFAULT_DIM):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+        self.df = np.zeros(dim, dtype=np.float64)
+        self.docs = 0
+        self._slots = {}
+
+    def _slot(self, feature):
+        slot = self._slots.get(feature)
+        if slot is None:
+            h = zlib.crc32(feature.encode("utf-8"))
+            slot = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            if len(self._slots) < MAX_CACHED_FEATURES:
+                self._slots[feature] = slot
+        return slot
+
+    def features(self, text):
+        words = [w for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts, learn=False):
+        """Unit vectors for `texts`; with `learn`, they count towards the document frequencies first"""
+        cells, values = [], []
+        for i, text in enumerate(texts):
+            for feature, tf in Counter(self.features(text)).items():
+                bucket, sign = self._slot(feature)
+                cells.append(i * self.dim + bucket)
+                values.append(sign * (1.0 + math.log(tf)))
+        vectors = np.bincount(
+            np.asarray(cells, dtype=np.intp), np.asarray(values), minlength=len(texts) * self.dim
+        ).astype(np.float32).reshape(len(texts), self.dim)
+        if learn:
+            self.df += np.count_nonzero(vectors, axis=0)
+            self.docs += len(texts)
+        vectors *= (np.log((1.0 + self.docs) / (1.0 + self.df)) + 1.0).astype(np.float32)
+        return normalized(vectors)
+
+
+class SentenceEmbedder:
+    """A local sentence-transformers model, run on the CPU"""
+
+    def __init__(self, model):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"model:{model}"
+
+    def embed(self, texts, learn=False):
+        vectors = self._model.encode(list(texts), batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def embedder_from_env():
+    """The model named by JIRAIQ_SIMILAR_MODEL if it can be loaded, else hashed TF-IDF"""
+    model = os.getenv("JIRAIQ_SIMILAR_MODEL")
+    if model:
+        try:
+            return SentenceEmbedder(model)
+        except ImportError:
+            print("jiraiq: sentence-transformers is not installed; similar issues use hashed TF-IDF", file=sys.stderr)
+    return HashedTfidf(env_int("JIRAIQ_SIMILAR_DIM", DEFAULT_DIM))
+
+
+def transient_vectors(issues):
+    """Unit vectors for a few issue snapshots from a throwaway hashed TF-IDF, for when no index exists"""
+    embedder = HashedTfidf(env_int("JIRAIQ_SIMILAR_DIM", DEFAULT_DIM))
+    return embedder.embed([snapshot_document(issue).text for issue in issues], learn=True)
+
+
+def duplicate_groups(vectors, threshold):
+    """Index groups of rows whose cosine similarity reaches `threshold`, linked transitively"""
+    if len(vectors) < 2:
+        return []
+    pairs = np.argwhere(np.triu(vectors @ vectors.T >= threshold, 1))
+    parent = list(range(len(vectors)))
+
+    def find(u):
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        return u
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for i in range(len(vectors)):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+class SimilarityIndex:
+    """Issue vectors in a memory-mapped matrix, with their keys and status in SQLite
+
+    Row i of `vectors.f32` is the unit vector of one issue. The file grows
+    by doubling and rows freed by deleted issues are reused, so inserts
+    never rewrite the matrix. A query is one matrix product over the used
+    rows (any number of query vectors at once), masked to the wanted
+    projects and, by default, unresolved issues, then a partial sort for
+    the top k: one pass over the matrix however many issues match.
+
+    Syncs fetch only the issues updated since the previous one and embed
+    only those whose text changed; webhooks update single issues in
+    between. Switching the embedding model empties the index, because
+    vectors from different models cannot be compared.
+
+    Several processes (HTTP workers) can share one index directory. Writes
+    take an exclusive lock on `index.lock` and first reload whatever other
+    processes committed, so rows are allocated from an up-to-date view;
+    the vector file is only ever extended under that lock, never
+    truncated. Readers reload and remap when SQLite's data version shows
+    another process wrote.
+    """
+
+    def __init__(self, path, embedder):
+        self.path = Path(path) if path else None
+        self.embedder = embedder
+        self._lock = threading.RLock()
+        self._embed_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._lock_file = None
+        self._matrix = None
+        self._version = None
+        if self.path is None:
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path / "index.sqlite3"), check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            if fcntl is not None:
+                self._lock_file = open(self.path / "index.lock", "a+")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS issues (
+                row INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                project TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                status TEXT NOT NULL,
+                resolved INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sync_state (
+                project TEXT PRIMARY KEY,
+                last_sync REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value BLOB
+            );
+        """)
+        self.stats = {
+            "syncs": 0,
+            "full_syncs": 0,
+            "issues_fetched": 0,
+            "embedded": 0,
+            "unchanged": 0,
+            "removed": 0,
+            "updates": 0,
+            "queries": 0,
+            "rebuilds": 0,
+        }
+        with self._file_lock():
+            self._start_over_if_stale()
+        self._refresh()
+
+    @classmethod
+    def from_env(cls):
+        """Build the index configured by JIRAIQ_SIMILAR_PATH, or None if disabled"""
+        path = similar_path()
+        if path is None:
+            return None
+        return cls(None if path == "memory" else path, embedder_from_env())
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def max_age(self):
+        return env_float("JIRAIQ_SIMILAR_MAX_AGE", 900.0)
+
+    # -- Storage ------------------------------------------------------------
+
+    def _file_rows(self):
+        vectors = self.path / "vectors.f32"
+        return vectors.stat().st_size // (self.embedder.dim * 4) if vectors.exists() else 0
+
+    def _stale(self):
+        """Why the stored index cannot be used with this embedder ("new", "model", "vectors"), or None"""
+        meta = dict(self._db.execute("SELECT name, value FROM meta"))
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim:
+            return "model" if meta else "new"
+        count = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM issues").fetchone()[0]
+        if self.path is not None and self._file_rows() < count:
+            # The vectors did not survive (or never made it to disk)
+            return "vectors"
+        return None
+
+    def _start_over_if_stale(self):
+        """Empty the index if this embedder cannot use it (holding the file lock)"""
+        reason = self._stale()
+        if reason is not None:
+            self.stats["rebuilds"] += reason != "new"
+            self._reset()
+            self._version = None
+
+    def _refresh(self):
+        """Reload the rows if another process committed since they were last read (holding self._lock)"""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            self._load()
+            self._version = version
+
+    def _load(self):
+        # Until a write starts over, a process whose embedder does not match sees an empty index
+        stale = self._stale() is not None
+        meta = {} if stale else dict(self._db.execute("SELECT name, value FROM meta"))
+        if isinstance(self.embedder, HashedTfidf):
+            self.embedder.df = np.frombuffer(meta["df"], dtype=np.float64).copy() if "df" in meta else np.zeros(self.embedder.dim)
+            self.embedder.docs = meta.get("docs", 0)
+
+        rows = [] if stale else self._db.execute(
+            "SELECT row, key, project, summary, status, resolved, digest FROM issues ORDER BY row"
+        ).fetchall()
+        self._count = rows[-1][0] + 1 if rows else 0
+
+        if self.path is None:
+            capacity = MIN_CAPACITY
+            while capacity < self._count:
+                capacity *= 2
+        else:
+            # Map the file as it is; only writers extend it
+            capacity = self._file_rows()
+        self._capacity = 0
+        self._matrix = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._open = np.zeros(0, dtype=bool)
+        self._project = np.zeros(0, dtype=np.int32)
+        self._keys, self._summaries, self._statuses = [], [], []
+        if capacity:
+            self._grow(capacity)
+
+        self._rows, self._digests, self._projects = {}, {}, {}
+        for row, key, project, summary, status, resolved, digest in rows:
+            self._place(row, key, project, summary, status, resolved)
+            self._digests[key] = digest
+        self._free = [row for row in range(self._count) if not self._alive[row]]
+
+    def _reset(self):
+        self._db.executescript("DELETE FROM issues; DELETE FROM sync_state; DELETE FROM meta;")
+        self._db.executemany("INSERT INTO meta (name, value) VALUES (?, ?)", [
+            ("embedder", self.embedder.name), ("dim", self.embedder.dim),
+        ])
+        self._db.commit()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive across the processes sharing the index directory"""
+        if self._lock_file is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _writing(self):
+        """Hold the index for writing, with the rows other processes committed loaded first"""
+        with self._write_lock, self._file_lock():
+            with self._lock:
+                self._start_over_if_stale()
+                self._refresh()
+            yield
+
+    def _grow(self, capacity):
+        """Make room for `capacity` rows, extending the vector file (only while writing) and the masks"""
+        dim = self.embedder.dim
+        if self.path is None:
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if self._matrix is not None:
+                matrix[:self._capacity] = self._matrix
+        else:
+            if self._matrix is not None:
+                self._matrix.flush()
+            with open(self.path / "vectors.f32", "ab") as f:
+                if f.tell() < capacity * dim * 4:
+                    f.truncate(capacity * dim * 4)
+            matrix = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r+", shape=(capacity, dim))
+        extra = capacity - self._capacity
+        self._matrix = matrix
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._open = np.concatenate([self._open, np.zeros(extra, dtype=bool)])
+        self._project = np.concatenate([self._project, np.zeros(extra, dtype=np.int32)])
+        self._keys += [None] * extra
+        self._summaries += [None] * extra
+        self._statuses += [None] * extra
+        self._capacity = capacity
+
+    def _place(self, row, key, project, summary, status, resolved):
+        self._rows[key] = row
+        self._keys[row] = key
+        self._summaries[row] = summary
+        self._statuses[row] = sys.intern(status)
+        self._alive[row] = True
+        self._open[row] = not resolved
+        self._project[row] = self._projects.setdefault(project, len(self._projects))
+
+    def _new_row(self):
+        if self._free:
+            return self._free.pop()
+        if self._count == self._capacity:
+            self._grow(max(self._capacity * 2, MIN_CAPACITY))
+        self._count += 1
+        return self._count - 1
+
+    # -- Writes -------------------------------------------------------------
+
+    def embed(self, texts, learn=False):
+        with self._embed_lock:
+            return self.embedder.embed(texts, learn=learn)
+
+    def upsert(self, docs):
+        """Index new or changed issues; returns how many were (re-)embedded (blocking)"""
+        docs = list({doc.key: doc for doc in docs}.values())
+        digests = [hashlib.blake2b(doc.text.encode("utf-8"), digest_size=12).hexdigest() for doc in docs]
+        with self._writing():
+            return self._upsert(docs, digests)
+
+    def _upsert(self, docs, digests):
+        changed = [(doc, d) for doc, d in zip(docs, digests) if self._digests.get(doc.key) != d]
+        # Only an issue's first version counts towards the document frequencies
+        new = [(doc, d) for doc, d in changed if doc.key not in self._rows]
+        edited = [(doc, d) for doc, d in changed if doc.key in self._rows]
+        batches = [
+            (part, self.embed([doc.text for doc, _ in part], learn=learn))
+            for part, learn in ((new, True), (edited, False)) if part
+        ]
+
+        with self._lock:
+            rows = {}
+            for part, vectors in batches:
+                for doc, digest in part:
+                    rows[doc.key] = self._rows[doc.key] if doc.key in self._rows else self._new_row()
+                    self._digests[doc.key] = digest
+                self._matrix[[rows[doc.key] for doc, _ in part]] = vectors
+            # Summary and status changes need no new vector
+            for doc in docs:
+                if doc.key not in rows:
+                    rows[doc.key] = self._rows[doc.key]
+                self._place(rows[doc.key], doc.key, doc.project, doc.summary, doc.status, doc.resolved)
+            self._db.executemany("""
+                INSERT OR REPLACE INTO issues (row, key, project, summary, status, resolved, digest)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (rows[doc.key], doc.key, doc.project, doc.summary, doc.status, int(doc.resolved), self._digests[doc.key])
+                for doc in docs
+            ])
+            self._save_weights()
+            if self.path is not None:
+                self._matrix.flush()
+            self._db.commit()
+        self.stats["embedded"] += len(changed)
+        self.stats["unchanged"] += len(docs) - len(changed)
+        return len(changed)
+
+    def _save_weights(self):
+        if isinstance(self.embedder, HashedTfidf):
+            self._db.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", [
+                ("df", self.embedder.df.tobytes()), ("docs", self.embedder.docs),
+            ])
+
+    def remove(self, keys):
+        """Drop issues from the index, freeing their rows for reuse"""
+        removed = 0
+        with self._writing(), self._lock:
+            for key in keys:
+                row = self._rows.pop(key, None)
+                if row is None:
+                    continue
+                self._digests.pop(key, None)
+                self._matrix[row] = 0.0
+                self._alive[row] = False
+                self._keys[row] = self._summaries[row] = self._statuses[row] = None
+                self._free.append(row)
+                self._db.execute("DELETE FROM issues WHERE key = ?", (key,))
+                removed += 1
+            self._db.commit()
+        self.stats["removed"] += removed
+        return removed
+
+    def update_issue(self, raw):
+        """Apply one issue pushed by a webhook, if its project is indexed"""
+        doc = issue_document(raw)
+        if not self.has_project(doc.project):
+            return False
+        self.upsert([doc])
+        self.stats["updates"] += 1
+        return True
+
+    def remove_issue(self, issue_key):
+        if self.remove([issue_key]):
+            self.stats["updates"] += 1
+
+    # -- Sync ---------------------------------------------------------------
+
+    def _state(self, project_key):
+        with self._lock:
+            row = self._db.execute("SELECT last_sync FROM sync_state WHERE project = ?", (project_key,)).fetchone()
+        return None if row is None else {"last_sync": row[0]}
+
+    def has_project(self, project_key):
+        return self._state(project_key.upper()) is not None
+
+    def is_fresh(self, project_key):
+        state = self._state(project_key.upper())
+        return state is not None and time.time() - state["last_sync"] <= self.max_age
+
+    def projects(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT project FROM sync_state ORDER BY project")]
+
+    async def ensure(self, project_keys, full=False):
+        """Sync the projects that are missing or stale; concurrent callers share one sync each"""
+        for project_key in dict.fromkeys(p.upper() for p in project_keys):
+            if full or not self.is_fresh(project_key):
+                await similar_flights.do((project_key, full), lambda p=project_key: self.sync(p, full=full))
+
+    async def sync(self, project_key, full=False):
+        """Fetch a project's issues (all of them, or those changed since the last sync) and embed the changed ones"""
+        state = self._state(project_key)
+        started = time.time()
+        full = full or state is None
+
+        jql = f'project = {project_key}'
+        if not full:
+            minutes = math.ceil((started - state["last_sync"]) / 60) + SYNC_OVERLAP_MINUTES
+            jql += f' AND updated >= "-{minutes}m"'
+
+        # Embedding is CPU work; each batch runs off the event loop while the next pages arrive
+        loop = asyncio.get_running_loop()
+        seen, batch, embedded = set(), [], 0
+        async with aclosing(stream_issues(jql, SIMILAR_FIELDS, convert=issue_document)) as docs:
+            async for doc in docs:
+                seen.add(doc.key)
+                batch.append(doc)
+                if len(batch) >= SYNC_BATCH:
+                    embedded += await loop.run_in_executor(get_executor(), self.upsert, batch)
+                    batch = []
+        if batch:
+            embedded += await loop.run_in_executor(get_executor(), self.upsert, batch)
+
+        removed = await loop.run_in_executor(get_executor(), self._finish_sync, project_key, started, seen if full else None)
+        self.stats["syncs"] += 1
+        self.stats["full_syncs"] += int(full)
+        self.stats["issues_fetched"] += len(seen)
+        return {
+            "project": project_key,
+            "mode": "full" if full else "delta",
+            "fetched": len(seen),
+            "embedded": embedded,
+            "removed": removed,
+            "seconds": round(time.time() - started, 2),
+        }
+
+    def _finish_sync(self, project_key, started, seen=None):
+        """Record a sync; after a full one, first drop the project's issues it did not see (blocking)"""
+        removed = 0
+        if seen is not None:
+            prefix = f"{project_key}-"
+            with self._lock:
+                gone = [k for k in self._rows if k.startswith(prefix) and k not in seen]
+            removed = self.remove(gone)
+        with self._writing(), self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (project, last_sync) VALUES (?, ?)", (project_key, started)
+            )
+            self._db.commit()
+        return removed
+
+    # -- Queries ------------------------------------------------------------
+
+    def vector(self, issue_key):
+        """The stored vector of an indexed issue, or None"""
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(issue_key)
+            return None if row is None else np.array(self._matrix[row])
+
+    def vectors_for(self, issues):
+        """One row per issue snapshot: its stored vector, or one embedded from the snapshot"""
+        vectors = np.zeros((len(issues), self.embedder.dim), dtype=np.float32)
+        missing = []
+        with self._lock:
+            self._refresh()
+            for i, issue in enumerate(issues):
+                row = self._rows.get(issue.key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    vectors[i] = self._matrix[row]
+        if missing:
+            vectors[missing] = self.embed([snapshot_document(issues[i]).text for i in missing])
+        return vectors
+
+    def search(self, queries, limit=10, projects=None, include_resolved=False, exclude=()):
+        """The `limit` best matches for each query vector, best first
+
+        `queries` is one vector or a matrix of them; the result is a list of
+        Match lists, one per query. Issues sharing nothing with a query are
+        never matches.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        self.stats["queries"] += len(queries)
+        with self._lock:
+            self._refresh()
+            n = self._count
+            if n == 0 or limit <= 0:
+                return [[] for _ in queries]
+            mask = self._alive[:n].copy()
+            if not include_resolved:
+                mask &= self._open[:n]
+            if projects is not None:
+                ids = [self._projects[p] for p in projects if p in self._projects]
+                mask &= np.isin(self._project[:n], ids)
+            for key in exclude:
+                row = self._rows.get(key)
+                if row is not None:
+                    mask[row] = False
+
+            scores = np.asarray(self._matrix[:n]) @ queries.T
+            scores[~mask] = -np.inf
+            k = min(limit, n)
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            results = []
+            for j in range(len(queries)):
+                rows = top[:, j]
+                rows = rows[np.argsort(-scores[rows, j], kind="stable")]
+                results.append([
+                    Match(self._keys[r], float(scores[r, j]), self._summaries[r], self._statuses[r])
+                    for r in rows if scores[r, j] > 0
+                ])
+            return results
+
+    def summary(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "path": str(self.path) if self.path else "memory",
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "projects": self.projects(),
+                "issues": len(self._rows),
+                "capacity": self._capacity,
+            }
+
+
+def similar_path():
+    """JIRAIQ_SIMILAR_PATH: a directory, "memory", or None when similar issues are off"""
+    path = os.getenv("JIRAIQ_SIMILAR_PATH", str(DEFAULT_CACHE_DIR / "similar"))
+    if path.lower() in ("", "off", "none"):
+        return None
+    return "memory" if path.lower() == "memory" else path
+
+
+def duplicate_threshold():
+    """Cosine similarity at which two issues are reported as possible duplicates"""
+    return env_float("JIRAIQ_DUPLICATE_THRESHOLD", 0.8)
+
+
+_similarity_index = None
+_similarity_index_loaded = False
+_similarity_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """Return the process-wide similarity index, or None when it is disabled"""
+    global _similarity_index, _similarity_index_loaded
+    with _similarity_index_lock:
+        if not _similarity_index_loaded:
+            _similarity_index = SimilarityIndex.from_env()
+            _similarity_index_loaded = True
+        return _similarity_index
+
+
+def existing_similarity_index():
+    """The similarity index if one was built before, else None; never creates one
+
+    For callers that only use the index where it already holds a project,
+    so a server that never indexed anything writes no index files and
+    loads no embedding model.
+    """
+    with _similarity_index_lock:
+        if _similarity_index_loaded:
+            return _similarity_index
+    path = similar_path()
+    if path is None or path == "memory" or not (Path(path) / "index.sqlite3").exists():
+        return None
+    return get_similarity_index()
+
+
+def main(argv):
+    """Command line entry point for syncing and querying the similarity index"""
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="Index new and changed issues")
+    sync.add_argument("projects", nargs="+")
+    sync.add_argument("--full", action="store_true", help="Refetch every issue and drop deleted ones")
+    query = commands.add_parser("query", help="Find issues matching some text")
+    query.add_argument("text")
+    query.add_argument("--projects", help="Comma-separated project keys (default: all indexed)")
+    query.add_argument("--limit", type=int, default=10)
+    similar = commands.add_parser("similar", help="Find issues like an indexed issue")
+    similar.add_argument("issue_key")
+    similar.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    index = get_similarity_index()
+    if index is None:
+        print("Similar issues are disabled (JIRAIQ_SIMILAR_PATH=off)")
+        return 1
+
+    if args.command == "sync":
+        async def run():
+            for project_key in args.projects:
+                print(json.dumps(await index.sync(project_key.upper(), full=args.full)))
+        asyncio.run(run())
+        return 0
+
+    if args.command == "query":
+        projects = [p.strip().upper() for p in args.projects.split(",")] if args.projects else None
+        matches = index.search(index.embed([args.text])[0], args.limit, projects)[0]
+    else:
+        vector = index.vector(args.issue_key.upper())
+        if vector is None:
+            print(f"{args.issue_key} is not indexed; sync its project first")
+            return 1
+        matches = index.search(vector, args.limit, exclude={args.issue_key.upper()})[0]
+    for match in matches:
+        print(f"{match.score:.3f}  {match.key:<12} {match.status:<14} {match.summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
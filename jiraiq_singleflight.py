@@ -0,0 +1,81 @@
+"""
+JiraIQ request coalescing
+Lets identical concurrent calls share one in-flight result instead of repeating backend work
+"""
+
+import asyncio
+
+from jiraiq_metrics import count
+
+
+class SingleFlight:
+    """Deduplicates concurrent coroutines by key
+
+    The first caller for a key (the leader) starts the work as a task;
+    callers that arrive with the same key while it is still running await
+    that task and get the same result or exception. Nothing is cached:
+    once the task finishes the key is forgotten and the next call starts
+    fresh work. The shared task is shielded, so one waiter being cancelled
+    does not cancel the work for the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self.stats = {"calls": 0, "leaders": 0, "coalesced": 0}
+
+    async def do(self, key, fn):
+        """Return await fn(), sharing it with identical calls already in flight"""
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one event loop, so keys are tracked per loop
+        flight = (loop, key)
+        self.stats["calls"] += 1
+
+        task = self._inflight.get(flight)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = self._inflight[flight] = loop.create_task(fn())
+            task.add_done_callback(lambda _: self._forget(flight, task))
+        else:
+            self.stats["coalesced"] += 1
+            count("coalesced")
+
+        return await asyncio.shield(task)
+
+    def _forget(self, flight, task):
+        if self._inflight.get(flight) is task:
+            del self._inflight[flight]
+        # Mark the outcome as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self):
+        return len(self._inflight)
+
+
+# Whole tool calls, keyed on (tool, normalized arguments)
+tool_flights = SingleFlight("tool_calls")
+
+# Jira issue fetches, keyed on issue key
+issue_flights = SingleFlight("issue_fetches")
+
+# Claude analyses, keyed on the analysis cache key (shared across report templates)
+analysis_flights = SingleFlight("analyses")
+
+# Dependency graph refreshes, keyed on project key
+graph_flights = SingleFlight("graph_syncs")
+
+# Flow metric syncs, keyed on (project key, full)
+flow_flights = SingleFlight("flow_syncs")
+
+# Similarity index syncs, keyed on (project key, full)
+similar_flights = SingleFlight("similar_syncs")
+
+
+def coalescing_stats():
+    """Coalescing counters for every single-flight layer"""
+    return {
+        flights.name: {**flights.stats, "in_flight": flights.in_flight}
+        for flights in (tool_flights, issue_flights, analysis_flights, graph_flights, flow_flights, similar_flights)
+    }
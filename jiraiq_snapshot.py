@@ -0,0 +1,102 @@
+"""
+JiraIQ issue snapshots
+Compact copies of the issue fields the tools read, built straight from Jira's JSON
+"""
+
+import sys
+from dataclasses import asdict, dataclass
+
+
+def _intern(value):
+    return sys.intern(value) if value else value
+
+
+def _name(resource):
+    """Interned `name` of a status/priority/issuetype object, or None"""
+    return _intern(resource.get("name")) if resource else None
+
+
+def _user(user):
+    """Interned display name of a user object, or None"""
+    return _intern(user.get("displayName") or user.get("name")) if user else None
+
+
+@dataclass(slots=True, eq=False)
+class CommentSnapshot:
+    """One comment: the author's name and the body, kept as the only copy"""
+
+    id: str
+    author: str
+    body: str
+    created: str
+    updated: str
+
+
+@dataclass(slots=True, eq=False)
+class IssueSnapshot:
+    """The fields JiraIQ reads from an issue, without the raw JSON or Resource objects
+
+    Status, priority, issue type, label and user names are interned, so the
+    thousands of issues in a large sprint or mirror share one string per
+    distinct value. Fields the search did not request are None (or empty).
+    """
+
+    key: str
+    summary: str
+    issuetype: str
+    status: str
+    priority: str
+    assignee: str
+    labels: tuple
+    created: str
+    updated: str
+    comments: tuple
+
+
+def snapshot_comment(raw):
+    created = raw.get("created") or ""
+    updated = raw.get("updated")
+    return CommentSnapshot(
+        raw.get("id"),
+        _user(raw.get("author")) or "Unknown",
+        raw.get("body") or "",
+        created,
+        # Most comments are never edited; share the created string rather than a copy
+        created if updated == created else updated,
+    )
+
+
+def snapshot_issue(raw):
+    """Build a snapshot from an issue's JSON (a search result, `Issue.raw` or a mirror row)"""
+    fields = raw.get("fields") or {}
+    comments = (fields.get("comment") or {}).get("comments") or ()
+    return IssueSnapshot(
+        raw["key"],
+        fields.get("summary") or "",
+        _name(fields.get("issuetype")),
+        _name(fields.get("status")) or "Unknown",
+        _name(fields.get("priority")),
+        _user(fields.get("assignee")),
+        tuple(_intern(label) for label in fields.get("labels") or ()),
+        fields.get("created"),
+        fields.get("updated"),
+        tuple(snapshot_comment(c) for c in comments),
+    )
+
+
+def snapshot_to_dict(issue):
+    """Plain-JSON form of a snapshot, e.g. for a job file on disk"""
+    return asdict(issue)
+
+
+def snapshot_from_dict(data):
+    """Rebuild a snapshot saved with `snapshot_to_dict`"""
+    names = {field: _intern(data.get(field)) for field in ("issuetype", "status", "priority", "assignee")}
+    return IssueSnapshot(**{
+        **data,
+        **names,
+        "labels": tuple(_intern(label) for label in data.get("labels") or ()),
+        "comments": tuple(
+            CommentSnapshot(**{**c, "author": _intern(c["author"])}) for c in data.get("comments") or ()
+        ),
+    })
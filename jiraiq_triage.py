@@ -0,0 +1,135 @@
+"""
+JiraIQ triage
+Scores issues locally so only the risky ones in a deep sprint analysis reach Claude
+"""
+
+import os
+from datetime import datetime, timezone
+
+from jiraiq_classifier import get_classifier, BLOCKER, RISK
+from jiraiq_clients import env_float, env_int
+
+
+FULL = "full"
+CHEAP = "cheap"
+SKIP = "skip"
+
+DEFAULT_CHEAP_MODEL = "claude-haiku-4-5-20251001"
+
+URGENT_PRIORITIES = {"blocker", "highest", "critical"}
+HIGH_PRIORITIES = {"high", "major"}
+
+# Comments scanned for blocker/risk terms, newest first
+RECENT_COMMENTS = 3
+
+
+def parse_jira_time(value):
+    """Parse a Jira timestamp such as 2024-05-01T09:30:00.000+0000, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+    except ValueError:
+        return None
+
+
+def reference_now():
+    """The time issue ages and idle periods are measured against
+
+    The current time, unless JIRAIQ_NOW pins it to a Jira-style timestamp
+    so a recorded or synthetic dataset scores the same on every run.
+    """
+    return parse_jira_time(os.getenv("JIRAIQ_NOW")) or datetime.now(timezone.utc)
+
+
+class TriageScorer:
+    """Cheap local risk score over fields the sprint search already fetched
+
+    Each signal adds a fixed weight and the total is capped at 1.0. Issues
+    scoring at least `full_threshold` get the full Claude analysis, those
+    at least `cheap_threshold` get the same prompt on the cheaper model,
+    and the rest are reported with their local score only.
+    """
+
+    def __init__(self, full_threshold=0.5, cheap_threshold=0.25, stale_days=14, active_days=7):
+        self.full_threshold = full_threshold
+        self.cheap_threshold = min(cheap_threshold, full_threshold)
+        self.stale_days = stale_days
+        self.active_days = active_days
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            full_threshold=env_float("JIRAIQ_TRIAGE_FULL_THRESHOLD", 0.5),
+            cheap_threshold=env_float("JIRAIQ_TRIAGE_CHEAP_THRESHOLD", 0.25),
+            stale_days=env_int("JIRAIQ_TRIAGE_STALE_DAYS", 14),
+        )
+
+    def score(self, issue, now=None):
+        """Return (score, reasons) for one issue snapshot"""
+        now = now or reference_now()
+        comments = issue.comments
+        score = 0.0
+        reasons = []
+
+        # Explicitly blocked
+        labels = [l.lower() for l in issue.labels]
+        if issue.status.lower() == "blocked" or "blocked" in labels:
+            score += 0.45
+            reasons.append("marked blocked")
+
+        # Blocker and risk language in the latest comments
+        recent = comments[-RECENT_COMMENTS:]
+        found = set().union(*get_classifier().classify(recent)) if recent else set()
+        if BLOCKER in found:
+            score += 0.35
+            reasons.append("blocker mentioned")
+        if RISK in found:
+            score += 0.15
+            reasons.append("risk mentioned")
+
+        priority = (issue.priority or "").lower()
+        if priority in URGENT_PRIORITIES:
+            score += 0.2
+            reasons.append(f"{issue.priority} priority")
+        elif priority in HIGH_PRIORITIES:
+            score += 0.1
+            reasons.append(f"{issue.priority} priority")
+
+        # A burst of recent discussion, or none at all for a long time
+        last_activity = parse_jira_time(issue.updated)
+        if comments:
+            last_activity = max(filter(None, (last_activity, parse_jira_time(comments[-1].created))), default=None)
+            active = sum(
+                1 for c in comments
+                if (when := parse_jira_time(c.created)) and (now - when).days < self.active_days
+            )
+            if active >= 3:
+                score += 0.1
+                reasons.append(f"{active} comments this week")
+        if last_activity and (now - last_activity).days >= self.stale_days:
+            score += 0.1
+            reasons.append(f"idle {(now - last_activity).days}d")
+
+        # Long-open work is more likely to be stuck
+        created = parse_jira_time(issue.created)
+        if created:
+            age = (now - created).days
+            if age >= 30:
+                score += min(age / 90, 1.0) * 0.1
+                reasons.append(f"open {age}d")
+
+        return round(min(score, 1.0), 2), reasons
+
+    def route(self, score):
+        """Which analysis path an issue with this score takes"""
+        if score >= self.full_threshold:
+            return FULL
+        if score >= self.cheap_threshold:
+            return CHEAP
+        return SKIP
+
+
+def cheap_model():
+    """Model used for mid-risk issues"""
+    return os.getenv("JIRAIQ_TRIAGE_CHEAP_MODEL") or DEFAULT_CHEAP_MODEL
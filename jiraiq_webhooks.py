@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+JiraIQ webhooks
+Keeps the issue mirror and analysis cache current from Jira's issue and comment webhooks
+
+Usage:
+    python jiraiq_webhooks.py serve [--host 127.0.0.1] [--port 8090]
+    python jiraiq_webhooks.py replay payloads.jsonl [--no-debounce]
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from jiraiq_cache import get_analysis_cache, make_cache_key
+from jiraiq_clients import jira_clients, env_float, env_int
+from jiraiq_graph import get_dependency_graph
+from jiraiq_metrics import count
+from jiraiq_mirror import get_issue_mirror, sprint_field, MIRROR_FIELDS
+from jiraiq_prefetch import get_prefetcher
+from jiraiq_ratelimit import priority, BULK
+from jiraiq_snapshot import snapshot_issue
+
+
+ISSUE_EVENTS = {"jira:issue_created", "jira:issue_updated"}
+DELETE_EVENTS = {"jira:issue_deleted"}
+COMMENT_EVENTS = {"comment_created", "comment_updated", "comment_deleted"}
+
+WEBHOOK_PATH = "/webhooks/jira"
+
+
+def webhooks_enabled():
+    return os.getenv("JIRAIQ_WEBHOOKS", "0") == "1"
+
+
+def watched():
+    """Issue keys and project keys listed in JIRAIQ_WATCH"""
+    return {w.strip().upper() for w in os.getenv("JIRAIQ_WATCH", "").split(",") if w.strip()}
+
+
+def is_loopback(host):
+    """Whether a listen address only accepts connections from this machine"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def verify_signature(body, header, secret):
+    """Check an `X-Hub-Signature: sha256=<hex>` header against the raw body"""
+    if not header or "=" not in header:
+        return False
+    method, _, signature = header.partition("=")
+    if method not in ("sha256", "sha1"):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, getattr(hashlib, method)).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class PendingChange:
+    """Everything heard about one issue since its last refresh"""
+
+    __slots__ = ("key", "first_seen", "events", "deleted", "raw", "timer")
+
+    def __init__(self, key):
+        self.key = key
+        self.first_seen = time.monotonic()
+        self.events = 0
+        self.deleted = False
+        self.raw = None
+        self.timer = None
+
+
+class WebhookProcessor:
+    """Applies webhook events to the mirror and the analysis cache, one issue at a time
+
+    Events for an issue are held for `debounce` seconds after the latest
+    one, so a burst of edits (a bulk change, a comment thread, a workflow
+    transition that also sets fields) costs one refresh. A burst never
+    holds an issue back longer than `max_delay`. Issues that are not
+    mirrored, graphed, indexed, prefetched, cached or watched are dropped without
+    a Jira call.
+
+    A refresh re-fetches the issue unless the payload already carried its
+    comments and links. It writes the issue to the mirror, the dependency
+    graph and the similarity index where its project is loaded, and drops every cached
+    analysis of the issue other than the one matching its current content.
+    Watched issues are then re-analyzed in the background, so the next
+    interactive call is a cache hit. All of this runs at bulk priority.
+    """
+
+    def __init__(self, debounce=2.0, max_delay=30.0):
+        self.debounce = debounce
+        self.max_delay = max(max_delay, debounce)
+        self._pending = {}
+        self._tasks = set()
+        self.stats = {
+            "received": 0,
+            "ignored": 0,
+            "rejected": 0,
+            "coalesced": 0,
+            "refreshed": 0,
+            "skipped": 0,
+            "deleted": 0,
+            "jira_fetches": 0,
+            "mirror_updates": 0,
+            "graph_updates": 0,
+            "prefetch_updates": 0,
+            "similar_updates": 0,
+            "invalidated": 0,
+            "reanalyzed": 0,
+            "errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            debounce=env_float("JIRAIQ_WEBHOOK_DEBOUNCE", 2.0),
+            max_delay=env_float("JIRAIQ_WEBHOOK_MAX_DELAY", 30.0),
+        )
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def handle(self, payload):
+        """Queue one webhook payload; returns the issue key it affects, or None if ignored"""
+        self.stats["received"] += 1
+        event = payload.get("webhookEvent") or ""
+        issue = payload.get("issue") or {}
+        key = (issue.get("key") or "").upper()
+        if not key or event not in ISSUE_EVENTS | DELETE_EVENTS | COMMENT_EVENTS:
+            self.stats["ignored"] += 1
+            return None
+
+        change = self._pending.get(key)
+        if change is None:
+            change = self._pending[key] = PendingChange(key)
+        else:
+            self.stats["coalesced"] += 1
+            change.timer.cancel()
+        change.events += 1
+
+        if event in DELETE_EVENTS:
+            change.deleted = True
+        elif event in ISSUE_EVENTS and issue.get("fields"):
+            # A later delete still wins; otherwise the newest full issue is kept
+            change.raw = issue
+
+        delay = min(self.debounce, max(self.max_delay - (time.monotonic() - change.first_seen), 0))
+        change.timer = asyncio.get_running_loop().call_later(delay, self._start, key)
+        return key
+
+    async def flush(self):
+        """Apply every pending change now and wait for all refreshes to finish"""
+        for key in list(self._pending):
+            self._pending[key].timer.cancel()
+            self._start(key)
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _start(self, key):
+        change = self._pending.pop(key, None)
+        if change is None:
+            return
+        task = asyncio.ensure_future(self._apply(change))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _apply(self, change):
+        try:
+            # Refreshes, and the analyses of watched issues, queue behind interactive calls
+            with priority(BULK):
+                if change.deleted:
+                    await self._forget(change.key)
+                else:
+                    await self._refresh(change)
+        except Exception as e:
+            self.stats["errors"] += 1
+            count("errors")
+            print(f"jiraiq: webhook refresh of {change.key} failed: {e}", file=sys.stderr)
+
+    async def _forget(self, key):
+        from jiraiq_similar import existing_similarity_index
+
+        mirror = get_issue_mirror()
+        if mirror is not None:
+            mirror.remove_issue(key)
+        get_dependency_graph().remove_issue(key)
+        get_prefetcher().remove_issue(key)
+        index = existing_similarity_index()
+        if index is not None:
+            index.remove_issue(key)
+        self.stats["invalidated"] += get_analysis_cache().invalidate_issue(key)
+        self.stats["deleted"] += 1
+
+    async def _refresh(self, change):
+        from jiraiq_server import analysis_inputs, get_analysis, ANALYSIS_MODEL, ANALYSIS_TEMPERATURE
+        from jiraiq_similar import existing_similarity_index
+        from jiraiq_triage import cheap_model
+
+        key = change.key
+        project_key = key.split("-")[0]
+        mirror = get_issue_mirror()
+        mirrored = mirror is not None and mirror.has_project(project_key)
+        graph = get_dependency_graph()
+        cache = get_analysis_cache()
+        prefetcher = get_prefetcher()
+        index = existing_similarity_index()
+        indexed = index is not None and index.has_project(project_key)
+        watch = watched()
+        is_watched = key in watch or project_key in watch
+        held = graph.has_project(project_key) or indexed or cache.has_issue(key) or prefetcher.has_issue(key)
+        if not (mirrored or is_watched or held):
+            self.stats["skipped"] += 1
+            return
+
+        # Jira leaves comments out of most issue payloads; fetch the issue when they are missing
+        raw = change.raw
+        if raw is None or not {"comment", "issuelinks"} <= (raw.get("fields") or {}).keys():
+            fields = ",".join(MIRROR_FIELDS + [sprint_field(), "issuelinks"])
+            raw = await jira_clients.run(lambda jira: jira.issue(key, fields=fields).raw)
+            self.stats["jira_fetches"] += 1
+
+        if mirrored:
+            mirror.update_issue(raw)
+            self.stats["mirror_updates"] += 1
+        if graph.update_issue(raw):
+            self.stats["graph_updates"] += 1
+        if prefetcher.update_issue(raw):
+            self.stats["prefetch_updates"] += 1
+        if indexed and index.update_issue(raw):
+            self.stats["similar_updates"] += 1
+
+        # Analyses are keyed by content, so the entry for the current content stays valid
+        issue = snapshot_issue(raw)
+        inputs, _ = analysis_inputs(issue, issue.comments)
+        current = {make_cache_key(inputs, model, ANALYSIS_TEMPERATURE) for model in (ANALYSIS_MODEL, cheap_model())}
+        self.stats["invalidated"] += cache.invalidate_issue(key, keep=current)
+        self.stats["refreshed"] += 1
+
+        if is_watched:
+            await get_analysis(key, inputs)
+            self.stats["reanalyzed"] += 1
+
+    def summary(self):
+        return {**self.stats, "pending": self.pending, "refreshing": len(self._tasks)}
+
+
+_webhook_processor = None
+_webhook_processor_lock = threading.Lock()
+
+
+def get_webhook_processor():
+    """Return the process-wide webhook processor, creating it on first use"""
+    global _webhook_processor
+    with _webhook_processor_lock:
+        if _webhook_processor is None:
+            _webhook_processor = WebhookProcessor.from_env()
+        return _webhook_processor
+
+
+def record_payload(payload):
+    """Append a payload to JIRAIQ_WEBHOOK_RECORD, if set, for later replay"""
+    path = os.getenv("JIRAIQ_WEBHOOK_RECORD")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload) + "\n")
+
+
+def replay_path(name):
+    """Resolve a payload file inside JIRAIQ_WEBHOOK_REPLAY_DIR; any other path is refused"""
+    directory = os.getenv("JIRAIQ_WEBHOOK_REPLAY_DIR")
+    if not directory:
+        raise ValueError("Set JIRAIQ_WEBHOOK_REPLAY_DIR to replay from a file, or pass the payloads inline")
+    root = Path(directory).resolve()
+    path = (root / name).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"{name} is outside JIRAIQ_WEBHOOK_REPLAY_DIR")
+    return path
+
+
+def load_payloads(path):
+    """Read recorded payloads from a JSON Lines file or a JSON array"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def replay(payloads, debounce=True):
+    """Feed recorded payloads through the processor and wait until they are applied"""
+    processor = get_webhook_processor()
+    before = dict(processor.stats)
+    for payload in payloads:
+        processor.handle(payload)
+        if not debounce:
+            await processor.flush()
+    await processor.flush()
+    return {k: processor.stats[k] - before[k] for k in processor.stats}
+
+
+def webhook_route(host):
+    """Starlette route accepting Jira webhooks at /webhooks/jira
+
+    Requests must be signed with JIRAIQ_WEBHOOK_SECRET. Without a secret,
+    webhooks are only accepted when the listener is bound to loopback.
+    """
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    unsigned_ok = is_loopback(host)
+    if not os.getenv("JIRAIQ_WEBHOOK_SECRET") and not unsigned_ok:
+        print(f"jiraiq: webhooks on {host} are refused until JIRAIQ_WEBHOOK_SECRET is set", file=sys.stderr)
+
+    async def receive(request):
+        processor = get_webhook_processor()
+        body = await request.body()
+        secret = os.getenv("JIRAIQ_WEBHOOK_SECRET")
+        if not secret and not unsigned_ok:
+            processor.stats["rejected"] += 1
+            return JSONResponse({"error": "JIRAIQ_WEBHOOK_SECRET is not set"}, status_code=403)
+        if secret and not verify_signature(body, request.headers.get("x-hub-signature"), secret):
+            processor.stats["rejected"] += 1
+            return JSONResponse({"error": "bad signature"}, status_code=401)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            processor.stats["rejected"] += 1
+            return JSONResponse({"error": "invalid JSON"}, status_code=400)
+
+        record_payload(payload)
+        key = processor.handle(payload)
+        return JSONResponse({"accepted": key is not None, "issue": key}, status_code=202)
+
+    return Route(WEBHOOK_PATH, receive, methods=["POST"])
+
+
+async def serve_webhooks(host=None, port=None):
+    """Run a webhook-only HTTP listener on the current event loop (for the stdio transport)"""
+    import uvicorn
+    from starlette.applications import Starlette
+
+    host = host or os.getenv("JIRAIQ_WEBHOOK_HOST", "127.0.0.1")
+    port = port or env_int("JIRAIQ_WEBHOOK_PORT", 8090)
+    app = Starlette(routes=[webhook_route(host)])
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, lifespan="off", log_level="warning"))
+    try:
+        await server.serve()
+    except SystemExit:
+        # uvicorn exits when it cannot bind; the MCP server carries on without webhooks
+        print(f"jiraiq: webhook listener could not start on {host}:{port}", file=sys.stderr)
+
+
+def main(argv):
+    """Command line entry point for the standalone listener and replays"""
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Listen for Jira webhooks")
+    serve.add_argument("--host")
+    serve.add_argument("--port", type=int)
+    replay_cmd = commands.add_parser("replay", help="Apply recorded webhook payloads")
+    replay_cmd.add_argument("path")
+    replay_cmd.add_argument("--no-debounce", action="store_true", help="Apply each payload on its own")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        asyncio.run(serve_webhooks(args.host, args.port))
+    else:
+        result = asyncio.run(replay(load_payloads(args.path), debounce=not args.no_debounce))
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Check how the default vocabularies label sample comment phrasings"""
+
+from jiraiq_classifier import TextClassifier, DEFAULT_VOCABULARIES, BLOCKER, RISK, TECH
+
+# Phrasings the default vocabularies must label this way
+CASES = [
+    ("Blocked on the platform team", {BLOCKER}),
+    ("We are stuck waiting on the vendor", {BLOCKER}),
+    ("This is blocking the release and may slip the deadline", {BLOCKER, RISK}),
+    ("Unblocked now, moving on", set()),
+    ("No longer blocked by ENG-12", set()),
+    ("No blockers this week", set()),
+    ("This is not a blocker", set()),
+    ("It isn't a risk for this sprint", set()),
+    ("Not really an impediment", set()),
+    ("Without any delay", set()),
+    ("Not a blocker, but the API error is a risk", {RISK, TECH}),
+    ("The database query times out", {TECH}),
+]
+
+
+def test_classifier():
+    """Label every sample phrasing and report the ones labelled differently"""
+    
+    print("="*60)
+    print("CLASSIFIER TEST")
+    print("="*60)
+    
+    classifier = TextClassifier(DEFAULT_VOCABULARIES)
+    failures = 0
+    for text, expected in CASES:
+        got = classifier.labels(text)
+        if got != expected:
+            failures += 1
+            print(f"❌ {text!r}: expected {sorted(expected)}, got {sorted(got)}")
+    
+    print(f"\n{len(CASES) - failures}/{len(CASES)} phrasings labelled as expected")
+    assert failures == 0
+
+if __name__ == "__main__":
+    test_classifier()